@@ -0,0 +1,251 @@
+"""
+Seller analytics: daily views, favorites and inquiries per listing, and how a
+listing's price compares with similar listings nearby.
+
+Engagement is written as ListingEvent rows when it happens (see
+listings.counters and listings.signals). rollup() folds the events recorded
+since its watermark into ListingDailyStat, one chunk of ids at a time, so
+each run only reads new events; it runs as a background job shortly after
+events arrive, or with ``manage.py rollup_listing_stats``. The analytics page
+reads a date range of rollup rows and never touches the event log.
+
+Event ids only approximate commit order, so a rollup stops short of events
+younger than ANALYTICS_ROLLUP_LAG seconds: an event still in an open
+transaction would otherwise be skipped for good once the watermark passed it.
+"""
+import datetime
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import ListingDailyStat, ListingEvent, MarketPriceStat, Property, RollupWatermark
+from .similarity import location_token
+
+WATERMARK = 'listing_daily_stats'
+
+# ListingEvent.kind -> ListingDailyStat field
+STAT_FIELDS = {'view': 'views', 'favorite': 'favorites', 'inquiry': 'inquiries'}
+
+# Fewer listings than this in a location don't make a meaningful market
+MIN_COMPARABLES = 3
+
+
+def schedule_rollup():
+    delay = datetime.timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_DELAY', 300))
+    enqueue('listings.rollup_listing_stats', delay=delay, unique=True)
+
+
+def record(property_id, kind, count=1):
+    record_many([(property_id, kind, count)])
+
+
+def record_many(events):
+    """Log ``(property_id, kind, count)`` events and make sure a rollup is coming."""
+    now = timezone.now()
+    rows = [
+        ListingEvent(property_id=property_id, kind=kind, count=count, occurred_at=now)
+        for property_id, kind, count in events if count
+    ]
+    if rows:
+        ListingEvent.objects.bulk_create(rows)
+        schedule_rollup()
+
+
+# --- Rollup ---
+
+def _settled_upper_bound(watermark):
+    """The highest event id that is safe to roll up now."""
+    lag = datetime.timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG', 60))
+    return ListingEvent.objects.filter(
+        pk__gt=watermark, occurred_at__lte=timezone.now() - lag,
+    ).aggregate(upper=Max('pk'))['upper']
+
+
+def _fold(low, high):
+    """Add the events with ids in (low, high] to their daily rows."""
+    totals = {}
+    grouped = (
+        ListingEvent.objects.filter(pk__gt=low, pk__lte=high)
+        .annotate(day=TruncDate('occurred_at'))
+        .values('property_id', 'property__seller_id', 'day', 'kind')
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+    for row in grouped:
+        key = (row['property_id'], row['day'])
+        if key not in totals:
+            totals[key] = ListingDailyStat(property_id=key[0], seller_id=row['property__seller_id'], date=key[1])
+        stat = totals[key]
+        field = STAT_FIELDS[row['kind']]
+        setattr(stat, field, getattr(stat, field) + row['total'])
+    if not totals:
+        return
+
+    existing = ListingDailyStat.objects.filter(
+        property_id__in={key[0] for key in totals}, date__in={key[1] for key in totals},
+    )
+    for stat in existing:
+        new = totals.get((stat.property_id, stat.date))
+        if new is not None:
+            for field in STAT_FIELDS.values():
+                setattr(new, field, getattr(new, field) + getattr(stat, field))
+    ListingDailyStat.objects.bulk_create(
+        totals.values(), batch_size=1000, update_conflicts=True,
+        unique_fields=['property', 'date'], update_fields=list(STAT_FIELDS.values()),
+    )
+
+
+def rollup(chunk_size=10_000):
+    """Fold new events into ListingDailyStat. Returns how many events were read."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            # Locking the watermark keeps concurrent rollups from counting twice
+            RollupWatermark.objects.get_or_create(name=WATERMARK)
+            mark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+            upper = _settled_upper_bound(mark.last_event_id)
+            if upper is None:
+                return processed
+            high = min(upper, mark.last_event_id + chunk_size)
+            _fold(mark.last_event_id, high)
+            processed += ListingEvent.objects.filter(pk__gt=mark.last_event_id, pk__lte=high).count()
+            mark.last_event_id = high
+            mark.save(update_fields=['last_event_id', 'updated_at'])
+
+
+def has_unrolled_events():
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).values_list('last_event_id', flat=True).first()
+    return ListingEvent.objects.filter(pk__gt=watermark or 0).exists()
+
+
+def prune_events(keep_days=None):
+    """Delete rolled-up events older than ``keep_days``. Returns how many."""
+    keep_days = keep_days if keep_days is not None else getattr(settings, 'ANALYTICS_EVENT_RETENTION_DAYS', 30)
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).values_list('last_event_id', flat=True).first()
+    if not watermark:
+        return 0
+    cutoff = timezone.now() - datetime.timedelta(days=keep_days)
+    deleted, _ = ListingEvent.objects.filter(pk__lte=watermark, occurred_at__lt=cutoff).delete()
+    return deleted
+
+
+# --- Market prices ---
+
+def market_key(location, property_type):
+    return location_token(location), property_type
+
+
+def refresh_market_stats(chunk_size=5000):
+    """Recompute the price quartiles of every location and property type."""
+    per_sqft = defaultdict(list)
+    rows = (
+        Property.objects.filter(is_published=True, area_sqft__gt=0)
+        .values_list('location', 'property_type', 'price', 'area_sqft')
+        .iterator(chunk_size=chunk_size)
+    )
+    for location, property_type, price, area in rows:
+        per_sqft[market_key(location, property_type)].append(float(price) / area)
+
+    now = timezone.now()
+    stats = []
+    for (location, property_type), values in per_sqft.items():
+        if len(values) < MIN_COMPARABLES:
+            continue
+        low, median, high = statistics.quantiles(values, n=4)
+        stats.append(MarketPriceStat(
+            location=location, property_type=property_type, listings=len(values),
+            low_per_sqft=low, median_per_sqft=median, high_per_sqft=high, computed_at=now,
+        ))
+    with transaction.atomic():
+        MarketPriceStat.objects.all().delete()
+        MarketPriceStat.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
+
+
+def market_stats_stale():
+    latest = MarketPriceStat.objects.aggregate(latest=Max('computed_at'))['latest']
+    max_age = datetime.timedelta(hours=getattr(settings, 'MARKET_STATS_MAX_AGE_HOURS', 24))
+    return latest is None or timezone.now() - latest > max_age
+
+
+def attach_price_positions(properties):
+    """
+    Set ``price_position`` on each listing: its price per square foot against
+    the median of its market (as a signed percentage), the market size and a
+    band of "below", "typical" or "above". Listings without a market get None.
+    """
+    properties = list(properties)
+    locations = {location_token(p.location) for p in properties}
+    markets = {
+        (m.location, m.property_type): m
+        for m in MarketPriceStat.objects.filter(location__in=locations)
+    }
+    for property_obj in properties:
+        market = markets.get(market_key(property_obj.location, property_obj.property_type))
+        property_obj.price_position = None
+        if market is None or not property_obj.area_sqft:
+            continue
+        value = float(property_obj.price) / property_obj.area_sqft
+        if value < market.low_per_sqft:
+            band = 'below'
+        elif value > market.high_per_sqft:
+            band = 'above'
+        else:
+            band = 'typical'
+        property_obj.price_position = {
+            'per_sqft': value,
+            'median_per_sqft': market.median_per_sqft,
+            'difference': round(100 * (value / market.median_per_sqft - 1)),
+            'comparables': market.listings,
+            'band': band,
+        }
+    return properties
+
+
+# --- Reading ---
+
+def daily_series(stats, start, end):
+    """Per-day totals of a ListingDailyStat queryset, with zeros for quiet days."""
+    grouped = {
+        row['date']: row
+        for row in stats.filter(date__gte=start, date__lte=end).values('date')
+        .annotate(views=Sum('views'), favorites=Sum('favorites'), inquiries=Sum('inquiries'))
+        .order_by()
+    }
+    series = []
+    day = start
+    while day <= end:
+        row = grouped.get(day, {})
+        series.append({
+            'date': day,
+            'views': row.get('views') or 0,
+            'favorites': row.get('favorites') or 0,
+            'inquiries': row.get('inquiries') or 0,
+        })
+        day += datetime.timedelta(days=1)
+    return series
+
+
+def top_listings(seller, start, end, count=25):
+    """The seller's ``count`` most viewed listings over the range, with their totals."""
+    totals = (
+        ListingDailyStat.objects.filter(seller=seller, date__gte=start, date__lte=end)
+        .values('property_id')
+        .annotate(views=Sum('views'), favorites=Sum('favorites'), inquiries=Sum('inquiries'))
+        .order_by('-views', 'property_id')[:count]
+    )
+    totals = {row['property_id']: row for row in totals}
+    found = Property.objects.in_bulk(totals)
+    listings = []
+    for property_id, row in totals.items():
+        if property_id in found:
+            listing = found[property_id]
+            listing.period = row
+            listings.append(listing)
+    return listings
@@ -0,0 +1,247 @@
+"""
+Read-only JSON API for published listings, under ``/api/v1/``.
+
+    GET /api/v1/properties/                 search, filter and sort like /search/
+    GET /api/v1/properties/<id>/            one listing, with its gallery
+    GET /api/v1/properties/<id>/images/     just the gallery
+    GET /api/v1/tiles/<z>/<x>/<y>/          listing clusters of a map tile
+
+``?fields=id,title,price`` picks the fields returned (and the columns read);
+lists are cursor paginated with ``?limit=`` and the ``next``/``previous``
+links in the response.
+
+Every response carries a strong ETag and a Last-Modified header derived
+from the listings' ``updated_at`` (which gallery and rendition changes bump
+too), and conditional requests are answered with 304 Not Modified before
+anything is serialized. Detail requests only read ``updated_at`` to decide.
+A list can change without any of its rows changing (a listing drops out of
+it), so lists are only revalidated by ETag; their Last-Modified is
+informational. Map tiles change with any listing, so their ETag is the
+listings cache version (listings.caching) and their clusters are cached
+under it.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import geo
+from .caching import listings_version
+from .forms import PropertySearchForm
+from .images import FORMATS, RENDITIONS, rendition_name
+from .models import Property, PropertyImage
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import search_properties
+
+API_VERSION = 'v1'
+
+DEFAULT_LIMIT = 24
+MAX_LIMIT = 100
+
+
+def _image(request, image):
+    if not image:
+        return None
+    renditions = None
+    if image.instance.renditions_ready:
+        renditions = {
+            name: {
+                fmt: request.build_absolute_uri(default_storage.url(rendition_name(image.name, name, fmt)))
+                for fmt in FORMATS
+            }
+            for name in RENDITIONS
+        }
+    return {'url': request.build_absolute_uri(image.url), 'renditions': renditions}
+
+
+# name -> (columns it reads, serializer)
+FIELDS = {
+    'id': (('id',), lambda request, p: p.pk),
+    'url': (('id',), lambda request, p: request.build_absolute_uri(reverse('listings:api-property-detail', args=[p.pk]))),
+    'title': (('title',), lambda request, p: p.title),
+    'description': (('description',), lambda request, p: p.description),
+    'price': (('price',), lambda request, p: str(p.price)),
+    'property_type': (('property_type',), lambda request, p: p.property_type),
+    'status': (('status',), lambda request, p: p.status),
+    'bedrooms': (('bedrooms',), lambda request, p: p.bedrooms),
+    'bathrooms': (('bathrooms',), lambda request, p: p.bathrooms),
+    'area_sqft': (('area_sqft',), lambda request, p: p.area_sqft),
+    'location': (('location',), lambda request, p: p.location),
+    'facing': (('facing',), lambda request, p: p.facing),
+    'latitude': (('latitude',), lambda request, p: p.latitude),
+    'longitude': (('longitude',), lambda request, p: p.longitude),
+    # Only set by a lat/lng search
+    'distance_km': ((), lambda request, p: round(p.distance_km, 3) if hasattr(p, 'distance_km') else None),
+    'main_image': (('main_image', 'renditions_ready'), lambda request, p: _image(request, p.main_image)),
+    'images': ((), lambda request, p: [_image(request, i.image) for i in p.images.all()]),
+    'list_date': (('list_date',), lambda request, p: p.list_date.isoformat()),
+    'updated_at': (('updated_at',), lambda request, p: p.updated_at.isoformat()),
+}
+
+LIST_FIELDS = [
+    'id', 'url', 'title', 'price', 'property_type', 'status', 'bedrooms', 'bathrooms',
+    'area_sqft', 'location', 'latitude', 'longitude', 'main_image', 'list_date', 'updated_at',
+]
+DETAIL_FIELDS = [name for name in FIELDS if name != 'distance_km']
+
+
+class BadRequest(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def _requested_fields(request, default):
+    requested = request.GET.get('fields')
+    if not requested:
+        return default
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown:
+        raise BadRequest({'fields': [f"Unknown field(s): {', '.join(unknown)}."]})
+    return list(dict.fromkeys(fields))
+
+
+def _select(queryset, fields, ordering=()):
+    """Read only the columns the fields need, plus the keys paging and ETags use."""
+    columns = {'id', 'updated_at', *(name.lstrip('-') for name in ordering)}
+    for name in fields:
+        columns.update(FIELDS[name][0])
+    queryset = queryset.only(*columns)
+    if 'images' in fields:
+        queryset = queryset.prefetch_related('images')
+    return queryset
+
+
+def _serialize(request, listing, fields):
+    return {name: FIELDS[name][1](request, listing) for name in fields}
+
+
+def _etag(*parts):
+    digest = hashlib.sha1(repr((API_VERSION,) + parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _conditional(request, etag, last_modified, build, by_date=True):
+    """
+    Answer with 304 (or 412) when the client's copy is current, otherwise
+    with ``build()``; either way with the validators and caching headers.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp if by_date else None)
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(timestamp)
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'API_CACHE_MAX_AGE', 60))
+    return response
+
+
+def _page_link(request, cursor, direction):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[direction] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+@require_safe
+def property_list(request):
+    form = PropertySearchForm(request.GET)
+    try:
+        if not form.is_valid():
+            raise BadRequest(form.errors)
+        fields = _requested_fields(request, LIST_FIELDS)
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            raise BadRequest({'limit': ["Enter a whole number."]})
+
+        queryset, ordering = search_properties(form.cleaned_data)
+        paginator = KeysetPaginator(_select(queryset, fields, ordering), ordering=ordering, per_page=limit)
+        try:
+            page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+        except InvalidCursor:
+            raise BadRequest({'cursor': ["Invalid cursor."]})
+    except BadRequest as exc:
+        return _json({'errors': exc.errors}, status=400)
+
+    listings = list(page)
+    etag = _etag(
+        'list', fields, [(p.pk, p.updated_at.isoformat()) for p in listings],
+        page.next_cursor, page.previous_cursor,
+    )
+    last_modified = max((p.updated_at for p in listings), default=None)
+    return _conditional(request, etag, last_modified, lambda: _json({
+        'results': [_serialize(request, p, fields) for p in listings],
+        'next': _page_link(request, page.next_cursor, 'after'),
+        'previous': _page_link(request, page.previous_cursor, 'before'),
+    }), by_date=False)
+
+
+def _detail_validators(pk, *parts):
+    updated_at = get_object_or_404(
+        Property.objects.filter(is_published=True).values_list('updated_at', flat=True), pk=pk,
+    )
+    return _etag('detail', pk, updated_at.isoformat(), *parts), updated_at
+
+
+@require_safe
+def property_detail(request, pk):
+    try:
+        fields = _requested_fields(request, DETAIL_FIELDS)
+    except BadRequest as exc:
+        return _json({'errors': exc.errors}, status=400)
+    etag, updated_at = _detail_validators(pk, fields)
+
+    def build():
+        listing = get_object_or_404(_select(Property.objects.filter(is_published=True), fields), pk=pk)
+        return _json(_serialize(request, listing, fields))
+    return _conditional(request, etag, updated_at, build)
+
+
+@require_safe
+def property_images(request, pk):
+    etag, updated_at = _detail_validators(pk, 'images')
+
+    def build():
+        images = PropertyImage.objects.filter(property_id=pk).order_by('pk')
+        return _json({'results': [dict(_image(request, i.image), id=i.pk) for i in images]})
+    return _conditional(request, etag, updated_at, build)
+
+
+@require_safe
+def map_tile(request, z, x, y):
+    """
+    Listing counts of a map tile, clustered by geohash cell, under the same
+    filters as the list (except ``lat``/``lng``/``bbox``, which the tile sets).
+    """
+    if z > geo.MAX_TILE_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        raise Http404("No such tile.")
+    form = PropertySearchForm(request.GET)
+    if not form.is_valid():
+        return _json({'errors': form.errors}, status=400)
+    filters = dict(form.cleaned_data, lat=None, lng=None, bbox=None)
+    etag = _etag('tile', listings_version(), request.get_full_path())
+
+    def build():
+        def clusters():
+            queryset, _ = search_properties(filters)
+            return geo.tile_clusters(queryset, z, x, y)
+        timeout = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
+        found = cache.get_or_set(f'api:tile:{etag}', clusters, timeout)
+        return _json({'tile': [z, x, y], 'total': sum(c['count'] for c in found), 'clusters': found})
+    return _conditional(request, etag, None, build)
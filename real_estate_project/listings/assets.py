@@ -0,0 +1,330 @@
+"""
+The site's front-end dependencies, served from our own static files.
+
+Bootstrap, Font Awesome and the Inter web font are pinned below. Their
+upstream files are fetched once into ``listings/vendor/`` (checked against
+their Subresource Integrity hashes where upstream publishes them), and
+``manage.py build_assets`` turns them into the bundle under
+``listings/static/listings/vendor/``: the Bootstrap and Font Awesome
+stylesheets are trimmed down to the rules whose classes our templates,
+scripts and forms actually use, and source map references are dropped.
+
+``collectstatic`` then fingerprints the bundle together with the pages' own
+stylesheets (``listings/static/listings/css/``) and writes gzip and Brotli
+copies of each, which WhiteNoise serves with a far-future ``immutable``
+Cache-Control.
+
+Templates include the bundle with ``{% vendor_css %}`` and ``{% vendor_js %}``
+(listings.templatetags.vendor_assets), which fall back to the public CDNs
+while the bundle hasn't been built.
+"""
+import base64
+import hashlib
+import re
+import shutil
+import urllib.request
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+
+APP_DIR = Path(__file__).resolve().parent
+VENDOR_DIR = APP_DIR / 'vendor'
+BUNDLE_DIR = APP_DIR / 'static' / 'listings' / 'vendor'
+# Static path of the bundle, as templates refer to it
+BUNDLE_PATH = 'listings/vendor'
+
+BOOTSTRAP_VERSION = '5.3.3'
+FONTAWESOME_VERSION = '6.5.1'
+INTER_VERSION = '5.0.18'
+
+_JSDELIVR = 'https://cdn.jsdelivr.net/npm'
+_CDNJS = 'https://cdnjs.cloudflare.com/ajax/libs'
+_FA_FONTS = ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility')
+INTER_WEIGHTS = (400, 500, 600, 700)
+# Google Fonts' unicode ranges; browsers only download a subset a page uses
+INTER_SUBSETS = {
+    'latin': (
+        'U+0000-00FF, U+0131, U+0152-0153, U+02BB-02BC, U+02C6, U+02DA, U+02DC, U+0304, U+0308, '
+        'U+0329, U+2000-206F, U+20AC, U+2122, U+2191, U+2193, U+2212, U+2215, U+FEFF, U+FFFD'
+    ),
+    'latin-ext': (
+        'U+0100-02BA, U+02BD-02C5, U+02C7-02CC, U+02CE-02D7, U+02DD-02FF, U+0304, U+0308, U+0329, '
+        'U+1D00-1DBF, U+1E00-1E9F, U+1EF2-1EFF, U+2020, U+20A0-20AB, U+20AD-20C0, U+2113, '
+        'U+2C60-2C7F, U+A720-A7FF'
+    ),
+}
+
+# Upstream files: path under VENDOR_DIR -> (URL, SRI hash or None)
+VENDOR_FILES = {
+    'bootstrap/bootstrap.min.css': (
+        f'{_JSDELIVR}/bootstrap@{BOOTSTRAP_VERSION}/dist/css/bootstrap.min.css',
+        'sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH',
+    ),
+    'bootstrap/bootstrap.bundle.min.js': (
+        f'{_JSDELIVR}/bootstrap@{BOOTSTRAP_VERSION}/dist/js/bootstrap.bundle.min.js',
+        'sha384-YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N6jIeHz',
+    ),
+    'fontawesome/css/all.min.css': (f'{_CDNJS}/font-awesome/{FONTAWESOME_VERSION}/css/all.min.css', None),
+    **{
+        f'fontawesome/webfonts/{font}.{ext}': (f'{_CDNJS}/font-awesome/{FONTAWESOME_VERSION}/webfonts/{font}.{ext}', None)
+        for font in _FA_FONTS for ext in ('woff2', 'ttf')
+    },
+    **{
+        f'inter/inter-{subset}-{weight}-normal.woff2': (
+            f'{_JSDELIVR}/@fontsource/inter@{INTER_VERSION}/files/inter-{subset}-{weight}-normal.woff2', None,
+        )
+        for subset in INTER_SUBSETS for weight in INTER_WEIGHTS
+    },
+}
+
+# What templates include: name -> (bundle path, CDN URL, SRI hash or None)
+STYLESHEETS = {
+    'bootstrap': ('bootstrap/bootstrap.min.css', *VENDOR_FILES['bootstrap/bootstrap.min.css']),
+    'fontawesome': ('fontawesome/css/all.min.css', *VENDOR_FILES['fontawesome/css/all.min.css']),
+    'inter': ('inter/inter.css', 'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap', None),
+}
+SCRIPTS = {
+    'bootstrap': ('bootstrap/bootstrap.bundle.min.js', *VENDOR_FILES['bootstrap/bootstrap.bundle.min.js']),
+}
+
+# Stylesheets trimmed to the classes in use
+TRIMMED = ('bootstrap/bootstrap.min.css', 'fontawesome/css/all.min.css')
+
+# Prefixes of classes nothing in our source names but Bootstrap's JavaScript
+# adds while menus, modals, carousels and tooltips open and close
+SAFELIST_PREFIXES = (
+    'active', 'bs-popover-', 'bs-tooltip-', 'carousel-item-', 'collapse', 'collapsing', 'disabled',
+    'dropdown-menu-end', 'dropend', 'dropstart', 'dropup', 'fade', 'hide', 'hiding', 'is-invalid',
+    'is-valid', 'modal-backdrop', 'modal-open', 'modal-static', 'offcanvas-backdrop', 'pointer-event',
+    'popover', 'show', 'tooltip', 'was-validated',
+)
+
+# Files scanned for class names
+SOURCE_SUFFIXES = ('.html', '.js', '.py')
+
+
+class AssetError(Exception):
+    pass
+
+
+# --- Vendoring ---
+
+def _sri(data, algorithm):
+    return base64.b64encode(hashlib.new(algorithm, data).digest()).decode()
+
+
+def fetch(vendor_dir=VENDOR_DIR, refresh=False):
+    """Download the pinned upstream files that are missing; returns the paths written."""
+    written = []
+    for path, (url, integrity) in VENDOR_FILES.items():
+        target = Path(vendor_dir) / path
+        if target.exists() and not refresh:
+            continue
+        request = urllib.request.Request(url, headers={'User-Agent': 'plot-point-build-assets'})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            data = response.read()
+        if integrity:
+            algorithm, expected = integrity.split('-', 1)
+            if _sri(data, algorithm) != expected:
+                raise AssetError(f"{url} doesn't match its integrity hash {integrity}.")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        written.append(path)
+    return written
+
+
+def missing(vendor_dir=VENDOR_DIR):
+    return [path for path in VENDOR_FILES if not (Path(vendor_dir) / path).exists()]
+
+
+# --- Finding the classes in use ---
+
+def _source_dirs():
+    """Our apps' directories, and any project-level template directories."""
+    dirs = [Path(config.path) for config in apps.get_app_configs() if Path(config.path).is_relative_to(settings.BASE_DIR)]
+    for engine in settings.TEMPLATES:
+        dirs.extend(Path(d) for d in engine.get('DIRS', []))
+    return dirs
+
+
+def used_names(dirs=None):
+    """
+    ``(names, prefixes)``: every word in our templates, scripts and Python
+    code that could be a class name, and the prefixes of classes built in
+    templates (``col-md-{{ width }}``). Like PurgeCSS, this matches words
+    rather than parsing class attributes, so a class named in a script or
+    in a form widget's attrs counts as used too.
+    """
+    names, prefixes = set(), set(SAFELIST_PREFIXES)
+    for directory in dirs or _source_dirs():
+        for path in directory.rglob('*'):
+            if path.suffix not in SOURCE_SUFFIXES or 'migrations' in path.parts:
+                continue
+            # Bootstrap's own script names every class it has
+            if VENDOR_DIR in path.parents or BUNDLE_DIR in path.parents:
+                continue
+            text = path.read_text(encoding='utf-8', errors='ignore')
+            names.update(re.findall(r'-?[A-Za-z_][\w-]*', text))
+            prefixes.update(re.findall(r'([A-Za-z_][\w-]*-)\{[{%]', text))
+    return names, tuple(prefixes)
+
+
+# --- Trimming stylesheets ---
+
+def _skip_string(css, i):
+    quote, i = css[i], i + 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == '\\' else 1
+    return i + 1
+
+
+def _blocks(css):
+    """
+    Top-level items of a stylesheet: ``(prelude, body)`` for each rule or
+    at-rule block, ``(statement, None)`` for statements like ``@charset``,
+    and ``(comment, None)`` for ``/*! ... */`` license comments. Other
+    comments are dropped.
+    """
+    items, start, i = [], 0, 0
+    while i < len(css):
+        char = css[i]
+        if css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            end = len(css) if end == -1 else end + 2
+            if css.startswith('/*!', i) and not css[start:i].strip():
+                items.append((css[i:end], None))
+                start = end
+            else:
+                # Cut the comment out of whatever prelude it sits in
+                css = css[:i] + css[end:]
+                continue
+            i = end
+        elif char in '"\'':
+            i = _skip_string(css, i)
+        elif char == ';':
+            if css[start:i].strip():
+                items.append((css[start:i].strip() + ';', None))
+            i = start = i + 1
+        elif char == '{':
+            depth, j = 1, i + 1
+            while j < len(css) and depth:
+                if css[j] in '"\'':
+                    j = _skip_string(css, j)
+                    continue
+                depth += {'{': 1, '}': -1}.get(css[j], 0)
+                j += 1
+            items.append((css[start:i].strip(), css[i + 1:j - 1]))
+            i = start = j
+        else:
+            i += 1
+    return items
+
+
+def _split_selectors(prelude):
+    """Split a selector list on its top-level commas (not those inside ``:is(...)``)."""
+    parts, depth, current = [], 0, ''
+    for char in prelude:
+        if char == ',' and not depth:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += {'(': 1, '[': 1, ')': -1, ']': -1}.get(char, 0)
+        current += char
+    parts.append(current.strip())
+    return parts
+
+
+def _selector_classes(selector):
+    """
+    Classes a selector requires. Attribute selectors and the arguments of
+    pseudo-classes are left out, as ``:not(.show)`` matches without ``show``.
+    """
+    selector = re.sub(r'\[[^\]]*\]', '', selector)
+    while True:
+        stripped = re.sub(r'\([^()]*\)', '', selector)
+        if stripped == selector:
+            break
+        selector = stripped
+    return re.findall(r'\.(-?[A-Za-z_](?:[\w-]|\\.)*)', selector)
+
+
+def _is_used(name, names, prefixes):
+    name = name.replace('\\', '')
+    return name in names or name.startswith(prefixes)
+
+
+def trim_css(css, names, prefixes=()):
+    """
+    The stylesheet without the selectors whose classes aren't all in use;
+    rules left without selectors, and at-rules left empty, are dropped.
+    """
+    out = []
+    for prelude, body in _blocks(css):
+        if body is None:
+            out.append(prelude)
+        elif prelude.startswith('@'):
+            keyword = re.match(r'@([\w-]+)', prelude).group(1).lower()
+            if keyword in ('media', 'supports', 'layer', 'container'):
+                inner = trim_css(body, names, prefixes)
+                if inner:
+                    out.append(f'{prelude}{{{inner}}}')
+            else:
+                # @font-face, @keyframes, @page: kept as they are
+                out.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [
+                selector for selector in _split_selectors(prelude)
+                if all(_is_used(name, names, prefixes) for name in _selector_classes(selector))
+            ]
+            if selectors:
+                out.append(f"{','.join(selectors)}{{{body}}}")
+    return ''.join(out)
+
+
+# --- Building the bundle ---
+
+def _without_source_map(text):
+    # collectstatic would otherwise insist on the .map files being there too
+    return re.sub(r'[ \t]*(/[/*])# sourceMappingURL=\S+(\s*\*/)?', '', text)
+
+
+def _inter_css():
+    faces = []
+    for subset, unicode_range in INTER_SUBSETS.items():
+        for weight in INTER_WEIGHTS:
+            faces.append(
+                f"@font-face{{font-family:'Inter';font-style:normal;font-display:swap;font-weight:{weight};"
+                f"src:url(inter-{subset}-{weight}-normal.woff2) format('woff2');unicode-range:{unicode_range}}}"
+            )
+    return '\n'.join(faces) + '\n'
+
+
+def build(vendor_dir=VENDOR_DIR, bundle_dir=BUNDLE_DIR, trim=True):
+    """
+    Build the bundle from the vendored files. Returns ``(path, vendored
+    size, bundled size)`` for each vendored stylesheet and script.
+    """
+    vendor_dir, bundle_dir = Path(vendor_dir), Path(bundle_dir)
+    absent = missing(vendor_dir)
+    if absent:
+        raise AssetError(f"Vendored files are missing (run with --fetch): {', '.join(absent)}")
+    names, prefixes = used_names() if trim else (set(), ())
+
+    if bundle_dir.exists():
+        shutil.rmtree(bundle_dir)
+    report = []
+    for path in VENDOR_FILES:
+        source, target = vendor_dir / path, bundle_dir / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if source.suffix not in ('.css', '.js'):
+            shutil.copyfile(source, target)
+            continue
+        text = _without_source_map(source.read_text(encoding='utf-8'))
+        if trim and path in TRIMMED:
+            text = trim_css(text, names, prefixes)
+        target.write_text(text, encoding='utf-8')
+        report.append((path, source.stat().st_size, target.stat().st_size))
+
+    (bundle_dir / STYLESHEETS['inter'][0]).write_text(_inter_css(), encoding='utf-8')
+    return report
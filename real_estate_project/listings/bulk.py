@@ -0,0 +1,363 @@
+"""
+Bulk import and export of listings, for agencies with hundreds of them.
+
+Imports read CSV or JSON Lines one row at a time. Each row is checked with
+PropertyImportForm (PropertyForm's rules), and valid rows are written with
+bulk_create() in chunks, so memory stays flat however large the file is.
+Rows refer to their images by name; they are read from a directory or a
+zip archive and stored by a small thread pool while the following rows are
+still being read and validated. A row whose data or images are bad is reported with its
+line number and skipped; the rest of the file still imports.
+
+bulk_create() sends no signals, so each chunk does the work the post_save
+handlers would: full-text indexing and one image-processing job for the
+chunk. Once the import is done the listing caches and the similarity index
+are refreshed once. Imported listings reach users' recommendations at the
+next ``manage.py refresh_recommendations`` run.
+
+Exports stream a seller's listings in the same columns, so an export can be
+edited and imported again.
+"""
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import caching, fulltext, geo
+from .forms import PropertyImportForm
+from .jobs import enqueue
+from .models import Property, PropertyImage
+
+# Columns of an export, and the ones an import understands. Unknown columns
+# (like the exported id) are ignored on import.
+COLUMNS = [
+    'id', 'title', 'description', 'price', 'property_type', 'status', 'bedrooms', 'bathrooms',
+    'area_sqft', 'location', 'facing', 'is_published', 'main_image', 'images',
+]
+
+# Separator between gallery image names in the CSV "images" column
+IMAGE_SEPARATOR = '|'
+
+CHUNK_SIZE = 1000
+IMAGE_WORKERS = 8
+
+# Errors kept on a ListingImport; the counts are always exact
+MAX_REPORTED_ERRORS = 500
+
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+logger = logging.getLogger(__name__)
+
+
+class BulkImportError(Exception):
+    """Raised when an import can't start at all (unreadable file, bad archive)."""
+
+
+# --- Reading rows ---
+
+def detect_format(name):
+    return 'jsonl' if name.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(binary_file, fmt='csv'):
+    """Yield ``(line_number, row_dict)`` from a CSV or JSON Lines file object."""
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, {'__error__': f"Invalid JSON: {exc}"}
+                continue
+            yield line_number, row if isinstance(row, dict) else {'__error__': "Expected a JSON object."}
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # The header is line 1, so data starts on line 2
+            yield reader.line_num, row
+
+
+def _image_names(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(IMAGE_SEPARATOR)
+    return [str(name).strip() for name in value if str(name).strip()]
+
+
+def _form_data(row):
+    data = {key: '' if value is None else value for key, value in row.items() if key in COLUMNS}
+    published = str(data.get('is_published', '')).strip().lower()
+    # A missing column means published, like a listing added through the site
+    data['is_published'] = published not in FALSE_VALUES
+    return data
+
+
+# --- Image sources ---
+
+class DirectorySource:
+    """Images stored under a local directory."""
+
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+
+    def read(self, name):
+        path = (self.root / name).resolve()
+        if self.root not in path.parents:
+            raise FileNotFoundError(name)
+        return path.read_bytes()
+
+    def close(self):
+        pass
+
+
+class ArchiveSource:
+    """Images inside a zip archive. Reads are safe from several threads."""
+
+    def __init__(self, file):
+        try:
+            self.archive = zipfile.ZipFile(file)
+        except zipfile.BadZipFile as exc:
+            raise BulkImportError(f"Not a zip archive: {exc}")
+
+    def read(self, name):
+        try:
+            return self.archive.read(str(PurePosixPath(name)))
+        except KeyError:
+            raise FileNotFoundError(name)
+
+    def close(self):
+        self.archive.close()
+
+
+def open_image_source(path_or_file):
+    if path_or_file is None:
+        return None
+    if isinstance(path_or_file, (str, Path)) and os.path.isdir(path_or_file):
+        return DirectorySource(path_or_file)
+    return ArchiveSource(path_or_file)
+
+
+def _store_image(source, name):
+    """Copy one referenced image into storage. Returns its storage name."""
+    data = source.read(name)
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except Exception:
+        raise ValueError(f"{name} is not a valid image.")
+    upload_to = timezone.now().strftime(Property._meta.get_field('main_image').upload_to)
+    return default_storage.save(upload_to + os.path.basename(name), ContentFile(data))
+
+
+# --- Importing ---
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, messages):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': messages})
+
+
+class Importer:
+    """
+    Imports rows for ``seller``. ``images`` is a directory path, a zip file
+    path or an open zip file; ``on_error(line, messages)`` is called for each
+    rejected row in addition to the errors kept on the result.
+    """
+
+    def __init__(self, seller, images=None, chunk_size=CHUNK_SIZE, workers=IMAGE_WORKERS, on_error=None):
+        self.seller = seller
+        self.source = open_image_source(images)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.on_error = on_error
+        self.result = ImportResult()
+
+    def _reject(self, line, messages):
+        self.result.add_error(line, messages)
+        if self.on_error:
+            self.on_error(line, messages)
+
+    def run(self, rows):
+        try:
+            chunk = []
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for line, row in rows:
+                    prepared = self._prepare(line, row, pool)
+                    if prepared is not None:
+                        chunk.append(prepared)
+                    if len(chunk) >= self.chunk_size:
+                        self._write_chunk(chunk)
+                        chunk = []
+                if chunk:
+                    self._write_chunk(chunk)
+        finally:
+            if self.source:
+                self.source.close()
+
+        if self.result.imported:
+            caching.invalidate_listings()
+            enqueue('listings.build_similarity_index', unique=True)
+        return self.result
+
+    def _prepare(self, line, row, pool):
+        """
+        Validate a row and start copying its images in the background, so
+        they are stored while the rest of the chunk is being read.
+        """
+        if '__error__' in row:
+            self._reject(line, {'__all__': [row['__error__']]})
+            return None
+        form = PropertyImportForm(data=_form_data(row))
+        if not form.is_valid():
+            self._reject(line, {field: list(messages) for field, messages in form.errors.items()})
+            return None
+        names = _image_names(row.get('main_image'))[:1]
+        if not names:
+            self._reject(line, {'main_image': ["This field is required."]})
+            return None
+        names += _image_names(row.get('images'))
+        listing = form.save(commit=False)
+        listing.seller = self.seller
+        # bulk_create() skips the pre_save geocoding
+        geo.locate(listing)
+        # Every listing gets its own copy of its images, as if they had been uploaded
+        return line, listing, [pool.submit(self._fetch_image, name) for name in names]
+
+    def _fetch_image(self, name):
+        """Store one image. Returns its storage name, or the error as an exception."""
+        if self.source is None:
+            return ValueError("No image directory or archive was given.")
+        try:
+            return _store_image(self.source, name)
+        except FileNotFoundError:
+            return ValueError(f"{name} was not found.")
+        except ValueError as exc:
+            return exc
+
+    def _write_chunk(self, chunk):
+        accepted = []
+        for line, listing, futures in chunk:
+            images = [future.result() for future in futures]
+            problems = [str(image) for image in images if not isinstance(image, str)]
+            if problems:
+                for image in images:
+                    if isinstance(image, str):
+                        default_storage.delete(image)
+                self._reject(line, {'images': problems})
+                continue
+            listing.main_image = images[0]
+            accepted.append((listing, images[1:]))
+        if not accepted:
+            return
+
+        with transaction.atomic():
+            listings = Property.objects.bulk_create([listing for listing, _ in accepted])
+            PropertyImage.objects.bulk_create([
+                PropertyImage(property=listing, image=name)
+                for listing, gallery in accepted for name in gallery
+            ])
+            pks = [listing.pk for listing in listings]
+            fulltext.index_properties(pks)
+            enqueue('listings.process_imported_images', {'property_ids': pks})
+        self.result.imported += len(listings)
+
+
+def run_import(listing_import):
+    """Run a ListingImport uploaded through the site, recording the outcome on it."""
+    listing_import.status = 'running'
+    listing_import.save(update_fields=['status'])
+    archive = importer = None
+    try:
+        archive = default_storage.open(listing_import.archive, 'rb') if listing_import.archive else None
+        with default_storage.open(listing_import.source, 'rb') as source:
+            importer = Importer(listing_import.seller, images=archive)
+            result = importer.run(read_rows(source, detect_format(listing_import.source)))
+        listing_import.status = 'done'
+    except Exception as exc:
+        # Not retried: chunks written before the failure are already committed
+        logger.exception("Listing import %s failed", listing_import.pk)
+        result = importer.result if importer else ImportResult()
+        result.add_error(0, {'__all__': [f"The import stopped: {exc}"]})
+        listing_import.status = 'failed'
+    finally:
+        if archive is not None:
+            archive.close()
+        for name in (listing_import.source, listing_import.archive):
+            if name and default_storage.exists(name):
+                default_storage.delete(name)
+
+    listing_import.rows_imported = result.imported
+    listing_import.rows_failed = result.failed
+    listing_import.errors = result.errors
+    listing_import.finished_at = timezone.now()
+    listing_import.save()
+    return result
+
+
+# --- Exporting ---
+
+def export_rows(queryset, chunk_size=2000):
+    """Yield each listing of ``queryset`` as a dict of COLUMNS."""
+    listings = queryset.order_by('pk').prefetch_related('images').iterator(chunk_size=chunk_size)
+    for listing in listings:
+        yield {
+            'id': listing.pk,
+            'title': listing.title,
+            'description': listing.description,
+            'price': listing.price,
+            'property_type': listing.property_type,
+            'status': listing.status,
+            'bedrooms': listing.bedrooms,
+            'bathrooms': listing.bathrooms,
+            'area_sqft': listing.area_sqft,
+            'location': listing.location,
+            'facing': listing.facing,
+            'is_published': listing.is_published,
+            'main_image': listing.main_image.name,
+            'images': [image.image.name for image in listing.images.all()],
+        }
+
+
+class _Echo:
+    """A file-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        row['images'] = IMAGE_SEPARATOR.join(row['images'])
+        yield writer.writerow([row[column] if row[column] is not None else '' for column in COLUMNS])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        row['price'] = str(row['price'])
+        yield json.dumps(row) + '\n'
+
+
+def export_filename(fmt):
+    return f"listings-{datetime.date.today().isoformat()}.{fmt}"
@@ -0,0 +1,161 @@
+"""
+Page and fragment caching for the public listing pages.
+
+Cached entries are never deleted one by one. Instead their keys include a
+version number kept in the cache itself: one for the listings as a whole
+(home page sections, the buyer carousel) and one per property (its detail
+page). Saving or deleting a Property or PropertyImage bumps the relevant
+versions (see listings.signals), so the next request misses and renders
+fresh content while the stale entries simply expire.
+
+With more than one worker process the cache must be shared (the file or
+database backend, see CACHES in settings) for the versions to be too.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+
+LISTINGS_VERSION_KEY = 'listings:version'
+
+
+def _property_version_key(pk):
+    return f'listings:property:{pk}:version'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def listings_version():
+    """Version shared by every cached fragment that lists several properties."""
+    return _get_version(LISTINGS_VERSION_KEY)
+
+
+def property_version(pk):
+    return _get_version(_property_version_key(pk))
+
+
+def invalidate_property(pk):
+    """Expire everything cached about a property, once the change is committed."""
+    def bump():
+        _bump_version(LISTINGS_VERSION_KEY)
+        if pk is not None:
+            _bump_version(_property_version_key(pk))
+    transaction.on_commit(bump)
+
+
+def invalidate_listings():
+    """Expire the multi-listing fragments, e.g. after a bulk update."""
+    transaction.on_commit(lambda: _bump_version(LISTINGS_VERSION_KEY))
+
+
+def fragment_cache_context():
+    """Template context for ``{% cache fragment_cache_timeout name listings_version %}``."""
+    return {
+        'listings_version': listings_version(),
+        'fragment_cache_timeout': getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600),
+    }
+
+
+def is_fragment_cached(name, version):
+    """Whether ``{% cache ... name listings_version %}`` would be served from the cache."""
+    try:
+        fragment_cache = caches['template_fragments']
+    except InvalidCacheBackendError:
+        fragment_cache = cache
+    return fragment_cache.has_key(make_template_fragment_key(name, [version]))
+
+
+# --- Whole-page caching for anonymous visitors ---
+
+def _is_cacheable_request(request):
+    if request.method != 'GET' or request.user.is_authenticated:
+        return False
+    # A flash message is about to be shown to this visitor only
+    return not len(get_messages(request))
+
+
+def _is_cacheable_response(request, response):
+    session = getattr(request, 'session', None)
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # The page used {% csrf_token %}, so it carries a per-visitor token
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not (session is not None and session.modified)
+    )
+
+
+def page_cache_key(view_name, request, versions):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    version = '.'.join(str(v) for v in versions)
+    return f'page:{view_name}:{version}:{path}'
+
+
+def _cached_response(view, versions, request, args, kwargs):
+    """``(key, cached response)`` for a request, or ``(None, None)`` if it can't be cached."""
+    if not _is_cacheable_request(request):
+        return None, None
+    key = page_cache_key(view.__name__, request, versions(*args, **kwargs) if versions else ())
+    return key, cache.get(key)
+
+
+def _store_response(key, request, response, timeout):
+    if _is_cacheable_response(request, response):
+        page_timeout = timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+        cache.set(key, response, page_timeout)
+
+
+def cache_anonymous_page(versions=None, timeout=None):
+    """
+    Cache a view's whole response for anonymous visitors. ``versions`` is
+    called with the view's arguments and returns the version numbers the page
+    depends on, which become part of the cache key. Logged-in users, and
+    visitors with a pending flash message, always get a fresh render.
+    Works on sync and async views alike.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Load the user once, for the sync code below and the view alike
+                request.user = await request.auser()
+                # The session and (database) cache are only read synchronously
+                key, response = await sync_to_async(_cached_response)(view, versions, request, args, kwargs)
+                if response is not None:
+                    return response
+                response = await view(request, *args, **kwargs)
+                if key is not None:
+                    await sync_to_async(_store_response)(key, request, response, timeout)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key, response = _cached_response(view, versions, request, args, kwargs)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if key is not None:
+                _store_response(key, request, response, timeout)
+            return response
+        return wrapper
+    return decorator
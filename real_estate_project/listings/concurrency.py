@@ -0,0 +1,62 @@
+"""
+Running a view's independent database work at the same time.
+
+Django's async ORM (``afirst()``, ``async for``, ...) hands every query to
+the one thread that owns the request's database connection, so awaiting
+several of them with asyncio.gather() still runs them one after another.
+``gather()`` below runs each function in a thread of a pool of its own
+instead; connections are per thread in Django, so each function gets its
+own connection and the database works on them concurrently. A page then
+takes as long as its slowest query rather than the sum of them all.
+
+Only independent work belongs here: the functions don't share
+the request's transaction and each sees the database as of its own query.
+The pool is sized by CONCURRENT_QUERY_THREADS, which bounds the extra
+database connections each process may hold. Its connections are kept and
+recycled like a request thread's (CONN_MAX_AGE, health checks).
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'CONCURRENT_QUERY_THREADS', 8),
+            thread_name_prefix='queries',
+        )
+    return _executor
+
+
+def _with_connection_cleanup(function):
+    @wraps(function)
+    def wrapper():
+        # What request_started and request_finished do for a request's thread
+        close_old_connections()
+        try:
+            return function()
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+async def gather(*functions):
+    """
+    Call each of ``functions`` (without arguments) in the query pool, all at
+    once, and return their results in order. None stands in for a function
+    that doesn't need calling and gives None.
+    """
+    executor = _get_executor()
+    return await asyncio.gather(*(
+        sync_to_async(_with_connection_cleanup(function), thread_sensitive=False, executor=executor)()
+        if function is not None else asyncio.sleep(0)
+        for function in functions
+    ))
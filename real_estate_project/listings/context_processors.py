@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import UnreadCounter
+
+
+def unread_messages(request):
+    """
+    Adds ``unread_message_count`` for the navbar badge. It is lazy, so pages
+    that don't render the badge don't pay for the lookup.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'unread_message_count': 0}
+    return {'unread_message_count': SimpleLazyObject(lambda: UnreadCounter.get_count(user.pk))}
@@ -0,0 +1,151 @@
+"""
+Popularity counters on Property: detail page views, wishlist saves and
+inquiry messages.
+
+Views are far too frequent to write one UPDATE per request, and a popular
+listing would have every worker queueing on its row lock. Instead each
+process tallies views in memory and flushes them every few seconds (or once
+enough have piled up) as ``view_count = view_count + n`` UPDATEs, one per
+distinct increment rather than one per listing. A timer thread flushes the
+buffer when no later request does, so a quiet process still writes its views
+out within the interval. Views still in a buffer when a process dies are
+lost, which is fine for a popularity figure.
+
+Favorites are recounted from the wishlist table whenever it changes, so
+they can't drift; inquiries are counted by MessageModel.save(). Every change
+is also logged for the daily analytics rollups (listings.analytics).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Profile
+
+from . import analytics
+from .models import Property
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending_views = Counter()
+_last_flush = time.monotonic()
+_timer = None
+
+
+def record_view(property_id):
+    """Count one detail page view, flushing the buffer when it is due."""
+    global _last_flush
+    interval = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+    size = getattr(settings, 'VIEW_COUNT_FLUSH_SIZE', 500)
+    with _lock:
+        _pending_views[property_id] += 1
+        due = sum(_pending_views.values()) >= size or time.monotonic() - _last_flush >= interval
+        if due:
+            _last_flush = time.monotonic()
+        else:
+            _schedule_flush(interval)
+    if due:
+        flush_views()
+
+
+def _schedule_flush(interval):
+    """Start the timer that flushes the buffer if no request does first. Call with _lock held."""
+    global _timer
+    # A forked worker inherits _timer but not its thread
+    if _timer is None or not _timer.is_alive():
+        _timer = threading.Timer(interval, _timed_flush)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _timed_flush():
+    global _last_flush
+    with _lock:
+        _last_flush = time.monotonic()
+    try:
+        flush_views()
+    finally:
+        # The connection this thread opened
+        connections.close_all()
+
+
+def pending_views():
+    """A copy of this process's unflushed view counts."""
+    with _lock:
+        return dict(_pending_views)
+
+
+def flush_views():
+    """Write this process's buffered views to the database. Returns how many."""
+    with _lock:
+        batch = dict(_pending_views)
+        _pending_views.clear()
+    if not batch:
+        return 0
+
+    by_increment = defaultdict(list)
+    for property_id, views in batch.items():
+        by_increment[views].append(property_id)
+    try:
+        with transaction.atomic():
+            for views, property_ids in by_increment.items():
+                Property.objects.filter(pk__in=property_ids).update(view_count=F('view_count') + views)
+            # Listings deleted since they were viewed have nothing to log against
+            existing = Property.objects.filter(pk__in=batch).values_list('pk', flat=True)
+            analytics.record_many((property_id, 'view', batch[property_id]) for property_id in existing)
+    except Exception:
+        # Put the views back for the next flush rather than lose them
+        logger.exception("Flushing view counts failed")
+        with _lock:
+            _pending_views.update(batch)
+        return 0
+    return sum(batch.values())
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush_views()
+    except Exception:
+        pass
+
+
+def count_listing_view(view):
+    """
+    Record a view of the listing ``pk`` for every successful GET. Applied
+    outside the page cache so cached responses are counted too.
+    """
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        response = view(request, pk, *args, **kwargs)
+        if request.method == 'GET' and response.status_code == 200:
+            record_view(pk)
+        return response
+    return wrapper
+
+
+def recount_favorites(property_ids):
+    """
+    Set favorite_count from the wishlist table for the given listings, and
+    log the net change for the analytics rollups.
+    """
+    property_ids = list(property_ids)
+    if not property_ids:
+        return
+    listings = Property.objects.filter(pk__in=property_ids)
+    saves = (
+        Profile.wishlist.through.objects.filter(property_id=OuterRef('pk'))
+        .order_by().values('property_id').annotate(total=Count('*')).values('total')
+    )
+    before = dict(listings.values_list('pk', 'favorite_count'))
+    listings.update(favorite_count=Coalesce(Subquery(saves), 0))
+    after = listings.values_list('pk', 'favorite_count')
+    analytics.record_many((pk, 'favorite', count - before.get(pk, 0)) for pk, count in after)
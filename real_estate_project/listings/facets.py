@@ -0,0 +1,203 @@
+"""
+Counts for the buyer filter bar: how many listings each property type,
+status, bedroom count, price band and location would show.
+
+Counts are disjunctive, as shoppers expect: the counts of one facet ignore
+that facet's own selection (with "House" picked, "Land" still shows how many
+lands there are) but respect every other one. All of them come from one
+grouped query over the published listings, grouped by the five facet
+dimensions; each facet is then folded from those groups in Python. Filters
+the groups can't answer (bathrooms, area, map area, a price that isn't a
+band edge) narrow the query itself.
+
+The grouped rows are cached under the listings cache version
+(listings.caching), which every listing change bumps, so most requests don't
+query at all.
+"""
+import hashlib
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.db.models.functions import Coalesce, Least, Lower
+
+from .caching import listings_version
+from .models import Property
+from .search import search_properties
+
+# Edges of the price bands, in rupees
+PRICE_EDGES = [Decimal(2_500_000), Decimal(5_000_000), Decimal(10_000_000), Decimal(20_000_000)]
+PRICE_BANDS = [
+    (None, PRICE_EDGES[0], 'Under ₹25 L'),
+    (PRICE_EDGES[0], PRICE_EDGES[1], '₹25 L – 50 L'),
+    (PRICE_EDGES[1], PRICE_EDGES[2], '₹50 L – 1 Cr'),
+    (PRICE_EDGES[2], PRICE_EDGES[3], '₹1 – 2 Cr'),
+    (PRICE_EDGES[3], None, 'Over ₹2 Cr'),
+]
+
+# Bedroom counts are grouped up to this many ("5+")
+MAX_BEDROOMS = 5
+
+TOP_LOCATIONS = 8
+
+FACETS = ('property_type', 'status', 'bedrooms', 'price', 'location')
+
+
+def _price_slot(edge_index):
+    """
+    Prices are grouped into slots that keep each edge on its own: slot 0 is
+    below the first edge, slot 1 is exactly the first edge, slot 2 is between
+    the first and second, and so on. Inclusive min/max price filters on edges
+    are then exact unions of slots.
+    """
+    return 2 * edge_index + 1
+
+
+def _price_slot_expression():
+    whens = []
+    for i, edge in enumerate(PRICE_EDGES):
+        whens.append(When(price__lt=edge, then=Value(_price_slot(i) - 1)))
+        whens.append(When(price=edge, then=Value(_price_slot(i))))
+    return Case(*whens, default=Value(_price_slot(len(PRICE_EDGES)) - 1), output_field=IntegerField())
+
+
+def _split_filters(filters):
+    """
+    Split search filters into tests on grouped rows, by facet, and the
+    filters the query has to apply itself.
+    """
+    sql = {key: value for key, value in filters.items() if value not in (None, '')}
+    tests = {}
+
+    if sql.get('property_type'):
+        property_type = sql.pop('property_type')
+        tests['property_type'] = lambda row: row['property_type'] == property_type
+    if sql.get('status'):
+        status = sql.pop('status')
+        tests['status'] = lambda row: row['status'] == status
+    if sql.get('location', '').strip():
+        # Anywhere in the location, like listings.search
+        term = sql.pop('location').strip().lower()
+        tests['location'] = lambda row: term in row['location']
+    if sql.get('min_bedrooms') is not None and sql['min_bedrooms'] <= MAX_BEDROOMS:
+        minimum = sql.pop('min_bedrooms')
+        tests['bedrooms'] = lambda row: row['bedrooms'] >= minimum
+
+    min_price, max_price = sql.get('min_price'), sql.get('max_price')
+    if {min_price, max_price} - {None} <= set(PRICE_EDGES) and (min_price or max_price):
+        sql.pop('min_price', None)
+        sql.pop('max_price', None)
+        low = _price_slot(PRICE_EDGES.index(min_price)) if min_price is not None else None
+        high = _price_slot(PRICE_EDGES.index(max_price)) if max_price is not None else None
+        tests['price'] = lambda row: (low is None or row['price'] >= low) and (high is None or row['price'] <= high)
+
+    sql.pop('sort', None)
+    return tests, sql
+
+
+def grouped_counts(sql_filters):
+    """Published listings matching ``sql_filters``, counted per facet group."""
+    key = hashlib.md5(repr(sorted(sql_filters.items())).encode()).hexdigest()
+    cache_key = f'facets:{listings_version()}:{key}'
+    rows = cache.get(cache_key)
+    if rows is None:
+        queryset, _ = search_properties(sql_filters)
+        rows = list(
+            queryset
+            .annotate(
+                facet_bedrooms=Least(Coalesce('bedrooms', Value(-1)), Value(MAX_BEDROOMS)),
+                facet_price=_price_slot_expression(),
+                facet_location=Lower('location'),
+            )
+            .values('property_type', 'status', 'facet_bedrooms', 'facet_price', 'facet_location')
+            .annotate(count=Count('id'))
+            .order_by()
+            .values_list('property_type', 'status', 'facet_bedrooms', 'facet_price', 'facet_location', 'count')
+        )
+        cache.set(cache_key, rows, getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600))
+    return rows
+
+
+def facet_counts(filters):
+    """
+    ``(total, counts)`` for the cleaned filters of a PropertySearchForm:
+    the number of matching listings, and a Counter per facet of what each of
+    its values would match given the other facets' selections.
+    """
+    tests, sql_filters = _split_filters(filters)
+    counts = {facet: Counter() for facet in FACETS}
+    total = 0
+    for property_type, status, bedrooms, price, location, count in grouped_counts(sql_filters):
+        row = {'property_type': property_type, 'status': status, 'bedrooms': bedrooms, 'price': price, 'location': location}
+        failed = [facet for facet, test in tests.items() if not test(row)]
+        if len(failed) > 1:
+            continue
+        if not failed:
+            total += count
+        for facet in failed or FACETS:
+            counts[facet][row[facet]] += count
+    return total, counts
+
+
+def facet_bar(filters, query):
+    """
+    The filter bar's options, each with its count, whether it is selected and
+    the query string that selects it (or clears it, if it is selected).
+    ``query`` is the page's request.GET.
+    """
+    total, counts = facet_counts(filters)
+
+    def option(label, count, selected, **params):
+        link = query.copy()
+        # A new selection starts from the first page; "type" is the old name of property_type
+        for key in ('after', 'before', 'type'):
+            link.pop(key, None)
+        for key, value in params.items():
+            if selected or value is None:
+                link.pop(key, None)
+            else:
+                link[key] = value
+        return {'label': label, 'count': count, 'selected': selected, 'query': f'?{link.urlencode()}'}
+
+    bedrooms = counts['bedrooms']
+    min_bedrooms = filters.get('min_bedrooms')
+    price_slots = counts['price']
+    location = (filters.get('location') or '').strip().lower()
+    top_locations = [name for name, _ in counts['location'].most_common(TOP_LOCATIONS)]
+    if location and location not in top_locations:
+        top_locations.append(location)
+
+    def band_count(low, high):
+        first = _price_slot(PRICE_EDGES.index(low)) if low is not None else 0
+        last = _price_slot(PRICE_EDGES.index(high)) if high is not None else _price_slot(len(PRICE_EDGES))
+        return sum(count for slot, count in price_slots.items() if first <= slot <= last)
+
+    return {
+        'total': total,
+        'property_type': [
+            option(label, counts['property_type'][value], filters.get('property_type') == value, property_type=value)
+            for value, label in Property.PROPERTY_TYPE_CHOICES
+        ],
+        'status': [
+            option(label, counts['status'][value], filters.get('status') == value, status=value)
+            for value, label in Property.STATUS_CHOICES
+        ],
+        'bedrooms': [
+            option(f'{n}+', sum(c for beds, c in bedrooms.items() if beds >= n), min_bedrooms == n, min_bedrooms=n)
+            for n in range(1, MAX_BEDROOMS + 1)
+        ],
+        'price': [
+            option(
+                label, band_count(low, high),
+                filters.get('min_price') == low and filters.get('max_price') == high,
+                min_price=low, max_price=high,
+            )
+            for low, high, label in PRICE_BANDS
+        ],
+        'location': [
+            option(name.title(), counts['location'][name], name == location, location=name.title())
+            for name in top_locations
+        ],
+    }
@@ -26,4 +26,94 @@ class PropertyForm(forms.ModelForm):
             'location': forms.TextInput(attrs={'class': 'w-full p-2 border rounded'}),
             'facing': forms.TextInput(attrs={'class': 'w-full p-2 border rounded', 'placeholder': 'e.g., South, East'}),
             'main_image': forms.FileInput(attrs={'class': 'w-full p-2 border rounded'}),
-        }
\ No newline at end of file
+        }
+
+class PropertyImportForm(PropertyForm):
+    """
+    PropertyForm's rules applied to one row of a bulk import. Images are
+    referenced by name in the row and fetched separately (see listings.bulk).
+    """
+    class Meta(PropertyForm.Meta):
+        fields = [name for name in PropertyForm.Meta.fields if name != 'main_image'] + ['is_published']
+        widgets = {}
+
+
+class ListingImportUploadForm(forms.Form):
+    source = forms.FileField(help_text="A .csv or .jsonl file, one listing per row.")
+    images = forms.FileField(required=False, help_text="Optional .zip archive with the images the rows refer to.")
+
+    def clean_source(self):
+        source = self.cleaned_data['source']
+        if not source.name.lower().endswith(('.csv', '.jsonl', '.ndjson')):
+            raise forms.ValidationError("Upload a .csv or .jsonl file.")
+        return source
+
+    def clean_images(self):
+        images = self.cleaned_data.get('images')
+        if images and not images.name.lower().endswith('.zip'):
+            raise forms.ValidationError("Images must be uploaded as a .zip archive.")
+        return images
+
+
+class PropertySearchForm(forms.Form):
+    """
+    Validates the query string of the structured property search endpoint.
+    Every field is optional; empty fields simply don't filter.
+    """
+    SORT_CHOICES = [
+        ('newest', 'Newest first'),
+        ('price_asc', 'Price: low to high'),
+        ('price_desc', 'Price: high to low'),
+        ('largest', 'Largest area first'),
+        ('most_viewed', 'Most viewed'),
+        ('most_saved', 'Most saved'),
+    ]
+
+    min_price = forms.DecimalField(required=False, min_value=0, max_digits=12, decimal_places=2)
+    max_price = forms.DecimalField(required=False, min_value=0, max_digits=12, decimal_places=2)
+    property_type = forms.ChoiceField(required=False, choices=[('', 'Any')] + Property.PROPERTY_TYPE_CHOICES)
+    status = forms.ChoiceField(required=False, choices=[('', 'Any')] + Property.STATUS_CHOICES)
+    min_bedrooms = forms.IntegerField(required=False, min_value=0)
+    min_bathrooms = forms.IntegerField(required=False, min_value=0)
+    min_area = forms.IntegerField(required=False, min_value=0)
+    max_area = forms.IntegerField(required=False, min_value=0)
+    location = forms.CharField(required=False, max_length=255)
+    # Near a point (radius_km defaults to DEFAULT_RADIUS_KM), or inside a
+    # "south,west,north,east" bounding box
+    lat = forms.FloatField(required=False, min_value=-90, max_value=90)
+    lng = forms.FloatField(required=False, min_value=-180, max_value=180)
+    radius_km = forms.FloatField(required=False, min_value=0.1, max_value=500)
+    bbox = forms.CharField(required=False, max_length=100)
+    sort = forms.ChoiceField(required=False, choices=SORT_CHOICES)
+
+    DEFAULT_RADIUS_KM = 10
+
+    def clean_bbox(self):
+        value = self.cleaned_data['bbox']
+        if not value:
+            return None
+        try:
+            south, west, north, east = (float(part) for part in value.split(','))
+        except ValueError:
+            raise forms.ValidationError("Enter four numbers: south,west,north,east.")
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            raise forms.ValidationError("Enter a valid bounding box: south,west,north,east.")
+        return south, west, north, east
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lat, lng = cleaned_data.get('lat'), cleaned_data.get('lng')
+        if (lat is None) != (lng is None):
+            raise forms.ValidationError("Give both lat and lng to search near a point.")
+        if cleaned_data.get('radius_km') is not None and lat is None:
+            raise forms.ValidationError("radius_km needs lat and lng.")
+        if lat is not None and cleaned_data.get('radius_km') is None:
+            cleaned_data['radius_km'] = self.DEFAULT_RADIUS_KM
+        min_price, max_price = cleaned_data.get('min_price'), cleaned_data.get('max_price')
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise forms.ValidationError("Minimum price cannot be greater than maximum price.")
+        min_area, max_area = cleaned_data.get('min_area'), cleaned_data.get('max_area')
+        if min_area is not None and max_area is not None and min_area > max_area:
+            raise forms.ValidationError("Minimum area cannot be greater than maximum area.")
+        cleaned_data['sort'] = cleaned_data.get('sort') or 'newest'
+        return cleaned_data
@@ -0,0 +1,178 @@
+"""
+Full-text search over Property.title, description and location.
+
+PostgreSQL keeps a generated ``search_vector`` tsvector column with a GIN
+index (created by migration 0008), so there is nothing to maintain from
+Python. SQLite, used in development and tests, has no tsvector; instead an
+FTS5 shadow table holds a copy of the searchable text for published listings
+and is kept in sync by the signal handlers in listings.signals.
+
+Both backends are hidden behind search(), which returns ranked results with
+highlighted snippets.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Property
+
+FTS_TABLE = 'listings_property_fts'
+
+# Control characters used as highlight markers inside the database, so the
+# snippet can be HTML-escaped before they are swapped for <mark> tags.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchResult:
+    """A matched property together with its relevance and a highlighted snippet."""
+
+    def __init__(self, property, rank, snippet):
+        self.property = property
+        self.rank = rank
+        self.snippet = snippet
+
+
+def _highlight(text):
+    text = escape(text or '')
+    return mark_safe(text.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>'))
+
+
+def _fts5_query(query):
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word must match,
+    and the last word also matches as a prefix so results appear while typing.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+# --- Index maintenance (SQLite only) ---
+
+def uses_fts5():
+    return connection.vendor == 'sqlite'
+
+
+def index_property(property_obj):
+    """Add, refresh or drop a listing's row in the FTS5 table."""
+    if not uses_fts5():
+        return
+    if not property_obj.is_published:
+        remove_property(property_obj.pk)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)',
+            [property_obj.pk, property_obj.title, property_obj.description, property_obj.location],
+        )
+
+
+def remove_property(pk):
+    if not uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def index_properties(pks):
+    """Add many listings at once, e.g. rows written by bulk_create()."""
+    pks = list(pks)
+    if not uses_fts5() or not pks:
+        return
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, title, description, location) '
+            f'SELECT id, title, description, location FROM {Property._meta.db_table} '
+            f'WHERE is_published AND id IN ({placeholders})',
+            pks,
+        )
+
+
+def rebuild_index():
+    """Repopulate the FTS5 table from scratch, e.g. after a bulk import."""
+    if not uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, location) '
+            f'SELECT id, title, description, location FROM {Property._meta.db_table} WHERE is_published'
+        )
+
+
+# --- Querying ---
+
+def _search_sqlite(query, limit):
+    match = _fts5_query(query)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        # bm25() is lower-is-better; titles and locations weigh more than descriptions.
+        cursor.execute(
+            f"SELECT rowid, -bm25({FTS_TABLE}, 10.0, 1.0, 5.0) AS rank, "
+            f"snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, 10.0, 1.0, 5.0) LIMIT %s",
+            [HIGHLIGHT_START, HIGHLIGHT_STOP, match, limit],
+        )
+        return cursor.fetchall()
+
+
+def _search_postgresql(query, limit):
+    table = Property._meta.db_table
+    with connection.cursor() as cursor:
+        # Rank and limit in the inner query so ts_headline only runs on the rows returned.
+        cursor.execute(
+            f"SELECT hit.id, hit.rank, ts_headline('english', "
+            f"hit.title || ' — ' || hit.location || ' — ' || hit.description, hit.query, %s) "
+            f"FROM (SELECT p.id, p.title, p.location, p.description, q.query, "
+            f"ts_rank_cd(p.search_vector, q.query) AS rank "
+            f"FROM {table} p, websearch_to_tsquery('english', %s) AS q(query) "
+            f"WHERE p.is_published AND p.search_vector @@ q.query "
+            f"ORDER BY rank DESC, p.id DESC LIMIT %s) hit "
+            f"ORDER BY hit.rank DESC, hit.id DESC",
+            [
+                f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=24, MinWords=8, MaxFragments=2',
+                query,
+                limit,
+            ],
+        )
+        return cursor.fetchall()
+
+
+def _search_fallback(query, limit):
+    # Other databases: unranked substring match, highlighting nothing.
+    matches = Property.objects.filter(is_published=True, title__icontains=query).order_by('-list_date')
+    return [(p.pk, 0.0, p.title) for p in matches[:limit]]
+
+
+def search(query, limit=50):
+    """
+    Return up to ``limit`` SearchResult objects for free-text ``query``,
+    most relevant first.
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+
+    if connection.vendor == 'sqlite':
+        hits = _search_sqlite(query, limit)
+    elif connection.vendor == 'postgresql':
+        hits = _search_postgresql(query, limit)
+    else:
+        hits = _search_fallback(query, limit)
+
+    properties = Property.objects.filter(is_published=True).in_bulk([pk for pk, _, _ in hits])
+    return [
+        SearchResult(properties[pk], rank, _highlight(snippet))
+        for pk, rank, snippet in hits
+        if pk in properties
+    ]
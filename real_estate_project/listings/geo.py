@@ -0,0 +1,308 @@
+"""
+Coordinates for listings, and queries by distance and by map area.
+
+Locations are geocoded offline against a gazetteer bundled with the app
+(``listings/data/gazetteer.csv``: cities, and localities within them), so
+saving a listing never waits on a network service. A location like
+"Madhapur, Hyderabad" resolves to the locality, and falls back to the city
+when the locality isn't known.
+
+Each geocoded listing also stores the geohash of its coordinates. Geohashes
+of nearby points share prefixes, so an area on the map is covered by a few
+geohash cells and each cell is a range scan on the geohash index; the exact
+bounding box and distance checks then only run over the rows in those
+cells. The same prefixes group listings into the clusters of the map tiles.
+"""
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import Avg, Count, FloatField, Min, Q, Value
+from django.db.models.functions import ACos, Cos, Greatest, Least, Radians, Sin, Substr
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Stored geohash length: about 3.7 cm x 1.9 cm, finer than any location needs
+GEOHASH_PRECISION = 12
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Most geohash cells a bounding box is covered with; more cells mean more,
+# smaller index range scans, fewer mean rows outside the box are read
+MAX_COVER_CELLS = 16
+
+# Map tiles are split into about this many clusters across
+TILE_CLUSTERS_ACROSS = 8
+MAX_TILE_ZOOM = 20
+
+
+# --- Geocoding ---
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', re.sub(r'[.’\']', '', text or '')).strip().lower()
+
+
+@lru_cache(maxsize=None)
+def gazetteer():
+    """
+    ``(places, localities)``: place name or alias -> coordinates, with cities
+    taking precedence, and ``(locality, city)`` -> coordinates.
+    """
+    places, localities = {}, {}
+    with open(GAZETTEER_PATH, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            point = (float(row['latitude']), float(row['longitude']))
+            names = [row['name']] + [alias for alias in row['aliases'].split('|') if alias]
+            parent = _normalize(row['parent'])
+            for name in map(_normalize, names):
+                if parent:
+                    localities[name, parent] = point
+                    places.setdefault(name, point)
+                else:
+                    places[name] = point
+    return places, localities
+
+
+def geocode(location):
+    """``(latitude, longitude)`` for a free-text location, or None if unknown."""
+    places, localities = gazetteer()
+    parts = [part for part in map(_normalize, (location or '').split(',')) if part]
+    for i, part in enumerate(parts):
+        # "Thane, Mumbai" is the Thane locality; "Thane" alone is any Thane
+        for parent in parts[i + 1:]:
+            if (part, parent) in localities:
+                return localities[part, parent]
+        if part in places:
+            return places[part]
+    return None
+
+
+def locate(property_obj):
+    """Set a listing's coordinates and geohash from its location."""
+    point = geocode(property_obj.location)
+    property_obj.latitude, property_obj.longitude = point if point else (None, None)
+    property_obj.geohash = encode(*point) if point else ''
+    return point is not None
+
+
+# --- Geohashes ---
+
+def _bits(precision):
+    """Bits of longitude and latitude in a geohash of ``precision`` characters."""
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def cell_size(precision):
+    """``(height, width)`` of a geohash cell in degrees."""
+    lng_bits, lat_bits = _bits(precision)
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, value, bit, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[value])
+            value, bit = 0, 0
+    return ''.join(chars)
+
+
+def bounds(geohash):
+    """``(south, west, north, east)`` of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def _successor(geohash):
+    """The first geohash of the same length after ``geohash``, or None at the end."""
+    chars = list(geohash)
+    for i in range(len(chars) - 1, -1, -1):
+        position = BASE32.index(chars[i])
+        if position < len(BASE32) - 1:
+            chars[i] = BASE32[position + 1]
+            return ''.join(chars[:i + 1])
+        chars[i] = BASE32[0]
+    return None
+
+
+def cover(south, west, north, east, max_cells=MAX_COVER_CELLS):
+    """
+    The geohash cells covering a bounding box that doesn't cross the
+    antimeridian: the longest prefixes for which no more than ``max_cells``
+    are needed (always at least the cells of the box's corners).
+    """
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        columns = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * columns <= max_cells:
+            break
+        precision -= 1
+    height, width = cell_size(precision)
+    cells = set()
+    latitude = south
+    while True:
+        longitude = west
+        while True:
+            cells.add(encode(latitude, longitude, precision))
+            if longitude >= east:
+                break
+            longitude = min(longitude + width, east)
+        if latitude >= north:
+            break
+        latitude = min(latitude + height, north)
+    return sorted(cells)
+
+
+def prefix_ranges(cells):
+    """Merge sorted, equal-length geohash cells into ``[low, high)`` ranges."""
+    ranges = []
+    for cell in cells:
+        following = _successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = following
+        else:
+            ranges.append([cell, following])
+    return ranges
+
+
+def _ranges_filter(ranges):
+    condition = Q()
+    for low, high in ranges:
+        # Each range is one search of the (partial) geohash index. SQLite only
+        # uses a partial index for a branch of an OR that repeats its condition.
+        branch = Q(is_published=True, geohash__gte=low)
+        condition |= branch & Q(geohash__lt=high) if high else branch
+    return condition
+
+
+# --- Queries ---
+
+def _split_bbox(south, west, north, east):
+    """A bounding box as boxes that don't cross the antimeridian."""
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def within_bbox(queryset, south, west, north, east):
+    """Published listings inside a bounding box; ``west > east`` crosses the antimeridian."""
+    condition = Q()
+    for box in _split_bbox(south, west, north, east):
+        s, w, n, e = box
+        condition |= _ranges_filter(prefix_ranges(cover(*box))) & Q(
+            latitude__gte=s, latitude__lte=n, longitude__gte=w, longitude__lte=e,
+        )
+    return queryset.filter(condition)
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """The bounding box of a circle, clamped at the poles."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    lng_delta = math.degrees(radius_km / EARTH_RADIUS_KM / math.cos(math.radians(latitude)))
+    if lng_delta >= 180.0:
+        return south, -180.0, north, 180.0
+    west, east = longitude - lng_delta, longitude + lng_delta
+    # Wrap across the antimeridian into a west > east box
+    return south, (west + 540.0) % 360.0 - 180.0, north, (east + 540.0) % 360.0 - 180.0
+
+
+def distance_km(latitude, longitude):
+    """Great-circle distance from a point, as a query expression."""
+    cosine = (
+        Sin(Radians('latitude')) * Value(math.sin(math.radians(latitude)))
+        + Cos(Radians('latitude')) * Value(math.cos(math.radians(latitude)))
+        * Cos(Radians('longitude') - Value(math.radians(longitude)))
+    )
+    # Rounding can push the cosine of a zero distance just past 1
+    clamped = Greatest(Least(cosine, Value(1.0)), Value(-1.0), output_field=FloatField())
+    return ACos(clamped) * Value(EARTH_RADIUS_KM)
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """Published listings within ``radius_km`` of a point, annotated with ``distance_km``."""
+    queryset = within_bbox(queryset, *radius_bbox(latitude, longitude, radius_km))
+    return queryset.annotate(distance_km=distance_km(latitude, longitude)).filter(distance_km__lte=radius_km)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# --- Map tiles ---
+
+def tile_bbox(z, x, y):
+    """``(south, west, north, east)`` of a Web Mercator (slippy map) tile."""
+    n = 2 ** z
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0
+
+
+def cluster_precision(z):
+    """The geohash length whose cells are about 1/TILE_CLUSTERS_ACROSS of a tile wide."""
+    target = 360.0 / 2 ** z / TILE_CLUSTERS_ACROSS
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if cell_size(precision)[1] <= target:
+            return precision
+    return GEOHASH_PRECISION
+
+
+def tile_clusters(queryset, z, x, y):
+    """
+    Listing counts of a map tile, grouped by geohash cell. Each cluster has
+    its count and the mean position of its listings; a cluster of one also
+    has the listing's id.
+    """
+    precision = cluster_precision(z)
+    rows = (
+        within_bbox(queryset, *tile_bbox(z, x, y))
+        .annotate(cell=Substr('geohash', 1, precision))
+        .values('cell')
+        .annotate(count=Count('id'), mean_lat=Avg('latitude'), mean_lng=Avg('longitude'), first_id=Min('id'))
+        .order_by('cell')
+    )
+    return [
+        {
+            'geohash': row['cell'],
+            'count': row['count'],
+            'latitude': round(row['mean_lat'], 6),
+            'longitude': round(row['mean_lng'], 6),
+            **({'id': row['first_id']} if row['count'] == 1 else {}),
+        }
+        for row in rows
+    ]
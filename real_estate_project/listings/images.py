@@ -0,0 +1,148 @@
+"""
+Derivative images ("renditions") for listing photos.
+
+Uploads are kept untouched; each one gets a fixed set of resized copies in
+WebP and JPEG stored next to it under ``renditions/<name>/``, mirroring the
+original's path. Templates pick the smallest rendition that fits via the
+tags in listings.templatetags.listing_images.
+"""
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# name -> (width, height, crop). Cropped renditions are cut to the exact box,
+# the others are scaled down to fit inside it keeping their aspect ratio.
+RENDITIONS = {
+    'thumb': (160, 120, True),
+    'card': (640, 420, True),
+    'detail': (1200, 800, False),
+    'carousel': (1920, 1080, False),
+}
+
+# Renditions offered to the browser in srcset when a given one is requested
+SRCSETS = {
+    'thumb': ('thumb', 'card'),
+    'card': ('card', 'detail'),
+    'detail': ('card', 'detail', 'carousel'),
+    'carousel': ('detail', 'carousel'),
+}
+
+# Default ``sizes`` attribute matching the layout each rendition is used in
+SIZES = {
+    'thumb': '120px',
+    'card': '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw',
+    'detail': '(min-width: 992px) 58vw, 100vw',
+    'carousel': '100vw',
+}
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def rendition_name(source_name, rendition, fmt='jpeg'):
+    """Storage path of a rendition of ``source_name``."""
+    stem, _ = os.path.splitext(source_name)
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f'renditions/{rendition}/{stem}.{extension}'
+
+
+def has_renditions(source_name, storage=default_storage):
+    """Renditions are written together, so checking one is enough."""
+    return storage.exists(rendition_name(source_name, 'card'))
+
+
+def strip_exif(source_name, storage=default_storage):
+    """
+    Rewrite an upload without its EXIF block (camera details, GPS position),
+    rotating the pixels first so the photo keeps its intended orientation.
+    Files without EXIF data are left untouched.
+    """
+    with storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+    if not image.getexif() and 'exif' not in image.info:
+        return False
+
+    original_format = image.format or 'JPEG'
+    image = ImageOps.exif_transpose(image)
+    if original_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format=original_format, quality=90)
+
+    replace(source_name, buffer.getvalue(), storage)
+    return True
+
+
+def replace(name, data, storage=default_storage):
+    """
+    Write ``data`` to ``name``, overwriting any file there so that readers
+    see either the old file or the new one, never a missing or partial one.
+    (Storage.save() never overwrites; it would pick a new name instead.)
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # Object stores (S3 and the like) replace an object in a single upload
+        with storage.open(name, 'wb') as target:
+            target.write(data)
+        return name
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as target:
+            target.write(data)
+        # mkstemp() creates the file readable by its owner only
+        if os.path.exists(path):
+            shutil.copymode(path, temporary)
+        else:
+            os.chmod(temporary, storage.file_permissions_mode or 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return name
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return resized
+
+
+def generate_renditions(source_name, storage=default_storage):
+    """
+    Write every rendition of ``source_name`` in every format, replacing any
+    previous copies. Returns the list of storage names written.
+    """
+    with storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+
+    written = []
+    for rendition, (width, height, crop) in RENDITIONS.items():
+        resized = _resize(image, width, height, crop)
+        for fmt, save_options in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **save_options)
+            written.append(replace(rendition_name(source_name, rendition, fmt), buffer.getvalue(), storage))
+    return written
+
+
+def delete_renditions(source_name, storage=default_storage):
+    for rendition in RENDITIONS:
+        for fmt in FORMATS:
+            name = rendition_name(source_name, rendition, fmt)
+            if storage.exists(name):
+                storage.delete(name)
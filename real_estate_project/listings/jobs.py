@@ -0,0 +1,132 @@
+"""
+A small database-backed job queue.
+
+Functions are registered as tasks with the @task decorator (by convention in
+an app's ``tasks.py``) and scheduled with enqueue(). Because the job row is
+written in the caller's transaction, a job never runs before the data it
+refers to is committed, and is dropped if that transaction rolls back.
+
+``manage.py run_worker`` claims and runs jobs; failed jobs are retried with
+exponential backoff until they run out of attempts. The worker also requeues
+jobs left running by a dead worker and deletes old finished jobs as it goes.
+"""
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(name):
+    """Register the decorated function as the task called ``name``."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def autodiscover():
+    """Import every installed app's tasks module so its tasks get registered."""
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, payload=None, delay=None, max_attempts=None, unique=False):
+    """
+    Schedule task ``name`` to run with keyword arguments ``payload``. With
+    ``unique``, an identical job still waiting to run is reused instead.
+    """
+    if unique:
+        pending = Job.objects.filter(name=name, payload=payload or {}, status='pending').first()
+        if pending is not None:
+            return pending
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_after=timezone.now() + (delay or datetime.timedelta()),
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def claim_next(worker_id, batch=10):
+    """
+    Atomically take the oldest runnable job, or return None.
+
+    The claim is a conditional UPDATE on status, so when several workers race
+    for the same row exactly one of them wins, on any database.
+    """
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status='pending', run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('pk', flat=True)[:batch]
+    )
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status='pending').update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 10)
+    return datetime.timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def run(job):
+    """Execute a claimed job and record the outcome."""
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise UnknownTask(f"No task registered as {job.name!r}")
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if func is not None and job.attempts < job.max_attempts:
+            logger.warning("Job %s failed (attempt %s/%s), retrying", job, job.attempts, job.max_attempts)
+            Job.objects.filter(pk=job.pk).update(
+                status='pending', locked_by='', locked_at=None, last_error=error,
+                run_after=timezone.now() + retry_delay(job.attempts), updated_at=timezone.now(),
+            )
+        else:
+            logger.error("Job %s failed permanently after %s attempts", job, job.attempts)
+            Job.objects.filter(pk=job.pk).update(status='failed', last_error=error, updated_at=timezone.now())
+        return False
+
+    Job.objects.filter(pk=job.pk).update(status='done', last_error='', updated_at=timezone.now())
+    return True
+
+
+def requeue_stale(timeout=None):
+    """
+    Put back jobs whose worker died mid-run. Returns the number requeued.
+    """
+    timeout = timeout or datetime.timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 600))
+    return Job.objects.filter(status='running', locked_at__lt=timezone.now() - timeout).update(
+        status='pending', locked_by='', locked_at=None, updated_at=timezone.now(),
+    )
+
+
+def purge_finished(keep_days=None):
+    """
+    Delete jobs that finished more than ``keep_days`` ago. Failed jobs are kept
+    for inspection. Returns the number deleted.
+    """
+    keep_days = keep_days if keep_days is not None else getattr(settings, 'JOB_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - datetime.timedelta(days=keep_days)
+    deleted, _ = Job.objects.filter(status='done', updated_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,318 @@
+import datetime
+import http.client
+import json
+import queue
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from itertools import cycle, islice
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from django.urls import reverse
+from users.identity import BUYERS
+
+from listings.models import Conversation, MessageModel, Property
+
+from .benchmark_serving import session_cookie
+from .loadtest_realtime import percentile
+
+PAGES = ('home', 'property_list', 'property_detail', 'inbox', 'conversation')
+# Pages that redirect anonymous visitors to the login page
+LOGIN_REQUIRED = {'property_list', 'inbox', 'conversation'}
+
+# The query count RequestMetricsMiddleware puts in the Server-Timing header
+SERVER_TIMING_QUERIES = re.compile(r'db;desc="(\d+) queries"')
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class ClientSession:
+    """Requests made in-process through the test client."""
+
+    def __init__(self, user):
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get('Server-Timing', '')
+
+    def close(self):
+        pass
+
+
+class HttpSession:
+    """Requests made over one keep-alive connection to a running server."""
+
+    def __init__(self, url, cookie):
+        parts = urlsplit(url)
+        self.prefix = parts.path.rstrip('/')
+        self.address = (parts.hostname, parts.port or 80)
+        self.headers = {'Cookie': cookie} if cookie else {}
+        self.connection = http.client.HTTPConnection(*self.address, timeout=60)
+
+    def get(self, path):
+        try:
+            self.connection.request('GET', self.prefix + path, headers=self.headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status, response.getheader('Server-Timing', '')
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return None, ''
+
+    def close(self):
+        self.connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the home, buyer dashboard, property detail, inbox and conversation pages "
+        "and writes throughput, latency percentiles and SQL query counts per page as JSON. "
+        "Requests go through the test client, or to a running server with --url. With "
+        "--compare it also fails if a page got slower or ran more queries than in an earlier run. "
+        "Seed data first with `manage.py seed_market`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='A running server to measure, e.g. http://127.0.0.1:8000 (default: in-process).')
+        parser.add_argument('--page', action='append', choices=PAGES, help='Page to measure (default: all). Repeatable.')
+        parser.add_argument('--user', help='Username to request the pages as (default: a buyer with recent messages).')
+        parser.add_argument('--anonymous', action='store_true', help='Measure logged out (skips the pages that need a login).')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per page.')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per page first.')
+        parser.add_argument('--concurrency', type=int, default=1, help='Requests in flight at once.')
+        parser.add_argument('--samples', type=int, default=20, help='Distinct listings and conversations to cycle through.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for choosing the listings.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of standard output.')
+        parser.add_argument('--compare', metavar='BASELINE', help='JSON report of an earlier run to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before --compare fails (0.25 = 25%%).')
+
+    def handle(self, *args, **options):
+        user = None if options['anonymous'] else self.benchmark_user(options['user'])
+        pages = [
+            page for page in options['page'] or PAGES
+            if user is not None or page not in LOGIN_REQUIRED
+        ]
+        paths = self.page_paths(pages, user, options['samples'], random.Random(options['seed']))
+
+        if options['url']:
+            cookie = session_cookie(user.username) if user is not None else ''
+            results = self.measure(paths, lambda: HttpSession(options['url'], cookie), options)
+        else:
+            # Server-Timing carries the query counts; the test client's host must be allowed
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], SERVER_TIMING_HEADER=True):
+                results = self.measure(paths, lambda: ClientSession(user), options)
+
+        report = {
+            'commit': _git_commit(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'target': options['url'] or 'client',
+            'user': user.username if user is not None else None,
+            'database': {
+                'vendor': connection.vendor,
+                'users': User.objects.count(),
+                'properties': Property.objects.count(),
+                'messages': MessageModel.objects.count(),
+            },
+            'options': {key: options[key] for key in ('requests', 'warmup', 'concurrency', 'samples')},
+            'pages': results,
+        }
+        document = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(document + '\n')
+        else:
+            self.stdout.write(document)
+
+        self.summarise(results)
+        if options['compare']:
+            self.compare(report, options['compare'], options['tolerance'])
+
+    def benchmark_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username!r}.")
+        # A buyer in the latest conversation has messages, a wishlist and a dashboard
+        conversation = Conversation.objects.order_by('-last_activity').first()
+        candidates = User.objects.filter(groups__name=BUYERS)
+        if conversation is not None:
+            user = candidates.filter(pk__in=[conversation.user_a_id, conversation.user_b_id]).first()
+            if user is not None:
+                return user
+        user = candidates.order_by('pk').first()
+        if user is None:
+            raise CommandError("There are no buyers; run `manage.py seed_market` or pass --user or --anonymous.")
+        return user
+
+    def page_paths(self, pages, user, samples, rng):
+        """The URLs requested for each page, cycled through in turn."""
+        paths = {}
+        for page in pages:
+            if page == 'home':
+                paths[page] = [reverse('listings:home')]
+            elif page == 'property_list':
+                paths[page] = [reverse('listings:property-list')]
+            elif page == 'property_detail':
+                paths[page] = [reverse('listings:property-detail', args=[pk]) for pk in self.sample_listings(samples, rng)]
+            elif page == 'inbox':
+                paths[page] = [reverse('listings:inbox')]
+            elif page == 'conversation':
+                partners = [
+                    conversation.user_b_id if conversation.user_a_id == user.pk else conversation.user_a_id
+                    for conversation in Conversation.objects.for_user(user).order_by('-last_activity')[:samples]
+                ]
+                paths[page] = [reverse('listings:conversation-detail', args=[pk]) for pk in partners]
+            if not paths[page]:
+                raise CommandError(f"Nothing to request for {page}; seed some data with `manage.py seed_market`.")
+        return paths
+
+    def sample_listings(self, samples, rng):
+        """Published listings picked at random by id, without scanning the table."""
+        published = Property.objects.filter(is_published=True)
+        bounds = published.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            return []
+        pks = set()
+        for _ in range(samples):
+            pk = published.filter(pk__gte=rng.randint(bounds['first'], bounds['last'])).order_by('pk').values_list('pk', flat=True).first()
+            if pk is not None:
+                pks.add(pk)
+        return sorted(pks)
+
+    def measure(self, paths, make_session, options):
+        """``{page: summary}``; each thread keeps one session (login, connection) for all pages."""
+        sessions = queue.SimpleQueue()
+        results = {}
+        for page, page_paths in paths.items():
+            self.run(page_paths, options['warmup'], options['concurrency'], make_session, sessions)
+            timings, queries, errors, elapsed = self.run(
+                page_paths, options['requests'], options['concurrency'], make_session, sessions,
+            )
+            latencies_ms = [seconds * 1000 for seconds in timings]
+            results[page] = {
+                'paths': len(page_paths),
+                'requests': len(timings),
+                'errors': errors,
+                'throughput_rps': round(len(timings) / elapsed, 2) if elapsed else 0.0,
+                'latency_ms': {
+                    'mean': round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+                    **{f'p{pct}': round(percentile(latencies_ms, pct), 2) for pct in (50, 90, 99)},
+                    'max': round(max(latencies_ms, default=0.0), 2),
+                },
+                # None when the server doesn't send Server-Timing (see SERVER_TIMING_HEADER)
+                'queries': {
+                    'mean': round(sum(queries) / len(queries), 2),
+                    'max': max(queries),
+                } if queries else None,
+            }
+        while not sessions.empty():
+            sessions.get().close()
+        return results
+
+    def run(self, page_paths, count, concurrency, make_session, sessions):
+        jobs = queue.SimpleQueue()
+        for path in islice(cycle(page_paths), count):
+            jobs.put(path)
+        timings, queries, errors = [], [], []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                session = sessions.get_nowait()
+            except queue.Empty:
+                session = make_session()
+            try:
+                while True:
+                    try:
+                        path = jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    started = time.perf_counter()
+                    status, server_timing = session.get(path)
+                    seconds = time.perf_counter() - started
+                    match = SERVER_TIMING_QUERIES.search(server_timing)
+                    with lock:
+                        if status == 200:
+                            timings.append(seconds)
+                            if match:
+                                queries.append(int(match.group(1)))
+                        else:
+                            errors.append(status)
+            finally:
+                sessions.put(session)
+                # The database connections this thread opened (in-process requests)
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings, queries, len(errors), time.perf_counter() - started
+
+    def summarise(self, results):
+        # On stderr, so that standard output stays valid JSON
+        for page, result in results.items():
+            latency, queries = result['latency_ms'], result['queries']
+            sys.stderr.write(
+                f"{page:<16} p50 {latency['p50']:8.1f} ms   p99 {latency['p99']:8.1f} ms"
+                f"   {result['throughput_rps']:7.1f} req/s"
+                f"   {queries['mean'] if queries else '?':>6} queries   {result['errors']} error(s)\n"
+            )
+
+    def compare(self, report, baseline_path, tolerance):
+        try:
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)
+            baseline_pages = baseline['pages']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Can't read the baseline report {baseline_path}: {exc}")
+        for key in ('target', 'database', 'options'):
+            if baseline.get(key) != report[key]:
+                sys.stderr.write(f"Warning: the baseline was run with a different {key}: {baseline.get(key)}\n")
+
+        regressions = []
+        for page, result in report['pages'].items():
+            before = baseline_pages.get(page)
+            if before is None:
+                continue
+            p50, p50_before = result['latency_ms']['p50'], before['latency_ms']['p50']
+            rps, rps_before = result['throughput_rps'], before['throughput_rps']
+            sys.stderr.write(
+                f"{page:<16} p50 {p50_before:.1f} -> {p50:.1f} ms   {rps_before:.1f} -> {rps:.1f} req/s"
+            )
+            if p50 > p50_before * (1 + tolerance):
+                regressions.append(f"{page}: p50 went from {p50_before:.1f} to {p50:.1f} ms")
+            if rps < rps_before * (1 - tolerance):
+                regressions.append(f"{page}: throughput went from {rps_before:.1f} to {rps:.1f} req/s")
+            if result['queries'] and before.get('queries'):
+                queries, queries_before = result['queries']['max'], before['queries']['max']
+                sys.stderr.write(f"   {queries_before} -> {queries} queries")
+                if queries > queries_before:
+                    regressions.append(f"{page}: ran up to {queries} queries, {queries_before} before")
+            sys.stderr.write('\n')
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+        sys.stderr.write(f"No regressions against {baseline_path}.\n")
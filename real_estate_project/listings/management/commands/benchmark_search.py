@@ -0,0 +1,120 @@
+import random
+import re
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from listings.models import Property
+from listings.pagination import KeysetPaginator
+from listings.search import SORT_ORDERINGS, search_properties
+from listings.seeding import explicit_list_dates, fake_property
+
+# Representative filter combinations sent to the search endpoint. Each one is
+# run with every sort option.
+QUERY_SHAPES = {
+    'unfiltered': {},
+    'type': {'property_type': 'House'},
+    'status': {'status': 'For Rent'},
+    'price_range': {'min_price': Decimal('2000000'), 'max_price': Decimal('2500000')},
+    'type_price_range': {'property_type': 'Land', 'min_price': Decimal('2000000'), 'max_price': Decimal('3000000')},
+    'min_bedrooms': {'min_bedrooms': 5},
+    'min_bathrooms': {'min_bathrooms': 5},
+    'area_range': {'min_area': 30000, 'max_area': 31000},
+    'location': {'location': 'Gachibowli'},
+    'radius': {'lat': 17.44, 'lng': 78.38, 'radius_km': 5},
+    'bbox': {'bbox': (12.85, 77.5, 13.1, 77.8)},
+    'combined': {'property_type': 'House', 'min_bedrooms': 3, 'max_price': Decimal('5000000'), 'location': 'Hyderabad'},
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a large Property table inside a transaction, then EXPLAINs and times "
+        "the first page of every search query shape. Fails if any shape needs a "
+        "sequential scan. The seeded rows are rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000, help='Number of listings to seed.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        results = []
+        try:
+            with transaction.atomic():
+                self.seed(options['rows'], options['batch_size'])
+                results = self.run_shapes(options['repeat'])
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            pass
+
+        failures = [r for r in results if r['seq_scan']]
+        for r in results:
+            flag = 'SEQ SCAN' if r['seq_scan'] else 'ok'
+            self.stdout.write(
+                f"{r['shape']:<18} {r['sort']:<11} p50 {r['p50_ms']:8.2f} ms  max {r['max_ms']:8.2f} ms  {flag}"
+            )
+        if failures:
+            for r in failures:
+                self.stderr.write(f"\n{r['shape']} / {r['sort']}:\n{r['plan']}")
+            raise CommandError(f"{len(failures)} query shape(s) fell back to a sequential scan.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} query shapes are index-backed."))
+
+    def seed(self, rows, batch_size):
+        rng = random.Random(42)
+        seller = User.objects.create(username=f'benchmark-seller-{time.time_ns()}')
+        self.stdout.write(f"Seeding {rows:,} listings...")
+        started = time.perf_counter()
+        with explicit_list_dates():
+            for offset in range(0, rows, batch_size):
+                batch = [fake_property(rng, seller) for _ in range(min(batch_size, rows - offset))]
+                Property.objects.bulk_create(batch, batch_size=batch_size)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Property._meta.db_table}')
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    def run_shapes(self, repeat):
+        results = []
+        for shape, filters in QUERY_SHAPES.items():
+            for sort in SORT_ORDERINGS:
+                queryset, ordering = search_properties({**filters, 'sort': sort})
+                paginator = KeysetPaginator(queryset, ordering=ordering)
+                page_query = queryset.order_by(*ordering)[:paginator.per_page + 1]
+
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    list(page_query.all())
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                plan = page_query.explain()
+                results.append({
+                    'shape': shape,
+                    'sort': sort,
+                    'p50_ms': statistics.median(timings),
+                    'max_ms': max(timings),
+                    'plan': plan,
+                    'seq_scan': is_sequential_scan(plan),
+                })
+        return results
+
+
+def is_sequential_scan(plan):
+    """True if an EXPLAIN plan reads the property table without an index."""
+    table = re.escape(Property._meta.db_table)
+    if connection.vendor == 'postgresql':
+        return re.search(rf'Seq Scan on {table}\b', plan) is not None
+    # SQLite reports "SCAN <table>" for full scans and "SCAN <table> USING [COVERING] INDEX"
+    # or "SEARCH <table> ..." when an index is used.
+    return re.search(rf'\bSCAN {table}\b(?! USING)', plan) is not None
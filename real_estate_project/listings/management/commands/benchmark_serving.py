@@ -0,0 +1,158 @@
+import http.client
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from .loadtest_realtime import percentile
+
+# How each deployment mode is started; see README
+SERVERS = {
+    'wsgi': ['real_estate_project.wsgi:application', '--worker-class', 'gthread', '--threads', '{threads}'],
+    'asgi': ['real_estate_project.asgi:application', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"The server exited with status {process.returncode} before it was ready.")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Nothing was listening on port {port} after {timeout}s.")
+
+
+def session_cookie(username):
+    """A cookie for a new session logged in as ``username``."""
+    try:
+        user = get_user_model().objects.get(username=username)
+    except get_user_model().DoesNotExist:
+        raise CommandError(f"No user named {username!r}.")
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the latency (p50/p99) and throughput of the site's pages served by "
+        "gunicorn's WSGI workers and by Uvicorn workers under ASGI. By default it starts "
+        "both servers itself; with --target it measures servers that are already running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', default=[], metavar='NAME=URL', help='A running server to measure, e.g. asgi=http://127.0.0.1:8000. Repeatable.')
+        parser.add_argument('--mode', action='append', choices=sorted(SERVERS), help='Deployment mode to start (default: all).')
+        parser.add_argument('--path', action='append', help="Page to request (default: '/' and '/buyer_dashboard/'). Repeatable.")
+        parser.add_argument('--requests', type=int, default=300, help='Timed requests per page and server.')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per page first.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once.')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per started server.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per WSGI worker.')
+        parser.add_argument('--user', help='Username to request the pages as (the buyer dashboard needs a login).')
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/', '/buyer_dashboard/']
+        headers = {'Cookie': session_cookie(options['user'])} if options['user'] else {}
+
+        if options['target']:
+            targets = [target.split('=', 1) for target in options['target']]
+            if any(len(target) != 2 for target in targets):
+                raise CommandError("Targets look like NAME=URL.")
+            for name, url in targets:
+                self.report(name, self.measure(url, paths, headers, options))
+            return
+
+        if not shutil.which('gunicorn'):
+            raise CommandError("gunicorn isn't installed; start the servers yourself and pass --target.")
+        for mode in options['mode'] or sorted(SERVERS):
+            port = _free_port()
+            command = [
+                'gunicorn', *(arg.format(threads=options['threads']) for arg in SERVERS[mode]),
+                '--workers', str(options['workers']), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+            ]
+            process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=dict(os.environ), stdout=sys.stderr)
+            try:
+                _wait_for(port, process)
+                self.report(mode, self.measure(f'http://127.0.0.1:{port}', paths, headers, options))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    def measure(self, url, paths, headers, options):
+        """``{path: ([seconds per request], errors, elapsed)}`` for one server."""
+        parts = urlsplit(url)
+        prefix = parts.path.rstrip('/')
+
+        def run(path, count):
+            jobs = queue.SimpleQueue()
+            for _ in range(count):
+                jobs.put(prefix + path)
+            timings, errors = [], []
+            lock = threading.Lock()
+
+            def worker():
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+                while True:
+                    try:
+                        target = jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    started = time.perf_counter()
+                    try:
+                        connection.request('GET', target, headers=headers)
+                        response = connection.getresponse()
+                        response.read()
+                        ok = response.status == 200
+                    except (OSError, http.client.HTTPException):
+                        connection.close()
+                        ok = False
+                    with lock:
+                        (timings if ok else errors).append(time.perf_counter() - started)
+                connection.close()
+
+            threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return timings, len(errors), time.perf_counter() - started
+
+        results = {}
+        for path in paths:
+            run(path, options['warmup'])
+            results[path] = run(path, options['requests'])
+        return results
+
+    def report(self, name, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        for path, (timings, errors, elapsed) in results.items():
+            latencies_ms = [seconds * 1000 for seconds in timings]
+            self.stdout.write(
+                f"  {path:<28} p50 {percentile(latencies_ms, 50):8.1f} ms   p99 {percentile(latencies_ms, 99):8.1f} ms"
+                f"   {len(timings) / elapsed:7.1f} req/s   {errors} error(s)"
+            )
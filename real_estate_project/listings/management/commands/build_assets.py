@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import assets
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the self-hosted Bootstrap, Font Awesome and Inter bundle from the vendored files, "
+        "trimming the stylesheets to the classes the templates use. Run it before collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fetch', action='store_true', help='Download any pinned upstream files not vendored yet.')
+        parser.add_argument('--refresh', action='store_true', help='With --fetch, download every file again (after a version bump).')
+        parser.add_argument('--no-trim', action='store_true', help='Bundle the stylesheets whole.')
+
+    def handle(self, *args, **options):
+        if options['fetch']:
+            try:
+                fetched = assets.fetch(refresh=options['refresh'])
+            except (OSError, assets.AssetError) as exc:
+                raise CommandError(f"Couldn't fetch the vendored files: {exc}")
+            if fetched:
+                self.stdout.write(f"Fetched {len(fetched)} file(s) into {assets.VENDOR_DIR}.")
+
+        try:
+            report = assets.build(trim=not options['no_trim'])
+        except assets.AssetError as exc:
+            raise CommandError(str(exc))
+
+        for path, before, after in report:
+            self.stdout.write(f"  {path:<36} {before / 1024:>8.1f} KB -> {after / 1024:>7.1f} KB")
+        self.stdout.write(self.style.SUCCESS(f"Built the asset bundle in {assets.BUNDLE_DIR}."))
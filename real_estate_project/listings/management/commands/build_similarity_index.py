@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings import similarity
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the memory-mapped feature matrix behind the similar-properties panel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Index directory (defaults to SIMILARITY_INDEX_DIR).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = similarity.build(options['dir'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} listings ({similarity.DIMENSIONS} features each) "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from listings import caching, images
+from listings.models import Property, PropertyImage
+
+
+def _init_worker():
+    # Needed when the platform spawns (rather than forks) worker processes
+    django.setup()
+
+
+def _process(name, force):
+    if not force and images.has_renditions(name):
+        return name, 'skipped', None
+    try:
+        images.generate_renditions(name)
+    except Exception as e:  # a corrupt or missing upload shouldn't stop the backfill
+        return name, 'failed', str(e)
+    return name, 'generated', None
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills renditions, in parallel, for the property main images and gallery images still "
+        "waiting for them (with --force, for every image)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes.')
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that already exist.')
+
+    def handle(self, *args, **options):
+        properties = Property.objects.exclude(main_image='')
+        gallery = PropertyImage.objects.exclude(image='')
+        if not options['force']:
+            # Rows already showing renditions have them; build.sh runs this on every deploy
+            properties = properties.filter(renditions_ready=False)
+            gallery = gallery.filter(renditions_ready=False)
+        names = set(properties.values_list('main_image', flat=True))
+        names.update(gallery.values_list('image', flat=True))
+        self.stdout.write(f"Processing {len(names)} images with {options['workers']} workers...")
+
+        # Workers only touch files, never the database; don't let them inherit open connections.
+        connections.close_all()
+
+        counts = {'generated': 0, 'skipped': 0, 'failed': 0}
+        ready = []
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_process, name, options['force']) for name in sorted(names)]
+            for future in as_completed(futures):
+                name, outcome, error = future.result()
+                counts[outcome] += 1
+                if error:
+                    self.stderr.write(f"{name}: {error}")
+                else:
+                    ready.append(name)
+
+        # Swap the placeholders for the renditions. Rows that already showed
+        # them are left alone, so their updated_at (API ETags) and caches stay.
+        for start in range(0, len(ready), 500):
+            chunk = ready[start:start + 500]
+            waiting_properties = Property.objects.filter(main_image__in=chunk, renditions_ready=False)
+            waiting_images = PropertyImage.objects.filter(image__in=chunk, renditions_ready=False)
+            affected = set(waiting_properties.values_list('pk', flat=True))
+            affected.update(waiting_images.values_list('property_id', flat=True))
+            if not affected:
+                continue
+            waiting_properties.update(renditions_ready=True)
+            waiting_images.update(renditions_ready=True)
+            Property.objects.filter(pk__in=affected).update(updated_at=timezone.now())
+            for pk in affected:
+                caching.invalidate_property(pk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['generated']} generated, {counts['skipped']} already present, {counts['failed']} failed."
+        ))
@@ -0,0 +1,50 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from listings import caching, geo
+from listings.models import Property
+
+
+FIELDS = ['latitude', 'longitude', 'geohash', 'updated_at']
+
+
+class Command(BaseCommand):
+    help = (
+        "Sets listing coordinates from their locations using the bundled gazetteer. "
+        "By default only listings without coordinates are looked at."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Geocode every listing again, e.g. after the gazetteer changed.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Listings updated per query.')
+
+    def handle(self, *args, **options):
+        listings = Property.objects.only('pk', 'location', 'latitude', 'longitude', 'geohash')
+        if not options['all']:
+            listings = listings.filter(latitude__isnull=True)
+
+        located, unknown, batch = 0, Counter(), []
+        for listing in listings.iterator(chunk_size=options['batch_size']):
+            before = (listing.latitude, listing.longitude)
+            if geo.locate(listing):
+                located += 1
+            else:
+                unknown[listing.location] += 1
+            if (listing.latitude, listing.longitude) != before:
+                # bulk_update() doesn't touch auto_now fields; the API's ETags need it
+                listing.updated_at = timezone.now()
+                batch.append(listing)
+            if len(batch) >= options['batch_size']:
+                Property.objects.bulk_update(batch, FIELDS)
+                batch = []
+        if batch:
+            Property.objects.bulk_update(batch, FIELDS)
+        caching.invalidate_listings()
+
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {located} listing(s)."))
+        if unknown:
+            self.stdout.write(f"{sum(unknown.values())} listing(s) have locations the gazetteer doesn't know:")
+            for location, count in unknown.most_common(20):
+                self.stdout.write(f"  {count:>6}  {location}")
@@ -0,0 +1,57 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports listings for a seller from a CSV or JSON Lines file, validating each row "
+        "with the listing form rules. Images named in the rows are read from --images, "
+        "a directory or a zip archive. Rejected rows are reported with their line numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON Lines file (.jsonl/.ndjson).')
+        parser.add_argument('--seller', required=True, help='Username of the seller the listings belong to.')
+        parser.add_argument('--images', help='Directory or zip archive holding the referenced images.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=bulk.CHUNK_SIZE, help='Rows inserted per transaction.')
+        parser.add_argument('--workers', type=int, default=bulk.IMAGE_WORKERS, help='Threads copying images.')
+        parser.add_argument('--errors', help='Write rejected rows to this JSON Lines file instead of stderr.')
+
+    def handle(self, *args, **options):
+        seller = User.objects.filter(username=options['seller']).first()
+        if seller is None:
+            raise CommandError(f"No user named {options['seller']!r}.")
+
+        errors_file = open(options['errors'], 'w') if options['errors'] else None
+
+        def report(line, messages):
+            if errors_file:
+                errors_file.write(json.dumps({'line': line, 'errors': messages}) + '\n')
+            else:
+                self.stderr.write(f"line {line}: {json.dumps(messages)}")
+
+        started = time.perf_counter()
+        try:
+            importer = bulk.Importer(
+                seller, images=options['images'], chunk_size=options['chunk_size'],
+                workers=options['workers'], on_error=report,
+            )
+            with open(options['path'], 'rb') as source:
+                result = importer.run(bulk.read_rows(source, options['format'] or bulk.detect_format(options['path'])))
+        except (bulk.BulkImportError, OSError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported:,} listings, skipped {result.failed:,} rows "
+            f"in {elapsed:.1f}s ({result.imported / max(elapsed, 0.001):,.0f} rows/s)."
+        ))
@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.realtime import InProcessBroker, serve_connection
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the real-time messaging channel. By default it holds N idle "
+        "connections in-process and measures memory per connection and fan-out "
+        "latency; with --url it opens N real WebSocket connections to a running server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000, help='Number of idle connections to hold.')
+        parser.add_argument('--users', type=int, default=1000, help='Distinct users the connections belong to.')
+        parser.add_argument('--events', type=int, default=2000, help='Events to publish (in-process mode).')
+        parser.add_argument('--url', help='ws:// URL of a running ASGI server, e.g. ws://127.0.0.1:8000/ws/messages/.')
+        parser.add_argument('--cookie', default='', help='Cookie header sent with each connection (--url mode).')
+        parser.add_argument('--hold', type=float, default=10.0, help='Seconds to keep connections open (--url mode).')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            asyncio.run(self._remote(options))
+        else:
+            asyncio.run(self._in_process(options))
+
+    # --- In-process ---
+
+    async def _in_process(self, options):
+        broker = InProcessBroker()
+        connections, users = options['connections'], options['users']
+        latencies = []
+        delivered = 0
+        idle = asyncio.Event()
+
+        def make_connection():
+            async def receive():
+                await idle.wait()
+                return {'type': 'websocket.disconnect'}
+
+            async def send(message):
+                nonlocal delivered
+                event = json.loads(message['text'])
+                if 'sent_at' in event:
+                    latencies.append(time.perf_counter() - event['sent_at'])
+                    delivered += 1
+
+            return receive, send
+
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tasks = []
+        for n in range(connections):
+            receive, send = make_connection()
+            tasks.append(asyncio.create_task(serve_connection(n % users + 1, receive, send, broker=broker)))
+        await asyncio.sleep(0.1)
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{broker.connection_count()} connections held, "
+            f"{(held - baseline) / connections / 1024:.1f} KiB per connection (Python heap)."
+        )
+
+        # Publish from a separate thread, as sync views do under ASGI
+        def publish():
+            for _ in range(options['events']):
+                broker.publish(random.randint(1, users), {'type': 'message', 'sent_at': time.perf_counter()})
+                time.sleep(0.0005)
+
+        expected = options['events'] * (connections // users)
+        started = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(None, publish)
+        while delivered < expected and time.perf_counter() - started < 30:
+            await asyncio.sleep(0.05)
+
+        idle.set()
+        await asyncio.gather(*tasks)
+
+        latencies_ms = [latency * 1000 for latency in latencies]
+        self.stdout.write(
+            f"Delivered {delivered} events: p50 {percentile(latencies_ms, 50):.2f} ms, "
+            f"p95 {percentile(latencies_ms, 95):.2f} ms, p99 {percentile(latencies_ms, 99):.2f} ms, "
+            f"max {max(latencies_ms, default=0):.2f} ms."
+        )
+
+    # --- Against a running server ---
+
+    async def _open(self, url, cookie):
+        parts = urlsplit(url)
+        secure = parts.scheme == 'wss'
+        port = parts.port or (443 if secure else 80)
+        reader, writer = await asyncio.open_connection(parts.hostname, port, ssl=secure or None)
+        key = base64.b64encode(os.urandom(16)).decode()
+        origin = f"{'https' if secure else 'http'}://{parts.netloc}"
+        writer.write((
+            f"GET {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n"
+            f"Origin: {origin}\r\nCookie: {cookie}\r\n\r\n"
+        ).encode())
+        await writer.drain()
+        status = await reader.readline()
+        if b' 101 ' not in status:
+            writer.close()
+            raise ConnectionError(status.decode(errors='replace').strip())
+        return writer
+
+    async def _remote(self, options):
+        connections = options['connections']
+        semaphore = asyncio.Semaphore(200)
+        handshakes = []
+        errors = {}
+
+        async def open_one():
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    writer = await self._open(options['url'], options['cookie'])
+                except (OSError, ConnectionError) as exc:
+                    errors[str(exc)] = errors.get(str(exc), 0) + 1
+                    return None
+                handshakes.append((time.perf_counter() - started) * 1000)
+                return writer
+
+        writers = [w for w in await asyncio.gather(*(open_one() for _ in range(connections))) if w]
+        if not writers and errors:
+            raise CommandError(f"No connection succeeded: {errors}")
+        self.stdout.write(
+            f"{len(writers)}/{connections} connections open; handshake p50 {percentile(handshakes, 50):.1f} ms, "
+            f"p99 {percentile(handshakes, 99):.1f} ms, mean {statistics.fmean(handshakes or [0]):.1f} ms."
+        )
+        for error, count in errors.items():
+            self.stdout.write(f"  {count} x {error}")
+
+        await asyncio.sleep(options['hold'])
+        for writer in writers:
+            writer.close()
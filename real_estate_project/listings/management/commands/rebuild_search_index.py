@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from listings import fulltext
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the SQLite FTS5 listing search table from the Property table. "
+        "Needed after bulk inserts that bypass model signals. PostgreSQL keeps its "
+        "search vector up to date automatically."
+    )
+
+    def handle(self, *args, **options):
+        if not fulltext.uses_fts5():
+            self.stdout.write(f"Nothing to do on {connection.vendor}; the search vector is a generated column.")
+            return
+        with transaction.atomic():
+            fulltext.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
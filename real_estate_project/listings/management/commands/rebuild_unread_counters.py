@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from listings.models import UnreadCounter
+
+
+class Command(BaseCommand):
+    help = "Recomputes every user's unread message counter from their conversations."
+
+    def handle(self, *args, **options):
+        rebuilt = UnreadCounter.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt unread counters for {rebuilt} user(s)."))
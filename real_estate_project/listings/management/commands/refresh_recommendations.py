@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from users.models import Profile
+
+from listings import recommendations
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stored listing recommendations for every user (or the given ones)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only refresh this user id (repeatable).')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.order_by('pk')
+        if options['user_ids']:
+            profiles = profiles.filter(user_id__in=options['user_ids'])
+
+        started = time.perf_counter()
+        users = rows = 0
+        for profile in profiles.iterator(chunk_size=500):
+            rows += recommendations.refresh_for_profile(profile)
+            users += 1
+            if users % 1000 == 0:
+                self.stdout.write(f"  {users} users refreshed...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {rows} recommendations for {users} users in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Folds listing engagement events recorded since the last run into the daily "
+        "analytics table and refreshes the market price statistics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='Events folded per transaction.')
+        parser.add_argument('--skip-market', action='store_true', help="Don't recompute market price statistics.")
+        parser.add_argument(
+            '--prune-days', type=int, default=None,
+            help='Delete rolled-up events older than this many days (default: ANALYTICS_EVENT_RETENTION_DAYS).',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        events = analytics.rollup(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rolled up {events} event(s) in {time.perf_counter() - started:.1f}s.")
+
+        if not options['skip_market']:
+            markets = analytics.refresh_market_stats()
+            self.stdout.write(f"Refreshed price statistics for {markets} market(s).")
+
+        pruned = analytics.prune_events(options['prune_days'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} old event(s)."))
@@ -0,0 +1,87 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from listings import jobs
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs from the database queue until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Number of jobs run in parallel (threads).')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained.')
+
+    def handle(self, *args, **options):
+        jobs.autodiscover()
+        self.stopping = threading.Event()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self._maintain()
+
+        worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(f"{worker_prefix}:{n}", options['poll_interval'], options['once']),
+                daemon=True,
+            )
+            for n in range(options['concurrency'])
+        ]
+        self.stdout.write(f"Worker {worker_prefix} started with concurrency {options['concurrency']}.")
+        for thread in threads:
+            thread.start()
+        interval = getattr(settings, 'JOB_MAINTENANCE_INTERVAL', 300)
+        next_maintenance = time.monotonic() + interval
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+                if time.monotonic() >= next_maintenance and not self.stopping.is_set():
+                    self._maintain()
+                    next_maintenance = time.monotonic() + interval
+        self.stdout.write("Worker stopped.")
+
+    def _maintain(self):
+        """Requeue jobs left running by a dead worker and delete old finished ones."""
+        close_old_connections()
+        try:
+            requeued = jobs.requeue_stale()
+            purged = jobs.purge_finished()
+        except Exception as e:  # a database blip shouldn't stop the worker; try again next time
+            self.stderr.write(f"Job maintenance failed: {e}")
+            return
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} job(s) left running by a dead worker.")
+        if purged:
+            self.stdout.write(f"Deleted {purged} finished job(s).")
+
+    def _stop(self, signum, frame):
+        self.stdout.write("Finishing running jobs, then stopping...")
+        self.stopping.set()
+
+    def _work(self, worker_id, poll_interval, once):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                job = jobs.claim_next(worker_id)
+                if job is None:
+                    if once:
+                        return
+                    self.stopping.wait(poll_interval)
+                    continue
+                started = time.monotonic()
+                ok = jobs.run(job)
+                self.stdout.write(
+                    f"[{worker_id}] {job.name} #{job.pk} {'done' if ok else 'failed'} "
+                    f"in {time.monotonic() - started:.2f}s"
+                )
+        finally:
+            connection.close()
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.seeding import MarketSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with a synthetic market: buyers and sellers with profiles, "
+        "listings with galleries, wishlists and message threads, written in chunks with "
+        "bulk_create(). --scale multiplies every total, e.g. --scale 100 for millions of rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Users to create (buyers and sellers).')
+        parser.add_argument('--seller-share', type=float, default=0.2, help='Fraction of the users who are sellers.')
+        parser.add_argument('--properties', type=int, default=20000, help='Listings to create.')
+        parser.add_argument('--images-per-property', type=int, default=3, help='Average gallery size.')
+        parser.add_argument('--wishlist-size', type=int, default=5, help='Average listings on a buyer\'s wishlist.')
+        parser.add_argument('--conversations', type=int, default=5000, help='Buyer/seller message threads to create.')
+        parser.add_argument('--messages-per-conversation', type=int, default=6, help='Average messages per thread.')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplies the users, listings and threads.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create() chunk.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same market.')
+        parser.add_argument('--password', default='password', help='Password of every seeded user.')
+        parser.add_argument('--prefix', default='seed', help='Usernames are <prefix>-<n>@example.com.')
+
+    def handle(self, *args, **options):
+        if not 0 < options['seller_share'] < 1:
+            raise CommandError("--seller-share must be between 0 and 1.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        scale = options['scale']
+        seeder = MarketSeeder(
+            users=max(2, int(options['users'] * scale)),
+            properties=int(options['properties'] * scale),
+            images_per_property=options['images_per_property'],
+            wishlist_size=options['wishlist_size'],
+            conversations=int(options['conversations'] * scale),
+            messages_per_conversation=options['messages_per_conversation'],
+            seller_share=options['seller_share'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            password=options['password'],
+            prefix=options['prefix'],
+            progress=self.stdout.write,
+        )
+        started = time.perf_counter()
+        counts = seeder.run()
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {total:,} rows in {time.perf_counter() - started:.1f}s. "
+            f"Log in as any {options['prefix']}-<n>@example.com with password {options['password']!r}."
+        ))
+        self.stdout.write("Run `manage.py refresh_recommendations` to score the new listings for the buyers.")
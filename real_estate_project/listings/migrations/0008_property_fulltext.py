@@ -0,0 +1,53 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE listings_property ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(location, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX property_search_vector_idx ON listings_property USING GIN (search_vector) WHERE is_published",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS property_search_vector_idx",
+    "ALTER TABLE listings_property DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE listings_property_fts USING fts5("
+    "title, description, location, tokenize='porter unicode61 remove_diacritics 2')",
+    "INSERT INTO listings_property_fts (rowid, title, description, location) "
+    "SELECT id, title, description, location FROM listings_property WHERE is_published",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS listings_property_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search storage, which differs per database (see listings.fulltext):
+    a generated tsvector column with a GIN index on PostgreSQL, and an FTS5
+    shadow table on SQLite.
+    """
+
+    dependencies = [
+        ('listings', '0007_property_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_renditions(apps, schema_editor):
+    """Images whose renditions were already generated don't need a placeholder."""
+    from listings.images import has_renditions
+
+    for model_name, field in (('Property', 'main_image'), ('PropertyImage', 'image')):
+        model = apps.get_model('listings', model_name)
+        ready = [
+            pk for pk, name in model.objects.exclude(**{field: ''}).values_list('pk', field).iterator()
+            if has_renditions(name)
+        ]
+        for start in range(0, len(ready), 500):
+            model.objects.filter(pk__in=ready[start:start + 500]).update(renditions_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_property_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='renditions_ready',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['run_after', 'id'], name='job_pending_idx'), models.Index(fields=['status', 'locked_at'], name='job_status_locked_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_renditions, migrations.RunPython.noop),
+    ]
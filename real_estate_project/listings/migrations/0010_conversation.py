@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_conversations(apps, schema_editor):
+    """Create a Conversation for every pair of users who already exchanged messages."""
+    Conversation = apps.get_model('listings', 'Conversation')
+    MessageModel = apps.get_model('listings', 'MessageModel')
+
+    threads = {}
+    for message in MessageModel.objects.order_by('timestamp', 'id').iterator():
+        if message.sender_id == message.recipient_id:
+            continue
+        pair = tuple(sorted((message.sender_id, message.recipient_id)))
+        thread = threads.setdefault(pair, {'message_ids': [], 'last': None, 'unread_a': 0, 'unread_b': 0})
+        thread['message_ids'].append(message.pk)
+        thread['last'] = message
+        if not message.is_read:
+            thread['unread_a' if message.recipient_id == pair[0] else 'unread_b'] += 1
+
+    for (user_a_id, user_b_id), thread in threads.items():
+        conversation = Conversation.objects.create(
+            user_a_id=user_a_id,
+            user_b_id=user_b_id,
+            last_message_id=thread['last'].pk,
+            last_activity=thread['last'].timestamp,
+            unread_a=thread['unread_a'],
+            unread_b=thread['unread_b'],
+        )
+        ids = thread['message_ids']
+        for start in range(0, len(ids), 500):
+            MessageModel.objects.filter(pk__in=ids[start:start + 500]).update(conversation=conversation)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_job_queue_and_rendition_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_activity', models.DateTimeField(default=django.utils.timezone.now)),
+                ('unread_a', models.PositiveIntegerField(default=0)),
+                ('unread_b', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='listings.messagemodel')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='messagemodel',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='listings.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_a', '-last_activity'], name='conversation_user_a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_b', '-last_activity'], name='conversation_user_b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('user_a', 'user_b'), name='unique_conversation_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(condition=models.Q(('user_a__lt', models.F('user_b'))), name='conversation_pair_ordered'),
+        ),
+        migrations.RunPython(build_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def set_watermarks_from_read_flags(apps, schema_editor):
+    """Start each participant's watermark at the newest message they had read."""
+    Conversation = apps.get_model('listings', 'Conversation')
+    MessageModel = apps.get_model('listings', 'MessageModel')
+
+    read = (
+        MessageModel.objects.filter(is_read=True, conversation__isnull=False)
+        .values('conversation_id', 'recipient_id')
+        .annotate(upto=Max('id'))
+    )
+    for row in read.iterator():
+        conversation = Conversation.objects.get(pk=row['conversation_id'])
+        field = 'read_upto_a' if row['recipient_id'] == conversation.user_a_id else 'read_upto_b'
+        Conversation.objects.filter(pk=conversation.pk).update(**{field: row['upto']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_conversation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='read_upto_a',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='read_upto_b',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='messagemodel',
+            index=models.Index(fields=['conversation', '-id'], name='message_conversation_id_idx'),
+        ),
+        migrations.RunPython(set_watermarks_from_read_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_unread_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Conversation = apps.get_model('listings', 'Conversation')
+    UnreadCounter = apps.get_model('listings', 'UnreadCounter')
+
+    totals = dict.fromkeys(User.objects.values_list('pk', flat=True), 0)
+    for user_field, unread_field in (('user_a', 'unread_a'), ('user_b', 'unread_b')):
+        grouped = (
+            Conversation.objects.filter(**{f'{unread_field}__gt': 0})
+            .order_by().values(user_field).annotate(total=models.Sum(unread_field))
+        )
+        for row in grouped:
+            totals[row[user_field]] += row['total']
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, count=count) for user_id, count in totals.items()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('listings', '0011_conversation_read_watermarks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    Property = apps.get_model('listings', 'Property')
+    MessageModel = apps.get_model('listings', 'MessageModel')
+    Profile = apps.get_model('users', 'Profile')
+
+    sources = (
+        ('favorite_count', Profile.wishlist.through.objects),
+        ('inquiry_count', MessageModel.objects.filter(property__isnull=False)),
+    )
+    for field, rows in sources:
+        grouped = rows.order_by().values('property_id').annotate(total=models.Count('*'))
+        for row in grouped.iterator():
+            Property.objects.filter(pk=row['property_id']).update(**{field: row['total']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_recommendations'),
+        ('users', '0004_rename_monthly_budget_profile_budget'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='inquiry_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-view_count', '-id'], name='property_pub_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-favorite_count', '-id'], name='property_pub_favorites_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
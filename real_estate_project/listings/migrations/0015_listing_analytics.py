@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_property_popularity_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ListingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('view', 'View'), ('favorite', 'Favorite'), ('inquiry', 'Inquiry')], max_length=10)),
+                ('count', models.IntegerField(default=1)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='listings.property')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MarketPriceStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=255)),
+                ('property_type', models.CharField(choices=[('House', 'House'), ('Land', 'Land')], max_length=10)),
+                ('listings', models.PositiveIntegerField()),
+                ('low_per_sqft', models.FloatField()),
+                ('median_per_sqft', models.FloatField()),
+                ('high_per_sqft', models.FloatField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('location', 'property_type'), name='unique_market_segment')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ListingDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.IntegerField(default=0)),
+                ('favorites', models.IntegerField(default=0)),
+                ('inquiries', models.IntegerField(default=0)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='listings.property')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['seller', 'date'], name='listing_stat_seller_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('property', 'date'), name='unique_listing_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def start_from_list_date(apps, schema_editor):
+    Property = apps.get_model('listings', 'Property')
+    Property.objects.update(updated_at=models.F('list_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0016_listing_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(start_from_list_date, migrations.RunPython.noop),
+    ]
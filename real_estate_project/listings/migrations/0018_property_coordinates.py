@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+from listings import geo
+
+
+def geocode_existing(apps, schema_editor):
+    Property = apps.get_model('listings', 'Property')
+    listings = []
+    for listing in Property.objects.only('pk', 'location').iterator(chunk_size=2000):
+        point = geo.geocode(listing.location)
+        if point:
+            listing.latitude, listing.longitude = point
+            listing.geohash = geo.encode(*point)
+            listings.append(listing)
+    Property.objects.bulk_update(listings, ['latitude', 'longitude', 'geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0017_property_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['geohash'], name='property_pub_geohash_idx'),
+        ),
+        migrations.RunPython(geocode_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # The expression Django's icontains lookup compares: UPPER("location"::text) LIKE UPPER(...)
+    "CREATE INDEX property_pub_location_trgm_idx ON listings_property "
+    "USING GIN (UPPER(location::text) gin_trgm_ops) WHERE is_published",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS property_pub_location_trgm_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    A trigram index for the structured search's location filter, a
+    case-insensitive substring match (see listings.search). PostgreSQL only;
+    SQLite scans the published listings for it.
+    """
+
+    dependencies = [
+        ('listings', '0019_readreceipt'),
+    ]
+
+    operations = [
+        # Served the earlier prefix match; a substring match can't use it
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_pub_location_idx',
+        ),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
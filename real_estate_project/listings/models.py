@@ -1,9 +1,16 @@
 from django.db import models
 
 # Create your models here.
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+# Condition shared by the partial indexes over listings visible to buyers
+PUBLISHED = models.Q(is_published=True)
+
 
 class Property(models.Model):
     PROPERTY_TYPE_CHOICES = [
@@ -28,26 +35,182 @@ class Property(models.Model):
 
     area_sqft = models.IntegerField()
     location = models.CharField(max_length=255)
+    # Geocoded from location against the bundled gazetteer (see listings.geo);
+    # empty when the location isn't known. geohash is derived from the two.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
 
     # For land-specific details like "Facing South"
     facing = models.CharField(max_length=50, null=True, blank=True)
 
     main_image = models.ImageField(upload_to='properties/%Y/%m/%d/')
+    # Set by the background job once resized copies of main_image exist
+    renditions_ready = models.BooleanField(default=False)
     is_published = models.BooleanField(default=True)
     list_date = models.DateTimeField(auto_now_add=True)
+    # Last change to anything the JSON API serves, including the gallery and
+    # renditions; drives its ETag and Last-Modified headers (see listings.api)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Engagement counters, only ever changed with F() increments (see
+    # listings.counters), never written back from a loaded instance.
+    view_count = models.PositiveIntegerField(default=0)
+    favorite_count = models.PositiveIntegerField(default=0)
+    inquiry_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ('view_count', 'favorite_count', 'inquiry_count')
+
+    class Meta:
+        # Buyer-facing queries only ever read published listings, so their indexes
+        # are partial indexes over is_published=True: smaller, and usable by both
+        # SQLite and PostgreSQL for Django's bare-boolean WHERE clause.
+        indexes = [
+            # Keyset pagination keys for the buyer grid (optionally filtered by type)
+            # and the seller dashboard; see listings.pagination.
+            models.Index(fields=['-list_date', '-id'], condition=PUBLISHED, name='property_pub_date_idx'),
+            models.Index(fields=['property_type', '-list_date', '-id'], condition=PUBLISHED, name='property_pub_type_date_idx'),
+            models.Index(fields=['seller', '-list_date', '-id'], name='property_seller_date_idx'),
+            # Query shapes of the structured search (listings.search); its
+            # location filter, a substring match, has a trigram index on
+            # PostgreSQL (migration 0020)
+            models.Index(fields=['price', 'id'], condition=PUBLISHED, name='property_pub_price_idx'),
+            models.Index(fields=['property_type', 'price', 'id'], condition=PUBLISHED, name='property_pub_type_price_idx'),
+            models.Index(fields=['status', '-list_date', '-id'], condition=PUBLISHED, name='property_pub_status_date_idx'),
+            models.Index(fields=['area_sqft', 'id'], condition=PUBLISHED, name='property_pub_area_idx'),
+            models.Index(fields=['property_type', 'area_sqft', 'id'], condition=PUBLISHED, name='property_pub_type_area_idx'),
+            models.Index(fields=['bedrooms'], condition=PUBLISHED, name='property_pub_beds_idx'),
+            models.Index(fields=['bathrooms'], condition=PUBLISHED, name='property_pub_baths_idx'),
+            # Map areas and radius searches are ranges of geohash prefixes
+            models.Index(fields=['geohash'], condition=PUBLISHED, name='property_pub_geohash_idx'),
+            # Popularity sorts. The counters change often, so there is no
+            # per-type variant; a type filter just skips rows along these.
+            models.Index(fields=['-view_count', '-id'], condition=PUBLISHED, name='property_pub_views_idx'),
+            models.Index(fields=['-favorite_count', '-id'], condition=PUBLISHED, name='property_pub_favorites_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Updates leave the counters alone, so saving an edit form doesn't
+        overwrite the views and inquiries recorded since the row was loaded.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        return super().save(*args, **kwargs)
+
 
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='properties/%Y/%m/%d/')
+    renditions_ready = models.BooleanField(default=False)
 
     def __str__(self):
         return f"Image for {self.property.title} ({self.id})"
 
 
+class ConversationQuerySet(models.QuerySet):
+    def for_user(self, user):
+        return self.filter(models.Q(user_a=user) | models.Q(user_b=user))
+
+    def between(self, user, other_user):
+        user_a_id, user_b_id = Conversation.pair(user.pk, other_user.pk)
+        return self.filter(user_a_id=user_a_id, user_b_id=user_b_id)
+
+
+class Conversation(models.Model):
+    """
+    The message thread between two users, kept up to date as messages are
+    sent so the inbox doesn't have to derive it from MessageModel.
+
+    The pair is stored in a canonical order (user_a has the lower id), so
+    there is exactly one row per pair of users.
+    """
+    user_a = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    user_b = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    last_message = models.ForeignKey('MessageModel', related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    last_activity = models.DateTimeField(default=timezone.now)
+    # Messages each participant has received but not yet read
+    unread_a = models.PositiveIntegerField(default=0)
+    unread_b = models.PositiveIntegerField(default=0)
+    # Read watermarks: the id of the newest message each participant has seen
+    read_upto_a = models.BigIntegerField(default=0)
+    read_upto_b = models.BigIntegerField(default=0)
+
+    objects = ConversationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_a', 'user_b'], name='unique_conversation_pair'),
+            models.CheckConstraint(condition=models.Q(user_a__lt=models.F('user_b')), name='conversation_pair_ordered'),
+        ]
+        indexes = [
+            models.Index(fields=['user_a', '-last_activity'], name='conversation_user_a_idx'),
+            models.Index(fields=['user_b', '-last_activity'], name='conversation_user_b_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_a_id} and {self.user_b_id}"
+
+    @staticmethod
+    def pair(user_id, other_user_id):
+        return (user_id, other_user_id) if user_id < other_user_id else (other_user_id, user_id)
+
+    @staticmethod
+    def unread_field(user_id, other_user_id):
+        """Name of the unread counter belonging to ``user_id``."""
+        return 'unread_a' if user_id < other_user_id else 'unread_b'
+
+    def other_user(self, user):
+        return self.user_b if user.pk == self.user_a_id else self.user_a
+
+    def unread_for(self, user):
+        return self.unread_a if user.pk == self.user_a_id else self.unread_b
+
+    def seen_upto(self, user):
+        """Id of the newest message ``user`` has read."""
+        return self.read_upto_a if user.pk == self.user_a_id else self.read_upto_b
+
+    def mark_read(self, user, upto_id=None):
+        """
+        Move ``user``'s read watermark forward to ``upto_id`` (by default the
+        latest message) with a single UPDATE of this row, instead of flagging
+        every message. The unread count is recomputed in the same statement
+        from the messages past the new watermark, so a message arriving
+        concurrently is never lost. When this instance shows the watermark
+        already there (the usual case for a thread that's been read), it
+        doesn't query at all.
+        """
+        upto_id = upto_id or self.last_message_id
+        if not upto_id or self.seen_upto(user) >= upto_id:
+            return 0
+        suffix = 'a' if user.pk == self.user_a_id else 'b'
+        unread_after = (
+            MessageModel.objects.filter(conversation=models.OuterRef('pk'), recipient=user, id__gt=upto_id)
+            .order_by()
+            .values('conversation')
+            .annotate(count=models.Count('id'))
+            .values('count')
+        )
+        with transaction.atomic():
+            updated = Conversation.objects.filter(pk=self.pk, **{f'read_upto_{suffix}__lt': upto_id}).update(**{
+                f'read_upto_{suffix}': upto_id,
+                f'unread_{suffix}': Coalesce(models.Subquery(unread_after), 0),
+            })
+            if updated:
+                UnreadCounter.recount(user.pk)
+        if updated:
+            setattr(self, f'read_upto_{suffix}', upto_id)
+        return updated
+
+
 class MessageModel(models.Model):
     """
     Represents a message within a conversation thread.
@@ -55,8 +218,10 @@ class MessageModel(models.Model):
     sender = models.ForeignKey(User, related_name="sent_messages", on_delete=models.CASCADE)
     recipient = models.ForeignKey(User, related_name="received_messages", on_delete=models.CASCADE)
     property = models.ForeignKey(Property, on_delete=models.CASCADE, null=True, blank=True)
+    conversation = models.ForeignKey(Conversation, related_name='messages', null=True, blank=True, on_delete=models.CASCADE)
     body = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Superseded by the read watermarks on Conversation; no longer updated
     is_read = models.BooleanField(default=False)
 
     # This field links a reply to the first message in the conversation
@@ -65,5 +230,300 @@ class MessageModel(models.Model):
     def __str__(self):
         return f"Message from {self.sender.username} to {self.recipient.username}"
 
+    def save(self, *args, **kwargs):
+        """
+        New messages are attached to their Conversation, whose last message,
+        activity time and recipient's unread count, and the listing's inquiry
+        count, are updated in the same transaction as the insert.
+        """
+        if not self._state.adding or self.conversation_id is not None:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            user_a_id, user_b_id = Conversation.pair(self.sender_id, self.recipient_id)
+            self.conversation, _ = Conversation.objects.get_or_create(user_a_id=user_a_id, user_b_id=user_b_id)
+            super().save(*args, **kwargs)
+            unread_field = Conversation.unread_field(self.recipient_id, self.sender_id)
+            Conversation.objects.filter(pk=self.conversation_id).update(
+                last_message=self,
+                last_activity=self.timestamp,
+                **{unread_field: models.F(unread_field) + 1},
+            )
+            UnreadCounter.increment(self.recipient_id)
+            if self.property_id:
+                Property.objects.filter(pk=self.property_id).update(inquiry_count=models.F('inquiry_count') + 1)
+
     class Meta:
         ordering = ['timestamp']  # Show oldest messages first in a thread
+        indexes = [
+            # Thread windows and "messages since id X" polling
+            models.Index(fields=['conversation', '-id'], name='message_conversation_id_idx'),
+        ]
+
+
+class ReadReceipt(models.Model):
+    """
+    A participant having read a conversation up to a message. Recorded only
+    with listings.realtime.DatabasePollingBroker, whose poll announces it
+    to connections in every process (new messages need no such record: the
+    poll reads MessageModel). Rows are pruned after a few minutes.
+    """
+    conversation = models.ForeignKey(Conversation, related_name='+', on_delete=models.CASCADE)
+    reader = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    upto = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"User {self.reader_id} read conversation {self.conversation_id} up to {self.upto}"
+
+
+class Recommendation(models.Model):
+    """
+    A precomputed relevance score of a listing for a user, written by
+    listings.recommendations. The homepage reads a user's top rows through
+    the (user, -score) index instead of ranking listings per request.
+    """
+    user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    property = models.ForeignKey(Property, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'property'], name='unique_recommendation'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score'], name='recommendation_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id} for user {self.user_id} ({self.score:.2f})"
+
+
+class ListingEvent(models.Model):
+    """
+    An append-only log of engagement with a listing, rolled up into
+    ListingDailyStat by listings.analytics. ``count`` lets one row stand for
+    several views flushed together; favorites are net saves and can be
+    negative when a listing is removed from wishlists.
+    """
+    KIND_CHOICES = [
+        ('view', 'View'),
+        ('favorite', 'Favorite'),
+        ('inquiry', 'Inquiry'),
+    ]
+
+    property = models.ForeignKey(Property, related_name='+', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    count = models.IntegerField(default=1)
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.count} {self.kind} of {self.property_id} at {self.occurred_at:%Y-%m-%d %H:%M}"
+
+
+class ListingDailyStat(models.Model):
+    """
+    One listing's engagement on one day. The seller is copied onto the row so
+    the analytics page reads a seller's date range through one index, however
+    long their history is.
+    """
+    property = models.ForeignKey(Property, related_name='daily_stats', on_delete=models.CASCADE)
+    seller = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    date = models.DateField()
+    views = models.IntegerField(default=0)
+    favorites = models.IntegerField(default=0)
+    inquiries = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'date'], name='unique_listing_day'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'date'], name='listing_stat_seller_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id} on {self.date}"
+
+
+class RollupWatermark(models.Model):
+    """The last ListingEvent id a rollup has folded into its table."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at event {self.last_event_id}"
+
+
+class MarketPriceStat(models.Model):
+    """
+    Price per square foot quartiles of published listings sharing a location
+    and property type, refreshed by listings.analytics so a listing's price
+    position is a lookup rather than a scan of its comparables.
+    """
+    location = models.CharField(max_length=255)
+    property_type = models.CharField(max_length=10, choices=Property.PROPERTY_TYPE_CHOICES)
+    listings = models.PositiveIntegerField()
+    low_per_sqft = models.FloatField()
+    median_per_sqft = models.FloatField()
+    high_per_sqft = models.FloatField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'property_type'], name='unique_market_segment'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_type} in {self.location}"
+
+
+class UnreadCounter(models.Model):
+    """
+    Each user's total of unread messages across all conversations, so the
+    navbar badge is a primary key lookup (usually served from the cache)
+    instead of a count over MessageModel on every page.
+
+    Sending a message increments the recipient's counter; reading a thread
+    recomputes it from the per-conversation counts, which also corrects any
+    drift. ``manage.py rebuild_unread_counters`` recomputes every counter.
+    """
+    user = models.OneToOneField(User, primary_key=True, related_name='+', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.count} unread for user {self.user_id}"
+
+    @staticmethod
+    def cache_key(user_id):
+        return f'unread-messages:{user_id}'
+
+    @classmethod
+    def invalidate(cls, user_id):
+        # Only drop the cached value once the new count is visible to others
+        transaction.on_commit(lambda: cache.delete(cls.cache_key(user_id)))
+
+    @staticmethod
+    def total_for(user_id):
+        """Unread total for ``user_id`` summed from their conversations."""
+        totals = Conversation.objects.for_user(user_id).aggregate(total=models.Sum(
+            models.Case(models.When(user_a_id=user_id, then='unread_a'), default='unread_b')
+        ))
+        return totals['total'] or 0
+
+    @classmethod
+    def increment(cls, user_id):
+        if not cls.objects.filter(user_id=user_id).update(count=models.F('count') + 1):
+            cls.recount(user_id)
+        cls.invalidate(user_id)
+
+    @classmethod
+    def recount(cls, user_id):
+        count = cls.total_for(user_id)
+        # One upsert, where update_or_create would lock, read and then write
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, count=count)], update_conflicts=True, unique_fields=['user'], update_fields=['count'],
+        )
+        cls.invalidate(user_id)
+        return count
+
+    @classmethod
+    def rebuild_all(cls, batch_size=1000):
+        """Recompute every user's counter with two grouped queries. Returns the row count."""
+        totals = dict.fromkeys(User.objects.values_list('pk', flat=True), 0)
+        for user_field, unread_field in (('user_a', 'unread_a'), ('user_b', 'unread_b')):
+            grouped = (
+                Conversation.objects.filter(**{f'{unread_field}__gt': 0})
+                .order_by().values(user_field).annotate(total=models.Sum(unread_field))
+            )
+            for row in grouped:
+                totals[row[user_field]] += row['total']
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                [cls(user_id=user_id, count=count) for user_id, count in totals.items()],
+                batch_size=batch_size, update_conflicts=True, unique_fields=['user'], update_fields=['count'],
+            )
+        cache.delete_many([cls.cache_key(user_id) for user_id in totals])
+        return len(totals)
+
+    @classmethod
+    def get_count(cls, user_id):
+        """The cached unread total, falling back to the counter row."""
+        key = cls.cache_key(user_id)
+        count = cache.get(key)
+        if count is None:
+            count = cls.objects.filter(user_id=user_id).values_list('count', flat=True).first()
+            if count is None:
+                count = cls.recount(user_id)
+            cache.set(key, count, getattr(settings, 'UNREAD_COUNT_CACHE_TIMEOUT', 300))
+        return count
+
+
+class ListingImport(models.Model):
+    """
+    A bulk import uploaded by a seller and run in the background by
+    listings.bulk. Per-row errors are kept (up to a limit) for the seller to
+    fix and re-upload.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    seller = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    source = models.CharField(max_length=255)
+    archive = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['seller', '-created_at'], name='listing_import_seller_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import #{self.pk} by {self.seller_id} ({self.status})"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, stored in the database so no separate broker is
+    needed. Jobs are created with listings.jobs.enqueue() and executed by
+    ``manage.py run_worker``.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # The worker's "next runnable job" query only looks at pending jobs
+            models.Index(fields=['run_after', 'id'], condition=models.Q(status='pending'), name='job_pending_idx'),
+            models.Index(fields=['status', 'locked_at'], name='job_status_locked_idx'),
+        ]
@@ -0,0 +1,169 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder trims datetimes to milliseconds, which would break the
+    equality test on tied keys, so datetimes keep their full precision here.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor token cannot be decoded for the paginator's ordering."""
+
+
+class CursorPage:
+    """
+    A single page of results produced by KeysetPaginator.
+
+    Unlike Django's Page there is no page number or total count: the page only
+    knows whether there is something after or before it, and the opaque
+    cursors to get there.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Cursor based paginator for querysets ordered on a unique key.
+
+    Instead of OFFSET, each page is fetched with a WHERE clause that continues
+    from the last row of the previous page, so page 1 and page 10,000 cost the
+    same as long as an index matches the ordering. The ordering must end with a
+    unique, non-null field (normally the primary key) so that ties on the
+    leading fields (e.g. two listings with the same list_date) are stable.
+    """
+
+    def __init__(self, queryset, ordering=('-list_date', '-id'), per_page=24):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [self._get_field(name.lstrip('-')) for name in self.ordering]
+
+    def _get_field(self, name):
+        opts = self.queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    # --- Cursor tokens ---
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field.attname) for field in self.fields]
+        payload = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError, TypeError):
+            raise InvalidCursor(f"Malformed cursor: {token!r}")
+
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(f"Cursor does not match ordering {self.ordering}.")
+
+        try:
+            values = [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(f"Cursor contains invalid values: {token!r}")
+        # Ordering keys are never null, and a None can't be compared in SQL
+        if any(value is None for value in values):
+            raise InvalidCursor(f"Cursor contains invalid values: {token!r}")
+        return values
+
+    # --- Query building ---
+
+    def _seek_filter(self, values, reverse=False):
+        """
+        Build the row-value comparison (a, b) > (x, y) as
+        (a > x) OR (a = x AND b > y), honouring each field's direction.
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for name, field, value in zip(self.ordering, self.fields, values):
+            descending = name.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal_prefix & Q(**{f'{field.name}__{lookup}': value})
+            equal_prefix &= Q(**{field.name: value})
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def page(self, after=None, before=None):
+        """
+        Return the page that follows the ``after`` cursor, the page that
+        precedes the ``before`` cursor, or the first page if neither is given.
+        Raises InvalidCursor for tokens that cannot be decoded.
+        """
+        queryset = self.queryset
+
+        if before:
+            values = self.decode_cursor(before)
+            rows = list(
+                queryset.filter(self._seek_filter(values, reverse=True))
+                .order_by(*self._reversed_ordering())[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            previous_cursor = self.encode_cursor(rows[0]) if has_more and rows else None
+            next_cursor = self.encode_cursor(rows[-1]) if rows else None
+            return CursorPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+        if after:
+            values = self.decode_cursor(after)
+            queryset = queryset.filter(self._seek_filter(values))
+
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self.encode_cursor(rows[-1]) if has_more else None
+        previous_cursor = self.encode_cursor(rows[0]) if after and rows else None
+        return CursorPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+    def get_page(self, after=None, before=None):
+        """
+        Like page(), but falls back to the first page on a bad cursor, which is
+        what views want when the token came from a user-editable URL.
+        """
+        try:
+            return self.page(after=after, before=before)
+        except InvalidCursor:
+            return self.page()
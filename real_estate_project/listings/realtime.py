@@ -0,0 +1,351 @@
+"""
+Real-time messaging over WebSockets, served by the ASGI application.
+
+Browsers connect to ``/ws/messages/`` and receive JSON events for their user:
+
+    {"type": "message", "partner_id": 7, "unread": 3, "unread_total": 5, "message": {...}}
+    {"type": "read", "partner_id": 7, "reader_id": 4, "upto": 1234}
+
+``unread`` counts the conversation, ``unread_total`` all of the user's
+conversations (the navbar badge). Read events sent back to the reader carry
+``unread_total`` as well.
+
+Events are routed through a broker. InProcessBroker delivers events published
+in the same process, which is all a single ASGI process needs.
+DatabasePollingBroker lets several worker processes (or a WSGI tier writing
+messages) fan out without extra infrastructure: each process runs one poll
+of the messages and read receipt tables for all of its connections. The
+broker is chosen with the REALTIME_BROKER setting.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import time
+from collections import deque
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_PATH = '/ws/messages/'
+
+
+class InProcessBroker:
+    """
+    Fan-out to the connections held by this process.
+
+    publish() may be called from any thread (sync views run in a thread pool
+    under ASGI); delivery is handed to each subscriber's event loop.
+    """
+
+    # Events queued for a slow client beyond this are dropped; the page can
+    # always catch up through the ?since= polling endpoint.
+    queue_size = 256
+
+    def __init__(self):
+        self._subscribers = {}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        subscribers = self._subscribers.get(user_id, set())
+        subscribers.difference_update({s for s in subscribers if s[1] is queue})
+        if not subscribers:
+            self._subscribers.pop(user_id, None)
+
+    def connection_count(self):
+        return sum(len(s) for s in self._subscribers.values())
+
+    def wants_published_messages(self):
+        """Whether publish_message() needs to load and send new messages."""
+        return bool(self._subscribers)
+
+    def deliver(self, user_id, event):
+        for loop, queue in list(self._subscribers.get(user_id, ())):
+            loop.call_soon_threadsafe(self._put, queue, event)
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+    def publish_read(self, conversation, reader_id, upto_id):
+        for user_id, event in read_events(conversation, reader_id, upto_id):
+            self.publish(user_id, event)
+
+
+class _TableTail:
+    """
+    Reads the rows appended to a table, in id order, across polls.
+
+    Ids are allocated when a row is inserted but become visible when its
+    transaction commits, so a row can appear after higher ids were already
+    read. The ids up to the newest one read are therefore only taken as
+    settled ``settle`` seconds later; until then each poll re-reads the ids
+    in that window (an index-only query) and returns any it hasn't seen.
+    """
+
+    def __init__(self, queryset, settle, batch_size=500):
+        self.queryset = queryset
+        self.settle = settle
+        self.batch_size = batch_size
+        self.floor = 0  # every row with id <= floor has been returned
+        self.latest = 0  # the highest id returned
+        self.seen = set()  # ids in (floor, latest] that have been returned
+        self.marks = deque()  # (monotonic time, latest) after each poll
+
+    def start(self):
+        self.floor = self.latest = self.queryset.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def read(self):
+        now = time.monotonic()
+        rows = list(self.queryset.filter(id__gt=self.latest).order_by('id')[:self.batch_size])
+        if self.latest > self.floor:
+            window = self.queryset.filter(id__gt=self.floor, id__lte=self.latest).values_list('id', flat=True)
+            late = set(window) - self.seen
+            if late:
+                rows[:0] = self.queryset.filter(id__in=late).order_by('id')
+        for row in rows:
+            self.seen.add(row.pk)
+            self.latest = max(self.latest, row.pk)
+
+        self.marks.append((now, self.latest))
+        while now - self.marks[0][0] >= self.settle:
+            self.floor = max(self.floor, self.marks.popleft()[1])
+        self.seen = {pk for pk in self.seen if pk > self.floor}
+        return rows
+
+
+class DatabasePollingBroker(InProcessBroker):
+    """
+    Multi-process fan-out. Instead of relying on the process that saved a
+    message, every process polls for new messages and read receipts once per
+    interval and delivers them to its own subscribers, so the cost is a few
+    small indexed queries per process rather than per connection.
+    """
+
+    # Read receipts older than this are deleted by the poll
+    receipt_retention = datetime.timedelta(minutes=10)
+
+    def __init__(self):
+        from .models import MessageModel, ReadReceipt
+
+        super().__init__()
+        self.interval = getattr(settings, 'REALTIME_POLL_INTERVAL', 1.0)
+        settle = getattr(settings, 'REALTIME_SETTLE_SECONDS', 10.0)
+        self._messages = _TableTail(MessageModel.objects.select_related('conversation'), settle)
+        self._receipts = _TableTail(ReadReceipt.objects.select_related('conversation'), settle)
+        self._pruned_at = None
+        self._task = None
+
+    async def start(self):
+        await sync_to_async(self._start_tails)()
+        self._task = asyncio.create_task(self._poll_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def wants_published_messages(self):
+        # New messages are picked up by the poll in every process
+        return False
+
+    def publish_read(self, conversation, reader_id, upto_id):
+        # Recorded for the poll in every process, this one included
+        from .models import ReadReceipt
+        ReadReceipt.objects.create(conversation=conversation, reader_id=reader_id, upto=upto_id)
+
+    def _start_tails(self):
+        self._messages.start()
+        self._receipts.start()
+
+    def _fetch_events(self):
+        events = []
+        for message in self._messages.read():
+            events.extend(message_events(message))
+        for receipt in self._receipts.read():
+            events.extend(read_events(receipt.conversation, receipt.reader_id, receipt.upto))
+        self._prune_receipts()
+        return events
+
+    def _prune_receipts(self):
+        from .models import ReadReceipt
+
+        now = timezone.now()
+        if self._pruned_at is None or now - self._pruned_at >= self.receipt_retention / 10:
+            ReadReceipt.objects.filter(created_at__lt=now - self.receipt_retention).delete()
+            self._pruned_at = now
+
+    async def _poll_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._subscribers:
+                continue
+            try:
+                events = await sync_to_async(self._fetch_events)()
+            except Exception:
+                logger.exception("Realtime poll failed")
+                continue
+            for user_id, event in events:
+                self.deliver(user_id, event)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        broker_class = import_string(getattr(settings, 'REALTIME_BROKER', 'listings.realtime.InProcessBroker'))
+        _broker = broker_class()
+    return _broker
+
+
+# --- Events ---
+
+def message_events(message):
+    """(user_id, event) pairs announcing a new message to both participants."""
+    from .models import Conversation, UnreadCounter
+
+    payload = {
+        'id': message.pk,
+        'sender_id': message.sender_id,
+        'body': message.body,
+        'timestamp': message.timestamp.isoformat(),
+    }
+    conversation = message.conversation
+    recipient_unread = None
+    if conversation:
+        recipient_unread = getattr(conversation, Conversation.unread_field(message.recipient_id, message.sender_id))
+    return [
+        (message.recipient_id, {
+            'type': 'message', 'partner_id': message.sender_id, 'unread': recipient_unread,
+            'unread_total': UnreadCounter.get_count(message.recipient_id), 'message': payload,
+        }),
+        (message.sender_id, {
+            'type': 'message', 'partner_id': message.recipient_id, 'unread': 0, 'message': payload,
+        }),
+    ]
+
+
+def publish_message(message_id):
+    """Announce a saved message. Called once its transaction commits."""
+    from .models import MessageModel
+
+    broker = get_broker()
+    if not broker.wants_published_messages():
+        return
+    message = MessageModel.objects.select_related('conversation').filter(pk=message_id).first()
+    if message is None:
+        return
+    for user_id, event in message_events(message):
+        broker.publish(user_id, event)
+
+
+def read_events(conversation, reader_id, upto_id):
+    """(user_id, event) pairs announcing that ``reader_id`` read up to ``upto_id``."""
+    from .models import UnreadCounter
+
+    event = {'type': 'read', 'reader_id': reader_id, 'upto': upto_id}
+    partner = conversation.user_b_id if reader_id == conversation.user_a_id else conversation.user_a_id
+    return [
+        (reader_id, dict(event, partner_id=partner, unread_total=UnreadCounter.get_count(reader_id))),
+        (partner, dict(event, partner_id=reader_id)),
+    ]
+
+
+def publish_read(conversation, reader, upto_id):
+    get_broker().publish_read(conversation, reader.pk, upto_id)
+
+
+# --- ASGI WebSocket endpoint ---
+
+def _headers(scope):
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+
+
+def _cookies(headers):
+    cookies = {}
+    for chunk in headers.get('cookie', '').split(';'):
+        name, _, value = chunk.strip().partition('=')
+        if name:
+            cookies[name] = value
+    return cookies
+
+
+def _same_origin(headers):
+    """Reject cross-site WebSocket hijacking: browsers always send Origin."""
+    origin = headers.get('origin')
+    return origin is not None and urlsplit(origin).netloc == headers.get('host')
+
+
+async def authenticate(scope):
+    """Return the logged-in user for the connection's session cookie, or None."""
+    engine = import_string(f'{settings.SESSION_ENGINE}.SessionStore')
+    session_key = _cookies(_headers(scope)).get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+    request = SimpleNamespace(session=engine(session_key))
+    user = await aget_user(request)
+    return user if user.is_authenticated else None
+
+
+async def serve_connection(user_id, receive, send, broker=None):
+    """Push events for ``user_id`` until the client disconnects."""
+    broker = broker or get_broker()
+    queue = broker.subscribe(user_id)
+    receive_task = asyncio.ensure_future(receive())
+    event_task = asyncio.ensure_future(queue.get())
+    try:
+        await send({'type': 'websocket.send', 'text': json.dumps({'type': 'hello', 'user_id': user_id})})
+        while True:
+            done, _ = await asyncio.wait({receive_task, event_task}, return_when=asyncio.FIRST_COMPLETED)
+            if receive_task in done:
+                incoming = receive_task.result()
+                if incoming['type'] == 'websocket.disconnect':
+                    return
+                if incoming.get('text') == 'ping':
+                    await send({'type': 'websocket.send', 'text': '{"type":"pong"}'})
+                receive_task = asyncio.ensure_future(receive())
+            if event_task in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(event_task.result())})
+                event_task = asyncio.ensure_future(queue.get())
+    finally:
+        receive_task.cancel()
+        event_task.cancel()
+        broker.unsubscribe(user_id, queue)
+
+
+async def websocket_application(scope, receive, send):
+    connect = await receive()
+    if connect['type'] != 'websocket.connect':
+        return
+
+    user = await authenticate(scope) if _same_origin(_headers(scope)) else None
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    await send({'type': 'websocket.accept'})
+    await serve_connection(user.pk, receive, send)
@@ -0,0 +1,289 @@
+"""
+Per-user listing recommendations.
+
+Scores are computed offline (``manage.py refresh_recommendations``) or
+incrementally by background jobs when a profile, a wishlist or a listing
+changes, and stored in the Recommendation table. The homepage then reads a
+user's best rows with one indexed query and picks a varied few of them.
+
+A listing's score combines how close its price is to the user's budget,
+whether it is in their preferred location, how much it resembles the
+listings on their wishlist, and how recently it was listed. Recency alone
+never makes a listing relevant.
+"""
+import random
+from collections import Counter
+from decimal import Decimal
+from statistics import median
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Value
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+
+from users import identity
+from users.models import Profile
+
+from .models import Property, Recommendation
+
+# Rows kept per user; the homepage samples from the best of them
+RECOMMENDATIONS_PER_USER = 50
+
+# Candidates fetched per source (budget, location, wishlist, recent)
+CANDIDATES_PER_SOURCE = 300
+
+WEIGHTS = {
+    'budget': 3.0,
+    'location': 3.0,
+    'wishlist_type': 1.0,
+    'wishlist_location': 2.0,
+    'wishlist_price': 1.5,
+    'recency': 1.0,
+}
+
+# Prices further than this fraction from the target don't score at all
+PRICE_TOLERANCE = 0.4
+
+# Age at which the recency bonus halves
+RECENCY_HALF_LIFE_DAYS = 30
+
+
+class Preferences:
+    """What is known about a user's taste, gathered once per refresh."""
+
+    def __init__(self, user_id, budget=None, location=None, wishlist=()):
+        self.user_id = user_id
+        self.budget = budget if budget and budget > 0 else None
+        self.location = (location or '').strip().lower() or None
+        self.wishlist_ids = {p.pk for p in wishlist}
+        self.wishlist_types = Counter(p.property_type for p in wishlist)
+        self.wishlist_locations = Counter(p.location.strip().lower() for p in wishlist)
+        self.wishlist_price = median(p.price for p in wishlist) if wishlist else None
+        self.wishlist_size = len(wishlist)
+
+    @classmethod
+    def for_profile(cls, profile):
+        wishlist = list(profile.wishlist.filter(is_published=True).only('pk', 'property_type', 'location', 'price'))
+        return cls(profile.user_id, profile.budget, profile.preferred_location, wishlist)
+
+    @property
+    def has_criteria(self):
+        return bool(self.budget or self.location or self.wishlist_size)
+
+
+def _price_affinity(price, target):
+    if not target:
+        return 0.0
+    distance = abs(float(price) / float(target) - 1.0)
+    return max(0.0, 1.0 - distance / PRICE_TOLERANCE)
+
+
+def score(listing, preferences, now=None):
+    """Relevance of ``listing`` for ``preferences``, or 0 if it isn't relevant."""
+    components = {
+        'budget': _price_affinity(listing.price, preferences.budget),
+        'location': 1.0 if preferences.location and preferences.location in listing.location.lower() else 0.0,
+    }
+    if preferences.wishlist_size:
+        components['wishlist_type'] = preferences.wishlist_types[listing.property_type] / preferences.wishlist_size
+        components['wishlist_location'] = (
+            preferences.wishlist_locations[listing.location.strip().lower()] / preferences.wishlist_size
+        )
+        components['wishlist_price'] = _price_affinity(listing.price, preferences.wishlist_price)
+
+    if not any(components.values()):
+        return 0.0
+
+    age_days = ((now or timezone.now()) - listing.list_date).total_seconds() / 86400
+    components['recency'] = 0.5 ** (max(age_days, 0) / RECENCY_HALF_LIFE_DAYS)
+    return sum(WEIGHTS[name] * value for name, value in components.items())
+
+
+def _candidates(preferences):
+    """Listings worth scoring, gathered from a few index-friendly queries."""
+    published = Property.objects.filter(is_published=True).exclude(seller_id=preferences.user_id)
+    published = published.only('pk', 'price', 'location', 'property_type', 'list_date')
+    sources = [published.order_by('-list_date', '-id')]
+    for target in (preferences.budget, preferences.wishlist_price):
+        if target:
+            low = target * Decimal(1 - PRICE_TOLERANCE)
+            high = target * Decimal(1 + PRICE_TOLERANCE)
+            sources.append(published.filter(price__range=(low, high)).order_by('-list_date', '-id'))
+    if preferences.location:
+        sources.append(published.filter(location__icontains=preferences.location).order_by('-list_date', '-id'))
+    if preferences.wishlist_locations:
+        location_match = Q()
+        for location in preferences.wishlist_locations:
+            location_match |= Q(location__iexact=location)
+        sources.append(published.filter(location_match).order_by('-list_date', '-id'))
+
+    candidates = {}
+    for source in sources:
+        for listing in source[:CANDIDATES_PER_SOURCE]:
+            candidates.setdefault(listing.pk, listing)
+    for pk in preferences.wishlist_ids:
+        candidates.pop(pk, None)
+    return candidates.values()
+
+
+def refresh_for_profile(profile):
+    """Recompute and store one user's recommendations. Returns how many were kept."""
+    preferences = Preferences.for_profile(profile)
+    now = timezone.now()
+    scored = []
+    if preferences.has_criteria:
+        for listing in _candidates(preferences):
+            value = score(listing, preferences, now)
+            if value > 0:
+                scored.append((value, listing.pk))
+    scored.sort(reverse=True)
+    scored = scored[:RECOMMENDATIONS_PER_USER]
+
+    with transaction.atomic():
+        Recommendation.objects.filter(user_id=profile.user_id).delete()
+        Recommendation.objects.bulk_create([
+            Recommendation(user_id=profile.user_id, property_id=pk, score=value, computed_at=now)
+            for value, pk in scored
+        ])
+        # Marks the user as scored even when nothing matched, so the homepage
+        # doesn't retry. update() rather than save(): a profile save queues a refresh.
+        Profile.objects.filter(pk=profile.pk).update(recommendations_computed_at=now)
+        identity.invalidate(profile.user_id)
+    profile.recommendations_computed_at = now
+    return len(scored)
+
+
+def refresh_for_user(user_id):
+    profile = Profile.objects.filter(user_id=user_id).first()
+    if profile is None:
+        return 0
+    return refresh_for_profile(profile)
+
+
+def _interested_profiles(listing):
+    """
+    Profiles whose budget, preferred location or wishlisted locations match
+    ``listing``, found in SQL. Users it would only reach through the types
+    or prices on their wishlist get it at their next full refresh instead.
+    """
+    low = listing.price / Decimal(1 + PRICE_TOLERANCE)
+    high = listing.price / Decimal(1 - PRICE_TOLERANCE)
+    return (
+        Profile.objects.exclude(user_id=listing.seller_id)
+        .alias(location=Trim(Lower('preferred_location')), listing_location=Value(listing.location.lower()))
+        .filter(
+            Q(budget__gt=low, budget__lt=high)
+            | Q(location__gt='', listing_location__contains=F('location'))
+            | Q(wishlist__is_published=True, wishlist__location__iexact=listing.location.strip())
+        )
+        .distinct().order_by('pk')
+    )
+
+
+def _wishlists(profile_ids):
+    """``{profile id: [wishlisted published listings]}`` with one query."""
+    wishlists = {profile_id: [] for profile_id in profile_ids}
+    listings = (
+        Property.objects.filter(is_published=True, wishlisted_by__in=profile_ids)
+        .annotate(profile_id=F('wishlisted_by'))
+        .only('pk', 'property_type', 'location', 'price')
+    )
+    for listing in listings:
+        wishlists[listing.profile_id].append(listing)
+    return wishlists
+
+
+def _offer(listing, profiles, now):
+    """Offer ``listing`` to a chunk of profiles with a handful of queries. Returns how many took it."""
+    wishlists = _wishlists([profile.pk for profile in profiles])
+    scores = {}
+    for profile in profiles:
+        preferences = Preferences(profile.user_id, profile.budget, profile.preferred_location, wishlists[profile.pk])
+        if listing.pk not in preferences.wishlist_ids:
+            value = score(listing, preferences, now)
+            if value > 0:
+                scores[profile.user_id] = value
+    if not scores:
+        return 0
+
+    current = {
+        row['user_id']: row
+        for row in Recommendation.objects.filter(user_id__in=scores)
+        .values('user_id').annotate(count=Count('id'), lowest=Min('score')).order_by()
+    }
+    # Users whose list is full: the listing replaces their lowest row, if it beats it
+    full = {
+        user_id: current[user_id]['lowest'] for user_id in scores
+        if user_id in current and current[user_id]['count'] >= RECOMMENDATIONS_PER_USER
+    }
+    for user_id, lowest in list(full.items()):
+        if lowest >= scores[user_id]:
+            del scores[user_id]
+            del full[user_id]
+    evicted = {}
+    if full:
+        lowest_rows = Q()
+        for user_id, lowest in full.items():
+            lowest_rows |= Q(user_id=user_id, score=lowest)
+        for pk, user_id in Recommendation.objects.filter(lowest_rows).values_list('pk', 'user_id'):
+            evicted.setdefault(user_id, pk)
+
+    with transaction.atomic():
+        Recommendation.objects.filter(pk__in=evicted.values()).delete()
+        Recommendation.objects.bulk_create([
+            Recommendation(user_id=user_id, property=listing, score=value, computed_at=now)
+            for user_id, value in scores.items()
+        ])
+    return len(scores)
+
+
+def score_new_listing(property_id, chunk_size=500):
+    """
+    Offer a new or edited listing to the users it is relevant to, without
+    recomputing their whole lists: it is inserted only if it beats a user's
+    current lowest score (or they have room for more). Users are handled
+    ``chunk_size`` at a time, each chunk with a fixed number of queries.
+    """
+    listing = Property.objects.filter(pk=property_id, is_published=True).first()
+    Recommendation.objects.filter(property_id=property_id).delete()
+    if listing is None:
+        return 0
+
+    offered = 0
+    now = timezone.now()
+    chunk = []
+    for profile in _interested_profiles(listing).only('pk', 'user_id', 'budget', 'preferred_location').iterator(chunk_size=chunk_size):
+        chunk.append(profile)
+        if len(chunk) >= chunk_size:
+            offered += _offer(listing, chunk, now)
+            chunk = []
+    if chunk:
+        offered += _offer(listing, chunk, now)
+    return offered
+
+
+def top_for_user(user, count=4, pool=12, exclude=None):
+    """
+    A varied handful of ``user``'s best recommendations: the top ``pool`` rows
+    are read with one indexed query, then ``count`` are sampled favouring
+    different property types and locations. The sample is stable for the day,
+    so reloading the homepage doesn't reshuffle it.
+    """
+    rows = (
+        Recommendation.objects.filter(user=user, property__is_published=True)
+        .select_related('property')
+        .order_by('-score')
+    )
+    if exclude is not None:
+        rows = rows.exclude(property__in=exclude)
+    candidates = [row.property for row in rows[:pool]]
+
+    rng = random.Random(f'{user.pk}:{timezone.localdate().isoformat()}')
+    rng.shuffle(candidates)
+    # Take one listing per (type, location) first, then fill up with the rest
+    picked, repeats, seen = [], [], set()
+    for listing in candidates:
+        key = (listing.property_type, listing.location.lower())
+        (repeats if key in seen else picked).append(listing)
+        seen.add(key)
+    return (picked + repeats)[:count]
@@ -0,0 +1,74 @@
+from . import geo
+from .models import Property
+
+# Keyset orderings for each sort option. Every ordering ends on the primary key
+# so it can be paginated with KeysetPaginator, and each one is backed by one of
+# the composite indexes declared on Property.Meta.
+SORT_ORDERINGS = {
+    'newest': ('-list_date', '-id'),
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+    'largest': ('-area_sqft', '-id'),
+    'most_viewed': ('-view_count', '-id'),
+    'most_saved': ('-favorite_count', '-id'),
+}
+
+def search_properties(filters):
+    """
+    Build the queryset for a structured search.
+
+    ``filters`` is the cleaned_data of a PropertySearchForm. Returns a
+    ``(queryset, ordering)`` pair; the ordering is applied by the paginator.
+    """
+    queryset = Property.objects.filter(is_published=True)
+
+    if filters.get('property_type'):
+        queryset = queryset.filter(property_type=filters['property_type'])
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('min_price') is not None:
+        queryset = queryset.filter(price__gte=filters['min_price'])
+    if filters.get('max_price') is not None:
+        queryset = queryset.filter(price__lte=filters['max_price'])
+    if filters.get('min_bedrooms') is not None:
+        queryset = queryset.filter(bedrooms__gte=filters['min_bedrooms'])
+    if filters.get('min_bathrooms') is not None:
+        queryset = queryset.filter(bathrooms__gte=filters['min_bathrooms'])
+    if filters.get('min_area') is not None:
+        queryset = queryset.filter(area_sqft__gte=filters['min_area'])
+    if filters.get('max_area') is not None:
+        queryset = queryset.filter(area_sqft__lte=filters['max_area'])
+
+    location = (filters.get('location') or '').strip()
+    if location:
+        # Anywhere in the location, so "Hyderabad" finds "Madhapur, Hyderabad".
+        # On PostgreSQL a trigram index serves this LIKE '%...%' (migration 0020).
+        queryset = queryset.filter(location__icontains=location)
+
+    if filters.get('bbox'):
+        queryset = geo.within_bbox(queryset, *filters['bbox'])
+    if filters.get('lat') is not None:
+        queryset = geo.within_radius(queryset, filters['lat'], filters['lng'], filters['radius_km'])
+
+    return queryset, SORT_ORDERINGS[filters.get('sort') or 'newest']
+
+
+def property_summary(property_obj):
+    """Compact dictionary representation of a Property for JSON responses."""
+    return {
+        'id': property_obj.pk,
+        'title': property_obj.title,
+        'price': str(property_obj.price),
+        'property_type': property_obj.property_type,
+        'status': property_obj.status,
+        'bedrooms': property_obj.bedrooms,
+        'bathrooms': property_obj.bathrooms,
+        'area_sqft': property_obj.area_sqft,
+        'location': property_obj.location,
+        'latitude': property_obj.latitude,
+        'longitude': property_obj.longitude,
+        'main_image': property_obj.main_image.url if property_obj.main_image else None,
+        'list_date': property_obj.list_date.isoformat(),
+        'view_count': property_obj.view_count,
+        'favorite_count': property_obj.favorite_count,
+    }
@@ -0,0 +1,392 @@
+"""
+Synthetic data for reproducing production-sized tables locally: single fake
+listings for the benchmark commands, and MarketSeeder, which fills in a
+whole market (``manage.py seed_market``).
+
+MarketSeeder writes users with their profiles and roles, listings with
+their galleries, buyers' wishlists and buyer/seller message threads, each in
+chunks of ``batch_size`` rows with bulk_create(), so memory stays flat up
+to millions of rows. Only ids are kept between steps, in compact arrays.
+
+bulk_create() sends no signals, so like listings.bulk the seeder does the
+work the handlers would: full-text indexing per chunk, the conversations'
+last message and unread counts, the listings' favourite and inquiry counts,
+the users' unread totals, and one cache and similarity-index refresh at the
+end. Recommendations follow at the next ``manage.py refresh_recommendations``.
+"""
+import contextlib
+import datetime
+import random
+import time
+from array import array
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from users.identity import BUYERS, SELLERS
+from users.models import Profile
+
+from . import caching, fulltext, geo
+from .jobs import enqueue
+from .models import Conversation, MessageModel, Property, PropertyImage, UnreadCounter
+
+LOCATIONS = [
+    'Hyderabad', 'Madhapur, Hyderabad', 'Gachibowli, Hyderabad', 'Kondapur, Hyderabad',
+    'Bengaluru', 'Whitefield, Bengaluru', 'Electronic City, Bengaluru', 'Chennai',
+    'Anna Nagar, Chennai', 'Vijayawada', 'Visakhapatnam', 'Tirupati', 'Guntur',
+    'Pune', 'Hinjewadi, Pune', 'Mumbai', 'Thane, Mumbai', 'Kochi', 'Mysuru', 'Warangal',
+]
+FACINGS = ['North', 'South', 'East', 'West']
+PLACEHOLDER_IMAGE = 'properties/seed/placeholder.jpg'
+
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Arjun', 'Sai', 'Krishna', 'Rahul', 'Karthik', 'Ravi', 'Suresh',
+    'Ananya', 'Diya', 'Priya', 'Lakshmi', 'Sneha', 'Divya', 'Kavya', 'Meera', 'Pooja', 'Swathi',
+]
+LAST_NAMES = [
+    'Reddy', 'Sharma', 'Naidu', 'Rao', 'Iyer', 'Patel', 'Kumar', 'Nair', 'Menon', 'Gupta',
+    'Chowdary', 'Varma', 'Pillai', 'Joshi', 'Desai',
+]
+OPENING_MESSAGES = [
+    "Hi, is this property still available?",
+    "Could you share the exact location and nearby landmarks?",
+    "Is the price negotiable?",
+    "I'd like to schedule a visit this weekend. Is Saturday okay?",
+    "Are the documents clear for a bank loan?",
+]
+REPLIES = [
+    "Yes, it's still available.",
+    "Sure, I'll send the location pin shortly.",
+    "There is a little room for negotiation after a visit.",
+    "Saturday morning works for me.",
+    "All documents are clear and approved.",
+    "Thanks, that helps.",
+    "Could you send a few more photos?",
+    "What is the maintenance cost per month?",
+]
+
+
+@contextlib.contextmanager
+def explicit_dates(model, *field_names):
+    """
+    bulk_create() always stamps auto_now_add fields with the current time.
+    Within this block the named fields of ``model`` keep the values set on
+    the instances, so seeded rows can be spread over a realistic date range.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def explicit_list_dates():
+    """explicit_dates() for Property.list_date."""
+    return explicit_dates(Property, 'list_date')
+
+
+def fake_user(rng, username, password_hash, now=None, max_age_days=1095):
+    """Build (but don't save) a User; ``password_hash`` comes from make_password()."""
+    now = now or timezone.now()
+    return User(
+        username=username,
+        email=username,
+        first_name=rng.choice(FIRST_NAMES),
+        last_name=rng.choice(LAST_NAMES),
+        password=password_hash,
+        date_joined=now - datetime.timedelta(seconds=rng.randint(0, max_age_days * 86400)),
+    )
+
+
+def fake_profile(rng, user):
+    """Build (but don't save) a Profile; most buyers give a location and a budget."""
+    return Profile(
+        user=user,
+        preferred_location=rng.choice(LOCATIONS).split(',')[0] if rng.random() < 0.8 else None,
+        budget=Decimal(rng.randrange(2_000_000, 30_000_000, 100_000)) if rng.random() < 0.7 else None,
+    )
+
+
+def fake_property(rng, seller, now=None, max_age_days=730):
+    """Build (but don't save) a random, plausible Property for ``seller`` (a User or a user id)."""
+    now = now or timezone.now()
+    is_house = rng.random() < 0.7
+    area = rng.randint(600, 4000) if is_house else rng.randint(1000, 40000)
+    location = rng.choice(LOCATIONS)
+    if is_house:
+        bedrooms = rng.randint(1, 6)
+        title = f"{bedrooms} BHK House in {location.split(',')[0]}"
+    else:
+        bedrooms = None
+        title = f"{area:,} sqft Plot in {location.split(',')[0]}"
+
+    # Scatter listings a few kilometres around the centre of their locality
+    latitude, longitude = geo.geocode(location)
+    latitude += rng.uniform(-0.03, 0.03)
+    longitude += rng.uniform(-0.03, 0.03)
+
+    return Property(
+        title=title,
+        description=f"{title}. Close to schools, markets and public transport.",
+        price=Decimal(rng.randrange(1_000_000, 50_000_000, 5_000)),
+        property_type='House' if is_house else 'Land',
+        status='For Sale' if rng.random() < 0.8 else 'For Rent',
+        seller_id=getattr(seller, 'pk', seller),
+        bedrooms=bedrooms,
+        bathrooms=max(1, bedrooms - rng.randint(0, 1)) if bedrooms else None,
+        area_sqft=area,
+        location=location,
+        latitude=latitude,
+        longitude=longitude,
+        geohash=geo.encode(latitude, longitude),
+        facing=None if is_house else rng.choice(FACINGS),
+        main_image=PLACEHOLDER_IMAGE,
+        is_published=rng.random() < 0.95,
+        list_date=now - datetime.timedelta(seconds=rng.randint(0, max_age_days * 86400)),
+    )
+
+
+class MarketSeeder:
+    """
+    Fills the database with a synthetic market; see the module docstring.
+
+    Sizes are totals, except ``images_per_property``, ``wishlist_size`` and
+    ``messages_per_conversation``, which are averages. ``progress`` is
+    called with a line of text after each step.
+    """
+
+    def __init__(self, users=2000, properties=20000, images_per_property=3, wishlist_size=5,
+                 conversations=5000, messages_per_conversation=6, seller_share=0.2,
+                 batch_size=5000, seed=42, password='password', prefix='seed', progress=None):
+        self.users = users
+        self.properties = properties
+        self.images_per_property = images_per_property
+        self.wishlist_size = wishlist_size
+        self.conversations = conversations
+        self.messages_per_conversation = messages_per_conversation
+        self.seller_share = seller_share
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.password = password
+        self.prefix = prefix
+        self.progress = progress or (lambda line: None)
+        self.now = timezone.now()
+
+        self.seller_ids = array('q')
+        self.buyer_ids = array('q')
+        self.buyer_profile_ids = array('q')
+        # Published listings and their sellers, side by side
+        self.listing_ids = array('q')
+        self.listing_sellers = array('q')
+        # (first pk, last pk) of each chunk of listings written
+        self.property_ranges = []
+        self.counts = dict.fromkeys(
+            ['users', 'properties', 'images', 'wishlist_entries', 'conversations', 'messages'], 0
+        )
+
+    def _chunks(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield offset, min(self.batch_size, total - offset)
+
+    def _step(self, name, started):
+        self.progress(f"{name}: {self.counts[name]:,} in {time.perf_counter() - started:.1f}s")
+
+    def run(self):
+        """Seed everything. Returns the number of rows written per kind."""
+        self.seed_users()
+        self.seed_properties()
+        self.seed_wishlists()
+        self.seed_conversations()
+        self.finish()
+        return self.counts
+
+    def seed_users(self):
+        """Users with a profile each, in the Sellers or Buyers group."""
+        started = time.perf_counter()
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password_hash = make_password(self.password)
+        group_ids = {name: Group.objects.get_or_create(name=name)[0].pk for name in (SELLERS, BUYERS)}
+        # Carry on numbering after an earlier run with the same prefix
+        first = User.objects.filter(username__startswith=f'{self.prefix}-').count()
+        for offset, size in self._chunks(self.users):
+            users, roles = [], []
+            for n in range(first + offset, first + offset + size):
+                users.append(fake_user(self.rng, f'{self.prefix}-{n}@example.com', password_hash, self.now))
+                # The first two users make sure there is a seller and a buyer
+                roles.append(SELLERS if n - first == 0 or (n - first > 1 and self.rng.random() < self.seller_share) else BUYERS)
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                profiles = Profile.objects.bulk_create([fake_profile(self.rng, user) for user in users])
+                User.groups.through.objects.bulk_create([
+                    User.groups.through(user_id=user.pk, group_id=group_ids[role])
+                    for user, role in zip(users, roles)
+                ])
+            for user, profile, role in zip(users, profiles, roles):
+                if role == SELLERS:
+                    self.seller_ids.append(user.pk)
+                else:
+                    self.buyer_ids.append(user.pk)
+                    self.buyer_profile_ids.append(profile.pk)
+            self.counts['users'] += len(users)
+        self._step('users', started)
+
+    def seed_properties(self):
+        """Listings spread over the sellers, each with a gallery of 0 to twice the average images."""
+        if not self.seller_ids:
+            return
+        started = time.perf_counter()
+        with explicit_list_dates():
+            for offset, size in self._chunks(self.properties):
+                listings = [
+                    fake_property(self.rng, self.rng.choice(self.seller_ids), self.now)
+                    for _ in range(size)
+                ]
+                with transaction.atomic():
+                    listings = Property.objects.bulk_create(listings)
+                    images = PropertyImage.objects.bulk_create([
+                        PropertyImage(property_id=listing.pk, image=PLACEHOLDER_IMAGE)
+                        for listing in listings
+                        for _ in range(self.rng.randint(0, 2 * self.images_per_property))
+                    ], batch_size=self.batch_size)
+                    fulltext.index_properties(listing.pk for listing in listings)
+                for listing in listings:
+                    if listing.is_published:
+                        self.listing_ids.append(listing.pk)
+                        self.listing_sellers.append(listing.seller_id)
+                self.property_ranges.append((listings[0].pk, listings[-1].pk))
+                self.counts['properties'] += len(listings)
+                self.counts['images'] += len(images)
+        self._step('properties', started)
+
+    def seed_wishlists(self):
+        """Each buyer saves 0 to twice the average published listings."""
+        if not self.listing_ids:
+            return
+        started = time.perf_counter()
+        Wishlist = Profile.wishlist.through
+        entries = []
+        for profile_id in self.buyer_profile_ids:
+            size = min(self.rng.randint(0, 2 * self.wishlist_size), len(self.listing_ids))
+            for index in self.rng.sample(range(len(self.listing_ids)), size):
+                entries.append(Wishlist(profile_id=profile_id, property_id=self.listing_ids[index]))
+            if len(entries) >= self.batch_size:
+                Wishlist.objects.bulk_create(entries)
+                self.counts['wishlist_entries'] += len(entries)
+                entries = []
+        if entries:
+            Wishlist.objects.bulk_create(entries)
+            self.counts['wishlist_entries'] += len(entries)
+        self._step('wishlist_entries', started)
+
+    def seed_conversations(self):
+        """
+        Buyers asking sellers about their listings: one thread per pair, the
+        buyer writing first, then alternating replies over hours or days.
+        Some recipients haven't read the latest messages yet.
+        """
+        if not self.listing_ids or not self.buyer_ids:
+            return
+        started = time.perf_counter()
+        # At most one conversation per pair, stored as one int per pair
+        pairs = set()
+        wanted = min(self.conversations, len(self.buyer_ids) * len(self.seller_ids))
+        with explicit_dates(MessageModel, 'timestamp'):
+            for offset, size in self._chunks(wanted):
+                threads = []
+                attempts = 0
+                while len(threads) < size and attempts < size * 20:
+                    attempts += 1
+                    index = self.rng.randrange(len(self.listing_ids))
+                    buyer_id, seller_id = self.rng.choice(self.buyer_ids), self.listing_sellers[index]
+                    user_a_id, user_b_id = Conversation.pair(buyer_id, seller_id)
+                    if (user_a_id << 32 | user_b_id) in pairs:
+                        continue
+                    pairs.add(user_a_id << 32 | user_b_id)
+                    threads.append(self._fake_thread(buyer_id, seller_id, self.listing_ids[index]))
+                if not threads:
+                    break
+                self._write_threads(threads)
+        self._step('conversations', started)
+        self.progress(f"messages: {self.counts['messages']:,}")
+
+    def _fake_thread(self, buyer_id, seller_id, property_id):
+        length = self.rng.randint(1, max(1, 2 * self.messages_per_conversation - 1))
+        sent_at = self.now - datetime.timedelta(seconds=self.rng.randint(3600, 180 * 86400))
+        messages = []
+        sender_id, recipient_id = buyer_id, seller_id
+        for n in range(length):
+            messages.append(MessageModel(
+                sender_id=sender_id,
+                recipient_id=recipient_id,
+                property_id=property_id if n == 0 else None,
+                body=self.rng.choice(OPENING_MESSAGES if n == 0 else REPLIES),
+                timestamp=sent_at,
+            ))
+            sent_at = min(self.now, sent_at + datetime.timedelta(minutes=self.rng.randint(2, 2 * 24 * 60)))
+            # Replies usually alternate; now and then someone sends two in a row
+            if self.rng.random() < 0.8:
+                sender_id, recipient_id = recipient_id, sender_id
+        user_a_id, user_b_id = Conversation.pair(buyer_id, seller_id)
+        conversation = Conversation(user_a_id=user_a_id, user_b_id=user_b_id, last_activity=messages[-1].timestamp)
+        return conversation, messages
+
+    def _write_threads(self, threads):
+        with transaction.atomic():
+            conversations = Conversation.objects.bulk_create([conversation for conversation, _ in threads])
+            for conversation, messages in threads:
+                for message in messages:
+                    message.conversation_id = conversation.pk
+            MessageModel.objects.bulk_create(
+                [message for _, messages in threads for message in messages], batch_size=self.batch_size
+            )
+            for conversation, messages in threads:
+                self._set_read_state(conversation, messages)
+            Conversation.objects.bulk_update(
+                conversations, ['last_message', 'unread_a', 'unread_b', 'read_upto_a', 'read_upto_b'],
+                batch_size=self.batch_size,
+            )
+        self.counts['conversations'] += len(threads)
+        self.counts['messages'] += sum(len(messages) for _, messages in threads)
+
+    def _set_read_state(self, conversation, messages):
+        """What Conversation.mark_read() would have left: read up to a point, the rest unread."""
+        conversation.last_message_id = messages[-1].pk
+        for suffix, user_id in (('a', conversation.user_a_id), ('b', conversation.user_b_id)):
+            unread = 0
+            if self.rng.random() < 0.3:
+                # The trailing run of messages this participant received
+                while unread < len(messages) and messages[-1 - unread].recipient_id == user_id:
+                    unread += 1
+            seen = messages[-1 - unread].pk if unread < len(messages) else 0
+            setattr(conversation, f'unread_{suffix}', unread)
+            setattr(conversation, f'read_upto_{suffix}', seen)
+
+    def _recount(self, field, related, related_field):
+        """Set Property.``field`` to its count of ``related`` rows, over the seeded listings."""
+        count = (
+            related.objects.filter(**{related_field: models.OuterRef('pk')})
+            .order_by().values(related_field).annotate(count=models.Count('*')).values('count')
+        )
+        for first, last in self.property_ranges:
+            Property.objects.filter(pk__gte=first, pk__lte=last).update(
+                **{field: Coalesce(models.Subquery(count), 0)}
+            )
+
+    def finish(self):
+        """The bookkeeping the skipped signals and model saves would have done."""
+        started = time.perf_counter()
+        self._recount('favorite_count', Profile.wishlist.through, 'property_id')
+        self._recount('inquiry_count', MessageModel, 'property_id')
+        UnreadCounter.rebuild_all(batch_size=self.batch_size)
+        with connection.cursor() as cursor:
+            for model in (User, Profile, Property, PropertyImage, Conversation, MessageModel):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        caching.invalidate_listings()
+        enqueue('listings.build_similarity_index', unique=True)
+        self.progress(f"counters and statistics: {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,194 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import Profile
+
+from . import analytics, caching, counters, fulltext, geo, images, realtime
+from .jobs import enqueue
+from .models import MessageModel, Property, PropertyImage
+
+
+def _file_name(instance, attname):
+    # Read the raw attribute so a deferred field doesn't trigger a query
+    value = instance.__dict__.get(attname)
+    return getattr(value, 'name', value)
+
+
+@receiver(post_save, sender=Property)
+def sync_search_index(sender, instance, **kwargs):
+    """Keep the SQLite full-text table in step with the listing."""
+    fulltext.index_property(instance)
+
+
+@receiver(post_delete, sender=Property)
+def remove_from_search_index(sender, instance, **kwargs):
+    fulltext.remove_property(instance.pk)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def expire_cached_property(sender, instance, **kwargs):
+    """Sellers see their edits straight away on the cached public pages."""
+    caching.invalidate_property(instance.pk)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def expire_cached_property_images(sender, instance, **kwargs):
+    caching.invalidate_property(instance.property_id)
+    # The gallery is part of the listing as the API serves it
+    Property.objects.filter(pk=instance.property_id).update(updated_at=timezone.now())
+
+
+@receiver(post_init, sender=Property)
+def remember_main_image(sender, instance, **kwargs):
+    instance._saved_main_image = _file_name(instance, 'main_image')
+
+
+@receiver(pre_save, sender=Property)
+def reset_renditions_on_new_image(sender, instance, **kwargs):
+    """A new main image shows a placeholder until its renditions are built."""
+    instance._main_image_changed = instance.main_image.name != instance._saved_main_image
+    if instance._main_image_changed:
+        instance.renditions_ready = False
+
+
+@receiver(post_init, sender=Property)
+def remember_location(sender, instance, **kwargs):
+    instance._saved_location = instance.__dict__.get('location')
+
+
+@receiver(pre_save, sender=Property)
+def geocode_location(sender, instance, **kwargs):
+    """Place new listings, and listings whose location changed, on the map."""
+    location = instance.__dict__.get('location')
+    if location is None:
+        return
+    latitude, longitude = instance.__dict__.get('latitude'), instance.__dict__.get('longitude')
+    if location != instance._saved_location or (latitude is None and 'latitude' in instance.__dict__):
+        # Cheap: an in-memory lookup, so unknown locations are simply tried again
+        geo.locate(instance)
+    elif latitude is not None and longitude is not None:
+        # Keep the geohash in step with coordinates set by hand
+        instance.geohash = geo.encode(latitude, longitude)
+    instance._saved_location = location
+
+
+@receiver(post_save, sender=Property)
+def queue_main_image_processing(sender, instance, **kwargs):
+    if instance._main_image_changed and instance.main_image:
+        enqueue('listings.process_property_image', {
+            'property_id': instance.pk,
+            'image_name': instance.main_image.name,
+        })
+    instance._saved_main_image = instance.main_image.name
+
+
+@receiver(post_save, sender=PropertyImage)
+def queue_gallery_image_processing(sender, instance, created, **kwargs):
+    if created and instance.image:
+        enqueue('listings.process_gallery_image', {
+            'image_id': instance.pk,
+            'image_name': instance.image.name,
+        })
+
+
+@receiver(post_delete, sender=PropertyImage)
+def delete_gallery_image_renditions(sender, instance, **kwargs):
+    if instance.image:
+        images.delete_renditions(instance.image.name)
+
+
+@receiver(post_delete, sender=Property)
+def delete_main_image_renditions(sender, instance, **kwargs):
+    if instance.main_image:
+        images.delete_renditions(instance.main_image.name)
+
+
+@receiver(post_save, sender=MessageModel)
+def push_new_message(sender, instance, created, **kwargs):
+    """Send new messages to connected WebSocket clients once they're committed."""
+    if created:
+        transaction.on_commit(lambda: realtime.publish_message(instance.pk))
+
+
+# --- Recommendations and similar listings ---
+
+# Property fields that recommendation scores depend on
+SCORED_FIELDS = ('price', 'location', 'property_type', 'is_published')
+# Property fields that make up its similarity feature vector
+FEATURE_FIELDS = ('price', 'area_sqft', 'bedrooms', 'bathrooms', 'property_type', 'status', 'location', 'is_published')
+
+
+def _field_values(instance):
+    # Raw attributes, so deferred fields don't trigger queries
+    return {name: instance.__dict__.get(name) for name in set(SCORED_FIELDS + FEATURE_FIELDS)}
+
+
+def _changed(instance, fields):
+    current = _field_values(instance)
+    return any(current[name] != instance._saved_field_values[name] for name in fields)
+
+
+@receiver(post_init, sender=Property)
+def remember_tracked_fields(sender, instance, **kwargs):
+    instance._saved_field_values = _field_values(instance)
+
+
+@receiver(post_save, sender=Property)
+def queue_listing_scoring(sender, instance, created, **kwargs):
+    if created or _changed(instance, SCORED_FIELDS):
+        enqueue('listings.score_new_listing', {'property_id': instance.pk}, unique=True)
+    if created or _changed(instance, FEATURE_FIELDS):
+        enqueue('listings.update_similarity_index', {'property_id': instance.pk}, unique=True)
+    instance._saved_field_values = _field_values(instance)
+
+
+@receiver(post_delete, sender=Property)
+def queue_similarity_removal(sender, instance, **kwargs):
+    enqueue('listings.update_similarity_index', {'property_id': instance.pk}, unique=True)
+
+
+@receiver(post_save, sender=Profile)
+def queue_profile_recommendations(sender, instance, **kwargs):
+    enqueue('listings.refresh_recommendations', {'user_id': instance.user_id}, unique=True)
+
+
+@receiver(m2m_changed, sender=Profile.wishlist.through)
+def queue_wishlist_recommendations(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.user_id]
+    elif pk_set:
+        user_ids = Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+    else:
+        return
+    for user_id in user_ids:
+        enqueue('listings.refresh_recommendations', {'user_id': user_id}, unique=True)
+
+
+# --- Popularity counters ---
+
+@receiver(m2m_changed, sender=Profile.wishlist.through)
+def recount_listing_favorites(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # property.wishlisted_by changed: only that listing is affected
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            counters.recount_favorites([instance.pk])
+    elif action == 'pre_clear':
+        # The cleared listings can't be looked up once the rows are gone
+        instance._cleared_wishlist_ids = list(
+            sender.objects.filter(profile_id=instance.pk).values_list('property_id', flat=True)
+        )
+    elif action == 'post_clear':
+        counters.recount_favorites(getattr(instance, '_cleared_wishlist_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        counters.recount_favorites(pk_set or [])
+
+
+@receiver(post_save, sender=MessageModel)
+def log_listing_inquiry(sender, instance, created, **kwargs):
+    if created and instance.property_id:
+        analytics.record(instance.property_id, 'inquiry')
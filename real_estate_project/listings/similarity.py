@@ -0,0 +1,315 @@
+"""
+"Similar properties" from nearest neighbours over listing feature vectors.
+
+Every published listing is a row of a float32 matrix: standardized log
+price and area, bedrooms and bathrooms, one-hot property type and status,
+and its location hashed into a few buckets, each block weighted by how much
+it should count. Neighbours are the rows closest to a listing's row, found
+with NumPy over the matrix in fixed-size batches.
+
+The matrix lives in ``.npy`` files under SIMILARITY_INDEX_DIR and is opened
+with ``mmap_mode``, so every worker process on a machine shares one copy in
+the page cache. ``manage.py build_similarity_index`` writes it from scratch,
+with spare capacity, into a new version directory and then switches the
+``CURRENT`` file to it, so readers see either the old set of files or the
+new one. Afterwards, background jobs update single rows in place when a
+listing changes, and readers notice new rows through the version's
+``meta.json`` file.
+
+Those jobs run in the job worker, so the directory must be one the web
+processes and the worker share: the same machine, or a network file system
+with working locks. Where they can't share it (separate hosts or services),
+the web processes only see the index built on their own machine, e.g. at
+deploy time.
+"""
+import json
+import math
+import os
+import shutil
+import tempfile
+import zlib
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: index writers aren't serialized there
+    fcntl = None
+
+from .models import Property
+
+FEATURE_FIELDS = ('pk', 'price', 'area_sqft', 'bedrooms', 'bathrooms', 'property_type', 'status', 'location')
+
+PROPERTY_TYPES = [value for value, _ in Property.PROPERTY_TYPE_CHOICES]
+STATUSES = [value for value, _ in Property.STATUS_CHOICES]
+LOCATION_BUCKETS = 32
+
+WEIGHTS = {
+    'price': 2.0,
+    'area': 1.5,
+    'bedrooms': 1.0,
+    'bathrooms': 0.5,
+    'type': 2.0,
+    'status': 1.0,
+    'location': 2.0,
+}
+
+DIMENSIONS = 4 + len(PROPERTY_TYPES) + len(STATUSES) + LOCATION_BUCKETS
+
+# Rows compared per NumPy operation, bounding temporary memory
+BATCH_ROWS = 65536
+
+
+def index_dir():
+    return Path(getattr(settings, 'SIMILARITY_INDEX_DIR', settings.BASE_DIR / 'var' / 'similarity'))
+
+
+def location_token(location):
+    """The part of a location that identifies the area, e.g. "pune" for "Pune, Maharashtra"."""
+    return (location or '').split(',')[0].strip().lower()
+
+
+def _location_bucket(location):
+    return zlib.crc32(location_token(location).encode()) % LOCATION_BUCKETS
+
+
+# --- Features ---
+
+def compute_stats(rows):
+    """Means and spreads used to standardize the numeric features."""
+    prices = np.log1p(np.array([float(r[1]) for r in rows] or [0.0]))
+    areas = np.log1p(np.array([float(r[2]) for r in rows] or [0.0]))
+    beds = np.array([r[3] or 0 for r in rows] or [0], dtype=np.float64)
+    baths = np.array([r[4] or 0 for r in rows] or [0], dtype=np.float64)
+    return {
+        'price': [float(prices.mean()), float(prices.std()) or 1.0],
+        'area': [float(areas.mean()), float(areas.std()) or 1.0],
+        'bedrooms': [float(beds.mean()), float(beds.std()) or 1.0],
+        'bathrooms': [float(baths.mean()), float(baths.std()) or 1.0],
+    }
+
+
+def feature_vector(row, stats):
+    """Feature row for a ``FEATURE_FIELDS`` tuple."""
+    _, price, area, bedrooms, bathrooms, property_type, status, location = row
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+
+    def standardized(name, value):
+        mean, spread = stats[name]
+        return WEIGHTS[name] * (value - mean) / spread
+
+    vector[0] = standardized('price', math.log1p(float(price)))
+    vector[1] = standardized('area', math.log1p(float(area)))
+    vector[2] = standardized('bedrooms', bedrooms or 0)
+    vector[3] = standardized('bathrooms', bathrooms or 0)
+    offset = 4
+    if property_type in PROPERTY_TYPES:
+        vector[offset + PROPERTY_TYPES.index(property_type)] = WEIGHTS['type']
+    offset += len(PROPERTY_TYPES)
+    if status in STATUSES:
+        vector[offset + STATUSES.index(status)] = WEIGHTS['status']
+    offset += len(STATUSES)
+    vector[offset + _location_bucket(location)] = WEIGHTS['location']
+    return vector
+
+
+# --- Index files ---
+
+class SimilarityIndex:
+    """The memory-mapped matrix, its rows' squared norms, listing ids and a liveness mask."""
+
+    def __init__(self, directory, meta, mode='r'):
+        self.directory = directory
+        self.meta = meta
+        self.count = meta['count']
+        self.features = np.load(directory / 'features.npy', mmap_mode=mode)
+        self.norms = np.load(directory / 'norms.npy', mmap_mode=mode)
+        self.ids = np.load(directory / 'ids.npy', mmap_mode=mode)
+        self.live = np.load(directory / 'live.npy', mmap_mode=mode)
+
+    @classmethod
+    def open(cls, directory=None, mode='r'):
+        version = _current_version(Path(directory or index_dir()))
+        if version is None:
+            return None
+        try:
+            meta = json.loads((version / 'meta.json').read_text())
+            return cls(version, meta, mode)
+        except FileNotFoundError:
+            # Replaced and removed by two rebuilds since CURRENT was read
+            return None
+
+    def row_of(self, pk):
+        rows = np.flatnonzero(self.ids[:self.count] == pk)
+        return int(rows[0]) if len(rows) else None
+
+    def nearest(self, vector, k=4, exclude_pk=None):
+        """Ids of the ``k`` live rows closest to ``vector``, nearest first."""
+        best_ids = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0, dtype=np.float32)
+        for start in range(0, self.count, BATCH_ROWS):
+            stop = min(start + BATCH_ROWS, self.count)
+            # |a - b|² = |a|² - 2a·b (+ |b|², the same for every row), as one matrix-vector product
+            distances = self.norms[start:stop] - 2 * (self.features[start:stop] @ vector)
+            ids = self.ids[start:stop]
+            usable = (self.live[start:stop] == 1) & (ids != (exclude_pk or 0))
+            distances = distances[usable]
+            ids = ids[usable]
+            if len(distances) > k:
+                keep = np.argpartition(distances, k)[:k]
+                distances, ids = distances[keep], ids[keep]
+            best_distances = np.concatenate([best_distances, distances])
+            best_ids = np.concatenate([best_ids, ids])
+        order = np.argsort(best_distances, kind='stable')[:k]
+        return [int(pk) for pk in best_ids[order]]
+
+
+def _lock(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    handle = open(directory / '.lock', 'w')
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+    return handle
+
+
+def _current_version(directory):
+    """The version directory that ``CURRENT`` names, or None before the first build."""
+    try:
+        name = (directory / 'CURRENT').read_text().strip()
+    except FileNotFoundError:
+        return None
+    return directory / name if name else None
+
+
+def _write_meta(directory, meta):
+    tmp = directory / 'meta.json.tmp'
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, directory / 'meta.json')
+
+
+def build(directory=None, chunk_size=5000):
+    """Write the index for all published listings from scratch. Returns the row count."""
+    directory = Path(directory or index_dir())
+    rows = list(
+        Property.objects.filter(is_published=True).order_by('pk')
+        .values_list(*FEATURE_FIELDS).iterator(chunk_size=chunk_size)
+    )
+    stats = compute_stats(rows)
+    count = len(rows)
+    capacity = max(1024, int(count * 1.25))
+
+    features = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+    norms = np.zeros(capacity, dtype=np.float32)
+    ids = np.zeros(capacity, dtype=np.int64)
+    live = np.zeros(capacity, dtype=np.uint8)
+    for i, row in enumerate(rows):
+        features[i] = feature_vector(row, stats)
+        norms[i] = features[i] @ features[i]
+        ids[i] = row[0]
+        live[i] = 1
+
+    lock = _lock(directory)
+    try:
+        previous = _current_version(directory)
+        version = Path(tempfile.mkdtemp(prefix='index-', dir=directory))
+        version.chmod(0o755)
+        for name, array in (('features', features), ('norms', norms), ('ids', ids), ('live', live)):
+            np.save(version / f'{name}.npy', array)
+        _write_meta(version, {'count': count, 'capacity': capacity, 'dimensions': DIMENSIONS, 'stats': stats})
+        # One rename switches the whole set of files
+        pointer = directory / 'CURRENT.tmp'
+        pointer.write_text(version.name)
+        os.replace(pointer, directory / 'CURRENT')
+        # The previous version stays for readers that have just read the old CURRENT
+        for old in directory.glob('index-*'):
+            if old not in (version, previous):
+                shutil.rmtree(old, ignore_errors=True)
+    finally:
+        lock.close()
+    _reader_cache.clear()
+    return count
+
+
+def update_listing(pk, directory=None):
+    """
+    Bring one listing's row up to date in place: rewrite it, append it, or
+    mark it dead if the listing is gone or unpublished. Falls back to a full
+    rebuild when the index is missing or out of spare rows.
+    """
+    directory = Path(directory or index_dir())
+    row = Property.objects.filter(pk=pk, is_published=True).values_list(*FEATURE_FIELDS).first()
+
+    lock = _lock(directory)
+    try:
+        index = SimilarityIndex.open(directory, mode='r+')
+        if index is None or index.meta.get('dimensions') != DIMENSIONS:
+            rebuild = True
+        else:
+            rebuild = False
+            position = index.row_of(pk)
+            if row is None:
+                if position is not None:
+                    index.live[position] = 0
+                    index.live.flush()
+            else:
+                if position is None:
+                    if index.count >= index.meta['capacity']:
+                        rebuild = True
+                    else:
+                        position = index.count
+                if not rebuild:
+                    vector = feature_vector(row, index.meta['stats'])
+                    index.features[position] = vector
+                    index.norms[position] = vector @ vector
+                    index.ids[position] = pk
+                    index.live[position] = 1
+                    for array in (index.features, index.norms, index.ids, index.live):
+                        array.flush()
+                    if position == index.count:
+                        _write_meta(index.directory, dict(index.meta, count=index.count + 1))
+    finally:
+        lock.close()
+
+    if rebuild:
+        build(directory)
+
+
+# --- Reading ---
+
+_reader_cache = {}
+
+
+def get_index():
+    """The shared read-only index, reopened when CURRENT or its meta.json has changed."""
+    directory = index_dir()
+    version = _current_version(directory)
+    if version is None:
+        return None
+    try:
+        stamp = (version.name, os.stat(version / 'meta.json').st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    cached = _reader_cache.get(directory)
+    if cached is None or cached[0] != stamp:
+        index = SimilarityIndex.open(directory)
+        if index is None:
+            return None
+        cached = _reader_cache[directory] = (stamp, index)
+    return cached[1]
+
+
+def similar_properties(property_obj, count=4):
+    """Published listings most similar to ``property_obj``, nearest first."""
+    index = get_index()
+    if index is None or not index.count:
+        return []
+    position = index.row_of(property_obj.pk)
+    if position is not None:
+        vector = np.array(index.features[position])
+    else:
+        vector = feature_vector([getattr(property_obj, f) for f in FEATURE_FIELDS], index.meta['stats'])
+    pks = index.nearest(vector, k=count, exclude_pk=property_obj.pk)
+    found = Property.objects.filter(is_published=True).in_bulk(pks)
+    return [found[pk] for pk in pks if pk in found]
@@ -0,0 +1,85 @@
+from django.utils import timezone
+
+from . import analytics, bulk, caching, images, recommendations, similarity
+from .jobs import task
+from .models import ListingImport, Property, PropertyImage
+
+
+@task('listings.process_property_image')
+def process_property_image(property_id, image_name):
+    """Strip EXIF from a listing's main image and build its renditions."""
+    # Skip work for listings deleted, or re-uploaded, since the job was queued
+    if not Property.objects.filter(pk=property_id, main_image=image_name).exists():
+        return
+    images.strip_exif(image_name)
+    images.generate_renditions(image_name)
+    Property.objects.filter(pk=property_id, main_image=image_name).update(renditions_ready=True, updated_at=timezone.now())
+    caching.invalidate_property(property_id)
+
+
+@task('listings.process_gallery_image')
+def process_gallery_image(image_id, image_name):
+    """Strip EXIF from a gallery image and build its renditions."""
+    gallery_image = PropertyImage.objects.filter(pk=image_id, image=image_name)
+    property_id = gallery_image.values_list('property_id', flat=True).first()
+    if property_id is None:
+        return
+    images.strip_exif(image_name)
+    images.generate_renditions(image_name)
+    gallery_image.update(renditions_ready=True)
+    Property.objects.filter(pk=property_id).update(updated_at=timezone.now())
+    caching.invalidate_property(property_id)
+
+
+@task('listings.refresh_recommendations')
+def refresh_recommendations(user_id):
+    """Recompute a user's recommendations after their profile or wishlist changed."""
+    recommendations.refresh_for_user(user_id)
+
+
+@task('listings.score_new_listing')
+def score_new_listing(property_id):
+    """Offer a new or changed listing to the users it suits."""
+    recommendations.score_new_listing(property_id)
+
+
+@task('listings.update_similarity_index')
+def update_similarity_index(property_id):
+    """Refresh, add or retire a listing's row in the similar-listings matrix."""
+    similarity.update_listing(property_id)
+
+
+@task('listings.rollup_listing_stats')
+def rollup_listing_stats():
+    """Fold new engagement events into the daily analytics rows and prune old ones."""
+    analytics.rollup()
+    analytics.prune_events()
+    if analytics.market_stats_stale():
+        analytics.refresh_market_stats()
+    # Events still too recent to roll up get a later run of their own
+    if analytics.has_unrolled_events():
+        analytics.schedule_rollup()
+
+
+@task('listings.process_imported_images')
+def process_imported_images(property_ids):
+    """Build renditions for a chunk of bulk-imported listings and their galleries."""
+    for property_id, image_name in Property.objects.filter(pk__in=property_ids).values_list('pk', 'main_image'):
+        process_property_image(property_id, image_name)
+    gallery = PropertyImage.objects.filter(property_id__in=property_ids).values_list('pk', 'image')
+    for image_id, image_name in gallery:
+        process_gallery_image(image_id, image_name)
+
+
+@task('listings.build_similarity_index')
+def build_similarity_index():
+    """Rebuild the similar-listings matrix, e.g. after a bulk import."""
+    similarity.build()
+
+
+@task('listings.import_listings')
+def import_listings(import_id):
+    """Run a bulk import uploaded through the site."""
+    listing_import = ListingImport.objects.filter(pk=import_id, status='pending').select_related('seller').first()
+    if listing_import is not None:
+        bulk.run_import(listing_import)
@@ -0,0 +1,71 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+
+from listings.images import RENDITIONS, SIZES, SRCSETS, rendition_name
+
+register = template.Library()
+
+
+def _ready(image):
+    # Property and PropertyImage both flag when their renditions have been built
+    return bool(image) and getattr(image.instance, 'renditions_ready', False)
+
+
+# Stand-in shown while a new upload is still being processed. An SVG, so it
+# fills every rendition's box (cropped to it, like the renditions themselves).
+PLACEHOLDER = 'listings/img/processing.svg'
+
+
+def placeholder_url(name):
+    return static(PLACEHOLDER)
+
+
+@register.filter
+def rendition(image, name):
+    """
+    URL of the JPEG rendition ``name`` of an ImageField file, or a placeholder
+    if its renditions haven't been generated yet.
+
+        <div style="background-image: url('{{ property.main_image|rendition:'carousel' }}')">
+    """
+    if not image:
+        return ''
+    if not _ready(image):
+        return placeholder_url(name)
+    return default_storage.url(rendition_name(image.name, name))
+
+
+def _srcset(image, name, fmt):
+    return ', '.join(
+        f'{default_storage.url(rendition_name(image.name, candidate, fmt))} {RENDITIONS[candidate][0]}w'
+        for candidate in SRCSETS[name]
+    )
+
+
+@register.inclusion_tag('listings/_picture.html')
+def picture(image, name, alt='', css_class='', style='', sizes=None, img_id=''):
+    """
+    Render a <picture> serving WebP with a JPEG fallback, each with a srcset
+    so the browser downloads the smallest rendition that fits the layout.
+
+        {% picture property.main_image 'card' alt=property.title css_class="card-img-top" %}
+    """
+    context = {
+        'alt': alt,
+        'css_class': css_class,
+        'style': style,
+        'img_id': img_id,
+        'ready': _ready(image),
+        'src': placeholder_url(name),
+    }
+    if context['ready']:
+        context.update({
+            'src': default_storage.url(rendition_name(image.name, name)),
+            'webp_srcset': _srcset(image, name, 'webp'),
+            'jpeg_srcset': _srcset(image, name, 'jpeg'),
+            'sizes': sizes or SIZES[name],
+            'width': RENDITIONS[name][0],
+            'height': RENDITIONS[name][1],
+        })
+    return context
@@ -0,0 +1,46 @@
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from listings.assets import BUNDLE_PATH, SCRIPTS, STYLESHEETS
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def _bundled(path):
+    """Static URL of a file of the built bundle, or None if it hasn't been built."""
+    path = f'{BUNDLE_PATH}/{path}'
+    return static(path) if finders.find(path) else None
+
+
+def _integrity(integrity):
+    return format_html(' integrity="{}" crossorigin="anonymous"', integrity) if integrity else ''
+
+
+@register.simple_tag
+def vendor_css(name):
+    """
+    A stylesheet of the self-hosted bundle (listings.assets), or its CDN
+    original if ``manage.py build_assets`` hasn't been run.
+
+        {% vendor_css 'bootstrap' %}
+    """
+    path, cdn_url, integrity = STYLESHEETS[name]
+    url = _bundled(path)
+    if url:
+        return format_html('<link rel="stylesheet" href="{}">', url)
+    return format_html('<link rel="stylesheet" href="{}"{}>', cdn_url, _integrity(integrity))
+
+
+@register.simple_tag
+def vendor_js(name):
+    """A script of the self-hosted bundle, or its CDN original; see vendor_css."""
+    path, cdn_url, integrity = SCRIPTS[name]
+    url = _bundled(path)
+    if url:
+        return format_html('<script src="{}"></script>', url)
+    return format_html('<script src="{}"{}></script>', cdn_url, _integrity(integrity))
@@ -1,3 +1,457 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from real_estate_project import db_routers
+
+from . import counters, facets, images, jobs, tasks
+from .caching import listings_version, property_version
+from .models import Conversation, Job, ListingEvent, MessageModel, Property, UnreadCounter
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import search_properties
+
+# Pages render {% static %} without the manifest collectstatic writes
+PLAIN_STATIC_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def cursor_token(values):
+    """A cursor as a client could craft one."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def make_property(seller, **fields):
+    values = {
+        'title': 'Test listing',
+        'description': 'A listing for the tests.',
+        'price': Decimal('5000000'),
+        'property_type': 'House',
+        'status': 'For Sale',
+        'area_sqft': 1200,
+        'bedrooms': 3,
+        'bathrooms': 2,
+        'location': 'Madhapur, Hyderabad',
+        'main_image': 'properties/test.jpg',
+    }
+    values.update(fields)
+    return Property.objects.create(seller=seller, **values)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user('seller', password='password')
+        cls.listings = [make_property(seller, title=f'Listing {i}') for i in range(5)]
+        # Tied on list_date, so only the id keeps the order stable
+        Property.objects.update(list_date=timezone.now())
+
+    def paginator(self):
+        return KeysetPaginator(Property.objects.all(), ordering=('-list_date', '-id'), per_page=2)
+
+    def test_pages_cover_every_row_once(self):
+        paginator = self.paginator()
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(after=cursor)
+            seen.extend(p.pk for p in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, sorted((p.pk for p in self.listings), reverse=True))
+
+    def test_before_cursor_returns_the_previous_page(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor)
+        self.assertTrue(second.has_previous)
+        self.assertEqual(list(paginator.page(before=second.previous_cursor)), list(first))
+
+    def test_invalid_cursor(self):
+        paginator = self.paginator()
+        with self.assertRaises(InvalidCursor):
+            paginator.page(after='not-a-cursor')
+        # Views fall back to the first page instead
+        self.assertEqual(list(paginator.get_page(after='not-a-cursor')), list(paginator.page()))
+
+    def test_cursor_values_of_the_wrong_type(self):
+        paginator = self.paginator()
+        for values in ([123, 1], [None, 1], ['2024-01-01T00:00:00', None], [[], 1]):
+            token = cursor_token(values)
+            with self.subTest(values=values):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(after=token)
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(before=token)
+
+    def test_crafted_cursors_never_fail_the_request(self):
+        for values in ([123, 1], [None, 1]):
+            token = cursor_token(values)
+            with self.subTest(values=values):
+                response = self.client.get(reverse('listings:property-search'), {'after': token})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 5)
+                response = self.client.get(reverse('listings:api-property-list'), {'after': token})
+                self.assertEqual(response.status_code, 400)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user('seller', password='password')
+        cls.madhapur = make_property(seller, location='Madhapur, Hyderabad', price=Decimal('4000000'))
+        cls.hyderabad = make_property(seller, location='Hyderabad', price=Decimal('9000000'), bedrooms=4)
+        cls.land = make_property(
+            seller, location='Pune', property_type='Land', price=Decimal('2000000'), bedrooms=None, bathrooms=None,
+        )
+        cls.unpublished = make_property(seller, location='Hyderabad', is_published=False)
+
+    def setUp(self):
+        # Facet groups are cached under the listings version
+        cache.clear()
+
+    def search(self, **filters):
+        queryset, ordering = search_properties(filters)
+        return list(queryset.order_by(*ordering).values_list('pk', flat=True))
+
+    def test_location_matches_anywhere_ignoring_case(self):
+        self.assertCountEqual(self.search(location=' hyderabad '), [self.madhapur.pk, self.hyderabad.pk])
+
+    def test_filters_combine(self):
+        self.assertEqual(self.search(property_type='House', min_bedrooms=4), [self.hyderabad.pk])
+        self.assertEqual(self.search(min_price=Decimal('3000000'), max_price=Decimal('5000000')), [self.madhapur.pk])
+
+    def test_sort(self):
+        self.assertEqual(
+            self.search(sort='price_asc'), [self.land.pk, self.madhapur.pk, self.hyderabad.pk],
+        )
+
+    def test_facet_total_matches_the_results(self):
+        for filters in ({'location': 'hyderabad'}, {'location': 'madhapur'}, {'property_type': 'House', 'location': 'hyd'}):
+            with self.subTest(filters=filters):
+                total, counts = facets.facet_counts(filters)
+                self.assertEqual(total, len(self.search(**filters)))
+        _, counts = facets.facet_counts({'location': 'hyderabad'})
+        self.assertEqual(counts['location'], {'madhapur, hyderabad': 1, 'hyderabad': 1, 'pune': 1})
+
+    def test_endpoint_validates_ranges(self):
+        response = self.client.get(reverse('listings:property-search'), {'min_price': 10, 'max_price': 5})
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoint_pages_results(self):
+        response = self.client.get(reverse('listings:property-search'), {'location': 'hyderabad'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({r['id'] for r in response.json()['results']}, {self.madhapur.pk, self.hyderabad.pk})
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class ConversationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user('buyer', password='password')
+        self.seller = User.objects.create_user('seller', password='password')
+
+    def send(self, sender, recipient, body='Hello'):
+        return MessageModel.objects.create(sender=sender, recipient=recipient, body=body)
+
+    def test_sending_updates_the_conversation(self):
+        self.send(self.buyer, self.seller)
+        message = self.send(self.buyer, self.seller)
+        conversation = Conversation.objects.get()
+        self.assertEqual(message.conversation, conversation)
+        self.assertEqual(conversation.last_message, message)
+        self.assertEqual(conversation.unread_for(self.seller), 2)
+        self.assertEqual(conversation.unread_for(self.buyer), 0)
+        self.assertEqual(UnreadCounter.get_count(self.seller.pk), 2)
+
+    def test_one_conversation_per_pair(self):
+        self.send(self.buyer, self.seller)
+        self.send(self.seller, self.buyer)
+        self.assertEqual(Conversation.objects.count(), 1)
+
+    def test_mark_read(self):
+        first = self.send(self.buyer, self.seller)
+        self.send(self.buyer, self.seller)
+        conversation = Conversation.objects.get()
+
+        # The cached unread totals are dropped on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(conversation.mark_read(self.seller, upto_id=first.pk), 1)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.seen_upto(self.seller), first.pk)
+        # The message past the watermark is still unread
+        self.assertEqual(conversation.unread_for(self.seller), 1)
+        self.assertEqual(UnreadCounter.get_count(self.seller.pk), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(conversation.mark_read(self.seller), 1)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.unread_for(self.seller), 0)
+        self.assertEqual(UnreadCounter.get_count(self.seller.pk), 0)
+        # Already read: nothing to move
+        self.assertEqual(conversation.mark_read(self.seller), 0)
+
+    def test_opening_the_thread_marks_it_read(self):
+        self.send(self.buyer, self.seller)
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('listings:conversation-detail', args=[self.buyer.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Conversation.objects.get().unread_for(self.seller), 0)
+
+    def test_reading_a_read_thread_writes_nothing(self):
+        message = self.send(self.buyer, self.seller)
+        conversation = Conversation.objects.get()
+        conversation.mark_read(self.seller)
+        with self.assertNumQueries(0):
+            self.assertEqual(conversation.mark_read(self.seller), 0)
+            self.assertEqual(conversation.mark_read(self.seller, upto_id=message.pk), 0)
+
+        self.client.force_login(self.seller)
+        self.client.get(reverse('listings:conversation-detail', args=[self.buyer.pk]))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('listings:conversation-detail', args=[self.buyer.pk]))
+            self.client.get(reverse('listings:conversation-updates', args=[self.buyer.pk]), {'since': 0})
+        self.assertFalse([q for q in queries if q['sql'].startswith(('UPDATE', 'INSERT', 'SAVEPOINT'))])
+
+    def test_updates_endpoint_returns_newer_messages(self):
+        first = self.send(self.buyer, self.seller)
+        second = self.send(self.buyer, self.seller)
+        self.client.force_login(self.seller)
+        url = reverse('listings:conversation-updates', args=[self.buyer.pk])
+        data = self.client.get(url, {'since': first.pk}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [second.pk])
+        self.assertEqual(self.client.get(url, {'since': 'x'}).status_code, 400)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class CacheVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user('seller', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing = make_property(self.seller, title='Original title')
+
+    def tearDown(self):
+        counters.flush_views()
+
+    def test_saving_bumps_the_versions_on_commit(self):
+        before = listings_version(), property_version(self.listing.pk)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.listing.save()
+        # Nothing changes until the transaction commits
+        self.assertEqual((listings_version(), property_version(self.listing.pk)), before)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(listings_version(), before[0])
+        self.assertGreater(property_version(self.listing.pk), before[1])
+
+    def test_cached_detail_page_is_refreshed_after_an_edit(self):
+        url = reverse('listings:property-detail', args=[self.listing.pk])
+        self.assertContains(self.client.get(url), 'Original title')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = 'New title'
+            self.listing.save()
+        self.assertContains(self.client.get(url), 'New title')
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600, VIEW_COUNT_FLUSH_SIZE=3)
+class CounterTests(TestCase):
+    def setUp(self):
+        counters.flush_views()
+        seller = User.objects.create_user('seller', password='password')
+        self.listing = make_property(seller)
+        self.other = make_property(seller)
+
+    def tearDown(self):
+        if counters._timer is not None:
+            counters._timer.cancel()
+
+    def test_views_are_buffered_then_flushed(self):
+        counters.record_view(self.listing.pk)
+        counters.record_view(self.other.pk)
+        self.assertEqual(counters.pending_views(), {self.listing.pk: 1, self.other.pk: 1})
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.view_count, 0)
+
+        # The third view fills the buffer
+        counters.record_view(self.listing.pk)
+        self.assertEqual(counters.pending_views(), {})
+        self.listing.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.listing.view_count, self.other.view_count), (2, 1))
+        self.assertEqual(
+            sorted(ListingEvent.objects.filter(kind='view').values_list('property_id', 'count')),
+            sorted([(self.listing.pk, 2), (self.other.pk, 1)]),
+        )
+
+    def test_saving_a_loaded_listing_keeps_newer_counts(self):
+        stale = Property.objects.get(pk=self.listing.pk)
+        counters.record_view(self.listing.pk)
+        counters.flush_views()
+        stale.title = 'Edited'
+        stale.save()
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.title, self.listing.view_count), ('Edited', 1))
+
+    def test_favorites_are_recounted_from_wishlists(self):
+        from users.models import Profile
+
+        buyer = User.objects.create_user('buyer', password='password')
+        profile = Profile.objects.create(user=buyer)
+        profile.wishlist.add(self.listing)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.favorite_count, 1)
+        profile.wishlist.remove(self.listing)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.favorite_count, 0)
+
+    def test_inquiries_are_counted(self):
+        buyer = User.objects.create_user('buyer', password='password')
+        MessageModel.objects.create(sender=buyer, recipient=self.listing.seller, property=self.listing, body='Hi')
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.inquiry_count, 1)
+
+
+class JobMaintenanceTests(TestCase):
+    def test_purge_deletes_only_old_finished_jobs(self):
+        long_ago = timezone.now() - datetime.timedelta(days=30)
+        old_done, old_failed, recent_done = (jobs.enqueue('listings.test', {'n': n}) for n in range(3))
+        Job.objects.filter(pk=old_done.pk).update(status='done', updated_at=long_ago)
+        Job.objects.filter(pk=old_failed.pk).update(status='failed', updated_at=long_ago)
+        Job.objects.filter(pk=recent_done.pk).update(status='done')
+        self.assertEqual(jobs.purge_finished(keep_days=7), 1)
+        self.assertCountEqual(Job.objects.values_list('pk', flat=True), [old_failed.pk, recent_done.pk])
+
+    def test_requeue_only_takes_back_timed_out_jobs(self):
+        stale, live = jobs.enqueue('listings.test', {'n': 1}), jobs.enqueue('listings.test', {'n': 2})
+        Job.objects.filter(pk=stale.pk).update(
+            status='running', locked_by='dead', locked_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        Job.objects.filter(pk=live.pk).update(status='running', locked_by='alive', locked_at=timezone.now())
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, 'pending')
+        self.assertEqual(Job.objects.get(pk=live.pk).status, 'running')
+
+
+class AnalyticsRollupTests(TestCase):
+    def test_rollup_job_prunes_old_events(self):
+        listing = make_property(User.objects.create_user('seller', password='password'))
+        now = timezone.now()
+        old = ListingEvent.objects.create(property=listing, kind='view', occurred_at=now - datetime.timedelta(days=40))
+        recent = ListingEvent.objects.create(property=listing, kind='view', occurred_at=now - datetime.timedelta(days=1))
+        tasks.rollup_listing_stats()
+        self.assertFalse(ListingEvent.objects.filter(pk=old.pk).exists())
+        self.assertTrue(ListingEvent.objects.filter(pk=recent.pk).exists())
+        self.assertEqual(listing.daily_stats.get(date=old.occurred_at.date()).views, 1)
+
+
+class ApiConditionalRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user('seller', password='password')
+        cls.listing = make_property(seller)
+
+    def test_detail_answers_304_until_the_listing_changes(self):
+        url = reverse('listings:api-property-detail', args=[self.listing.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.listing.title = 'Changed'
+        self.listing.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_revalidates_by_etag(self):
+        url = reverse('listings:api-property-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_304_serializes_nothing(self):
+        url = reverse('listings:api-property-detail', args=[self.listing.pk])
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        # Just the updated_at lookup
+        self.assertEqual(len(queries), 1)
+
+    def test_rendition_backfill_leaves_processed_listings_alone(self):
+        url = reverse('listings:api-property-detail', args=[self.listing.pk])
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            default_storage.save(images.rendition_name(self.listing.main_image.name, 'card'), ContentFile(b'jpeg'))
+            # The first run finds the renditions and shows them
+            call_command('generate_renditions', workers=1, stdout=StringIO())
+            self.listing.refresh_from_db()
+            self.assertTrue(self.listing.renditions_ready)
+            etag = self.client.get(url)['ETag']
+
+            # build.sh runs the backfill again on every deploy
+            call_command('generate_renditions', workers=1, stdout=StringIO())
+            call_command('generate_renditions', workers=1, force=True, stdout=StringIO())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, routing):
+        token = db_routers._routing.set(routing)
+        self.addCleanup(db_routers._routing.reset, token)
+        return routing
+
+    def test_outside_a_request_reads_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_safe_request_reads_a_replica_until_it_writes(self):
+        self.route(db_routers.RequestRouting(use_primary=False))
+        self.assertEqual(self.router.db_for_read(Property), 'replica1')
+        self.assertEqual(self.router.db_for_write(Property), 'default')
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_users_and_sessions_always_read_the_primary(self):
+        self.route(db_routers.RequestRouting(use_primary=False))
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_writing_request_sticks_its_session_to_the_primary(self):
+        post = self.factory.post('/')
+        post.session = {}
+        routing = db_routers._begin(post)
+        self.assertTrue(routing.use_primary)
+        routing.wrote = True
+        db_routers._finish(post, routing)
+
+        get = self.factory.get('/')
+        get.session = post.session
+        self.assertTrue(db_routers._begin(get).use_primary)
+
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.route(db_routers.RequestRouting(use_primary=False))
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_migrations_only_run_on_the_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'listings'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'listings'))
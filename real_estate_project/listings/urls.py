@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 # This app_name variable helps Django distinguish URL names between apps
 app_name = 'listings'
@@ -8,14 +8,27 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('property/<int:pk>/', views.property_detail, name='property-detail'),
     path('dashboard/', views.seller_dashboard, name='seller-dashboard'),
+    path('dashboard/analytics/', views.seller_analytics_view, name='seller-analytics'),
+    path('dashboard/import/', views.import_listings_view, name='import-listings'),
+    path('dashboard/export/', views.export_listings_view, name='export-listings'),
     path('add/', views.add_property_view, name='add-property'),
     path('edit/<int:pk>/', views.edit_property_view, name='edit-property'),
     path('delete/<int:pk>/', views.delete_property_view, name='delete-property'),
     path('confirm-delete/<int:pk>/', views.confirm_delete_property_view, name='confirm-delete-property'),
     path('inbox/', views.inbox_view, name='inbox'),
     path('inbox/<int:user_id>/', views.conversation_view, name='conversation-detail'),
+    path('inbox/<int:user_id>/updates/', views.conversation_updates, name='conversation-updates'),
     path('buyer_dashboard/', views.property_list, name='property-list'),
+    path('search/', views.property_search, name='property-search'),
+    path('search/text/', views.text_search_view, name='text-search'),
     path('property/<int:pk>/favorite/', views.toggle_favorite, name='toggle-favorite'),
+    path('wishlist/', views.wishlist_view, name='wishlist'),
     path('help/', views.help_center_view, name='help-center'),
 
+    # Read-only JSON API
+    path('api/v1/properties/', api.property_list, name='api-property-list'),
+    path('api/v1/properties/<int:pk>/', api.property_detail, name='api-property-detail'),
+    path('api/v1/properties/<int:pk>/images/', api.property_images, name='api-property-images'),
+    path('api/v1/tiles/<int:z>/<int:x>/<int:y>/', api.map_tile, name='api-map-tile'),
+
 ]
@@ -1,58 +1,101 @@
+import datetime
+import os
+import uuid
 from itertools import chain
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Max, Subquery, When, Case, OuterRef, F
+from django.db.models import Q, Max, Subquery, When, Case, OuterRef, F, Sum
 from django.db.models.functions import Coalesce
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.http import require_POST
-from .forms import PropertyForm
-from .models import Property, PropertyImage
+from django.views.decorators.http import require_GET, require_POST
+from .forms import ListingImportUploadForm, PropertyForm, PropertySearchForm
+from .caching import cache_anonymous_page, fragment_cache_context, is_fragment_cached, listings_version, property_version
+from .jobs import enqueue
+from .models import ListingDailyStat, ListingImport, Property, PropertyImage
+from .pagination import KeysetPaginator
+from .search import search_properties, property_summary
+from .counters import count_listing_view
+from . import analytics, bulk, concurrency, facets, fulltext, realtime, recommendations, similarity, wishlist
 import random
-from .models import MessageModel
+from .models import Conversation, MessageModel
 from django.contrib import messages
 from decimal import Decimal
-def home(request):
-    # --- Existing Logic ---
-    showcase_property = Property.objects.filter(is_published=True, property_type='House').order_by('-price').first()
-    featured_houses = Property.objects.filter(is_published=True, property_type='House').order_by('-list_date')[:4]
+from users.models import Profile
+
+# Number of property cards shown per page on the buyer grid and seller dashboard
+PAGE_SIZE = 24
+# Number of messages in each window of a conversation thread
+THREAD_PAGE_SIZE = 30
+
+
+def _fragment_state(fragment):
+    """The fragment cache context, and whether ``fragment`` is cached under it."""
+    context = fragment_cache_context()
+    return context, is_fragment_cached(fragment, context['listings_version'])
+
+
+def _home_recommendations(user):
+    """``(recommended listings, whether the user gave any criteria)`` for the home page."""
+    profile = getattr(user, 'profile', None)
+    if not profile:
+        return [], False
+    has_recommendation_criteria = bool(profile.budget and profile.budget > 0 or profile.preferred_location)
+    showcase = Property.objects.filter(is_published=True, property_type='House').order_by('-price').values('pk')[:1]
+    recommended_properties = recommendations.top_for_user(user, exclude=showcase)
+    if (not recommended_properties and has_recommendation_criteria
+            and profile.recommendations_computed_at is None):
+        # Never scored yet (e.g. the worker hasn't caught up): score now, once
+        recommendations.refresh_for_profile(profile)
+        recommended_properties = recommendations.top_for_user(user, exclude=showcase)
+    return recommended_properties, has_recommendation_criteria
+
+
+@cache_anonymous_page(versions=lambda: [listings_version()])
+async def home(request):
+    # The user is loaded here, not lazily in whichever thread touches it first
+    request.user = await request.auser()
+    fragments, featured_cached = await sync_to_async(_fragment_state)('home_featured')
+
+    houses = Property.objects.filter(is_published=True, property_type='House')
+    showcase_property = SimpleLazyObject(lambda: houses.order_by('-price').first())
+    featured_houses = houses.order_by('-list_date')[:4]
     featured_land = Property.objects.filter(is_published=True, property_type='Land').order_by('-list_date')[:4]
 
-    # --- Recommendation Logic with Django Messages ---
-    recommended_properties = []
-    if request.user.is_authenticated:
-        profile = getattr(request.user, 'profile', None)
-
-        has_recommendation_criteria = False
-        query = Q(is_published=True)
-
-        if profile:
-            if profile.budget and profile.budget > 0:
-                min_price = profile.budget * Decimal('0.80')
-                max_price = profile.budget * Decimal('1.20')
-                query &= Q(price__gte=min_price, price__lte=max_price)
-                has_recommendation_criteria = True
-
-            if profile.preferred_location:
-                query &= Q(location__icontains=profile.preferred_location)
-                has_recommendation_criteria = True
-
-
-            if has_recommendation_criteria:
-                recommended_properties = Property.objects.filter(query).exclude(
-                    pk=showcase_property.pk if showcase_property else None
-                ).order_by('?')[:4]
-
-                # If the final list is empty, add a warning message
-                if not recommended_properties:
-                    messages.warning(request, "We couldn't find any properties that match your budget or location preferences. Try updating your profile!")
-
-    context = {
-        'showcase_property': showcase_property,
-        'featured_houses': featured_houses,
-        'featured_land': featured_land,
-        'recommended_properties': recommended_properties,
-    }
-    return render(request, 'listings/home.html', context)
+    # The featured sections, the showcase and the user's recommendations don't
+    # depend on each other, so they are queried at once. While the featured
+    # fragment is cached they aren't queried at all; they stay lazy in case it
+    # expires before the template gets to it.
+    showcase, houses_list, land_list, recommended = await concurrency.gather(
+        None if featured_cached else lambda: houses.order_by('-price').first(),
+        None if featured_cached else lambda: list(featured_houses),
+        None if featured_cached else lambda: list(featured_land),
+        # Scores are precomputed (see listings.recommendations); this reads the
+        # user's best few with one indexed query.
+        (lambda: _home_recommendations(request.user)) if request.user.is_authenticated else None,
+    )
+    recommended_properties, has_recommendation_criteria = recommended or ([], False)
+    if not featured_cached:
+        showcase_property, featured_houses, featured_land = showcase, houses_list, land_list
+
+    def respond():
+        # If the final list is empty, add a warning message
+        if has_recommendation_criteria and not recommended_properties:
+            messages.warning(request, "We couldn't find any properties that match your budget or location preferences. Try updating your profile!")
+        context = {
+            'showcase_property': showcase_property,
+            'featured_houses': featured_houses,
+            'featured_land': featured_land,
+            'recommended_properties': recommended_properties,
+            **fragments,
+        }
+        return render(request, 'listings/home.html', context)
+    return await sync_to_async(respond)()
 
 
 @login_required
@@ -63,12 +106,22 @@ def seller_dashboard(request):
     """
     # Initialize the queryset for properties
     listed_properties = Property.objects.none()
+    totals = {}
 
     try:
         # Filter properties to get only those created by the current user
         # We need to add a 'seller' field to the Property model first.
         # For now, let's assume it exists.
-        listed_properties = Property.objects.filter(seller=request.user).order_by('-list_date')
+        paginator = KeysetPaginator(Property.objects.filter(seller=request.user), per_page=PAGE_SIZE)
+        listed_properties = paginator.get_page(
+            after=request.GET.get('after'), before=request.GET.get('before')
+        )
+        # Engagement across all of the seller's listings, in one query
+        totals = Property.objects.filter(seller=request.user).aggregate(
+            views=Coalesce(Sum('view_count'), 0),
+            favorites=Coalesce(Sum('favorite_count'), 0),
+            inquiries=Coalesce(Sum('inquiry_count'), 0),
+        )
     except Exception as e:
         messages.error(request, "An error occurred while fetching your properties.")
         # Log the error for debugging
@@ -77,10 +130,112 @@ def seller_dashboard(request):
 
     context = {
         'listed_properties': listed_properties,
+        'page': listed_properties,
+        'totals': totals,
     }
     return render(request, 'listings/seller_dashboard.html', context)
 
+@login_required
+def import_listings_view(request):
+    """
+    Upload a CSV or JSON Lines file of listings (and a zip of their images)
+    to be imported in the background; lists the seller's recent imports.
+    """
+    if request.method == 'POST':
+        form = ListingImportUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            folder = f'imports/{uuid.uuid4().hex}/'
+            source = default_storage.save(folder + os.path.basename(form.cleaned_data['source'].name), form.cleaned_data['source'])
+            archive = ''
+            if form.cleaned_data['images']:
+                archive = default_storage.save(folder + 'images.zip', form.cleaned_data['images'])
+            listing_import = ListingImport.objects.create(seller=request.user, source=source, archive=archive)
+            enqueue('listings.import_listings', {'import_id': listing_import.pk}, max_attempts=1)
+            messages.success(request, "Your file was uploaded. The import runs in the background; refresh this page to follow it.")
+            return redirect('listings:import-listings')
+    else:
+        form = ListingImportUploadForm()
+
+    context = {
+        'form': form,
+        'imports': ListingImport.objects.filter(seller=request.user).order_by('-created_at')[:10],
+        'columns': bulk.COLUMNS[1:],
+    }
+    return render(request, 'listings/import_listings.html', context)
+
+
+@login_required
+@require_GET
+def export_listings_view(request):
+    """Stream all of the seller's listings as CSV, or JSON Lines with ?format=jsonl."""
+    fmt = 'jsonl' if request.GET.get('format') == 'jsonl' else 'csv'
+    rows = bulk.export_rows(Property.objects.filter(seller=request.user))
+    if fmt == 'jsonl':
+        response = StreamingHttpResponse(bulk.jsonl_lines(rows), content_type='application/x-ndjson')
+    else:
+        response = StreamingHttpResponse(bulk.csv_lines(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{bulk.export_filename(fmt)}"'
+    return response
+
+
+# Date ranges offered on the analytics page, in days
+ANALYTICS_PERIODS = (7, 30, 90)
+
+
+@login_required
+def seller_analytics_view(request):
+    """
+    Daily views, saves and inquiries across the seller's listings (or one of
+    them, with ?property=), read from the precomputed daily rollups.
+    """
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in ANALYTICS_PERIODS:
+        days = 30
+    end = timezone.localdate()
+    start = end - datetime.timedelta(days=days - 1)
+
+    selected = None
+    stats = ListingDailyStat.objects.filter(seller=request.user)
+    property_id = request.GET.get('property', '')
+    if property_id.isdigit():
+        selected = get_object_or_404(Property, pk=property_id, seller=request.user)
+        stats = ListingDailyStat.objects.filter(property=selected)
+
+    series = analytics.daily_series(stats, start, end)
+    totals = {
+        field: sum(day[field] for day in series) for field in ('views', 'favorites', 'inquiries')
+    }
+    # Bar heights as a percentage of the busiest day
+    busiest = max([day['views'] for day in series] + [1])
+    for day in series:
+        day['height'] = round(100 * day['views'] / busiest)
+
+    if selected:
+        selected.period = totals
+        listings = [selected]
+    else:
+        listings = analytics.top_listings(request.user, start, end)
+    analytics.attach_price_positions(listings)
+
+    context = {
+        'series': series,
+        'totals': totals,
+        'listings': listings,
+        'selected': selected,
+        'days': days,
+        'periods': ANALYTICS_PERIODS,
+        'start': start,
+        'end': end,
+    }
+    return render(request, 'listings/seller_analytics.html', context)
+
+
 # (Your other views like property_detail, property_search remain here...)
+@count_listing_view
+@cache_anonymous_page(versions=lambda pk: [property_version(pk)])
 def property_detail(request, pk):
     """
     View to display the details of a single property and handle message sending.
@@ -112,9 +267,11 @@ def property_detail(request, pk):
         else:
             messages.error(request, 'You cannot send an empty message.')
 
+    property_obj.is_wishlisted = wishlist.is_wishlisted(request.user, property_obj.pk)
     context = {
         'property': property_obj,
         'additional_images': additional_images,
+        'similar_properties': similarity.similar_properties(property_obj),
     }
     return render(request, 'listings/property_detail.html', context)
 
@@ -209,55 +366,43 @@ def delete_property_view(request, pk):
 @login_required
 def inbox_view(request):
     """
-    Displays a list of unique conversations, each represented by its
-    single latest message.
+    Displays a list of the user's conversations, most recently active first.
     """
     user = request.user
 
-    # This subquery finds the ID of the latest message for each conversation partner.
-    latest_message_subquery = MessageModel.objects.filter(
-        Q(sender=OuterRef('other_user'), recipient=user) |
-        Q(sender=user, recipient=OuterRef('other_user'))
-    ).order_by('-timestamp').values('pk')[:1] # Get the PK of the latest one
-
-    # Get all unique conversation partners and annotate with the latest message ID
-    conversations = MessageModel.objects.filter(
-        Q(sender=user) | Q(recipient=user)
-    ).annotate(
-        # First, identify the 'other user' in the conversation
-        other_user=Case(
-            When(sender=user, then=F('recipient')),
-            default=F('sender')
-        )
-    ).values('other_user').distinct().annotate(
-        # Annotate each unique partner with the ID of our latest message
-        latest_message_pk=Subquery(latest_message_subquery)
+    conversations = list(
+        Conversation.objects.for_user(user)
+        .select_related('user_a', 'user_b', 'last_message')
+        .order_by('-last_activity')
     )
-
-    # Finally, get the actual message objects for the latest messages
-    latest_messages = MessageModel.objects.filter(
-        pk__in=[c['latest_message_pk'] for c in conversations]
-    ).order_by('-timestamp')
+    for conversation in conversations:
+        conversation.partner = conversation.other_user(user)
+        conversation.unread = conversation.unread_for(user)
 
     context = {
-        'conversations': latest_messages
+        'conversations': conversations
     }
     return render(request, 'listings/inbox.html', context)
 
 
+def _message_json(message):
+    return {
+        'id': message.pk,
+        'sender_id': message.sender_id,
+        'body': message.body,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
 @login_required
 def conversation_view(request, user_id):
     """
-    Displays the full message thread between the current user and another user.
+    Displays the latest window of the message thread between the current user
+    and another user; older messages are loaded with the ``older`` cursor.
     """
     other_user = get_object_or_404(User, id=user_id)
-
-    messages_thread = MessageModel.objects.filter(
-        (Q(sender=request.user) & Q(recipient=other_user)) |
-        (Q(sender=other_user) & Q(recipient=request.user))
-    ).order_by('timestamp')
-
-    messages_thread.filter(recipient=request.user).update(is_read=True)
+    if other_user == request.user:
+        return redirect('listings:inbox')
 
     if request.method == 'POST':
         body = request.POST.get('body', '').strip()
@@ -269,60 +414,212 @@ def conversation_view(request, user_id):
             )
             return redirect('listings:conversation-detail', user_id=user_id)
 
+    conversation = Conversation.objects.between(request.user, other_user).first()
+    page = None
+    if conversation:
+        # Newest first so the first window is the end of the thread
+        paginator = KeysetPaginator(conversation.messages.all(), ordering=('-id',), per_page=THREAD_PAGE_SIZE)
+        page = paginator.get_page(after=request.GET.get('older'))
+        # Only the latest window moves the read watermark
+        if not request.GET.get('older') and conversation.mark_read(request.user):
+            realtime.publish_read(conversation, request.user, conversation.last_message_id)
+
     context = {
-        'messages_thread': messages_thread,
+        'messages_thread': list(reversed(page.object_list)) if page else [],
+        'older_cursor': page.next_cursor if page else None,
+        'last_message_id': page.object_list[0].pk if page else 0,
+        'seen_upto': conversation.seen_upto(other_user) if conversation else 0,
         'other_user': other_user
     }
     return render(request, 'listings/conversation_detail.html', context)
 
+
 @login_required
-def property_list(request):
+@require_GET
+def conversation_updates(request, user_id):
     """
-    This view handles the main buyer page, including the featured
-    slideshow and filtering for the property grid.
+    JSON endpoint returning the messages in a thread newer than ``?since=<id>``,
+    so an open conversation can poll for new messages without reloading.
+    Fetching them marks them as read.
     """
-    # Get the filter type from the URL (e.g., ?type=House)
-    property_type_filter = request.GET.get('type')
+    other_user = get_object_or_404(User, id=user_id)
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'error': 'since must be a message id'}, status=400)
 
-    # --- Prepare data for the main property grid ---
-    properties_list = Property.objects.filter(is_published=True).order_by('-list_date')
-    if property_type_filter in ['House', 'Land']:
-        properties_list = properties_list.filter(property_type=property_type_filter)
+    conversation = Conversation.objects.between(request.user, other_user).first()
+    new_messages = []
+    if conversation and (conversation.last_message_id or 0) > since:
+        new_messages = list(conversation.messages.filter(id__gt=since).order_by('id')[:THREAD_PAGE_SIZE])
+        if new_messages and conversation.mark_read(request.user, upto_id=new_messages[-1].pk):
+            realtime.publish_read(conversation, request.user, new_messages[-1].pk)
 
-    # --- Prepare data for the "Best Properties" slideshow ---
+    return JsonResponse({
+        'messages': [_message_json(m) for m in new_messages],
+        'last_id': new_messages[-1].pk if new_messages else since,
+        'seen_upto': conversation.seen_upto(other_user) if conversation else 0,
+    })
+
+
+def _top_by_price(property_type):
+    return list(Property.objects.filter(property_type=property_type, is_published=True).order_by('-price')[:2])
+
+
+def _featured_properties(top_houses=None, top_lands=None):
+    """Listings for the "Best Properties" slideshow."""
     # To give equal priority, we get the top 2 of each type
-    top_houses = Property.objects.filter(property_type='House', is_published=True).order_by('-price')[:2]
-    top_lands = Property.objects.filter(property_type='Land', is_published=True).order_by('-price')[:2]
+    if top_houses is None:
+        top_houses, top_lands = _top_by_price('House'), _top_by_price('Land')
 
     # Combine the querysets and sort by price to get the final featured list
-    featured_properties = sorted(
+    return sorted(
         list(chain(top_houses, top_lands)),
         key=lambda instance: instance.price,
         reverse=True
     )
 
+
+@login_required
+async def property_list(request):
+    """
+    This view handles the main buyer page, including the featured
+    slideshow and filtering for the property grid.
+    """
+    # Filters come from the query string (e.g., ?property_type=House&min_bedrooms=3);
+    # ?type=House is still understood from older links
+    query = request.GET.copy()
+    if 'type' in query and 'property_type' not in query:
+        query['property_type'] = query['type']
+    form = PropertySearchForm(query)
+    filters = form.cleaned_data if form.is_valid() else {}
+    # The user is loaded here, not lazily in whichever thread touches it first
+    request.user = await request.auser()
+    fragments, carousel_cached = await sync_to_async(_fragment_state)('buyer_carousel')
+
+    # --- Prepare data for the main property grid ---
+    properties_list, ordering = search_properties(filters)
+
+    # Serve the grid one page at a time, continuing from the cursor in the URL
+    paginator = KeysetPaginator(properties_list, ordering=ordering, per_page=PAGE_SIZE)
+
+    def grid():
+        page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+        # Fill in the hearts with one lookup for the whole page
+        saved = wishlist.wishlisted_ids(request.user, [p.pk for p in page])
+        for property_obj in page:
+            property_obj.is_wishlisted = property_obj.pk in saved
+        return page
+
+    # The grid, the slideshow's listings and the filter bar's counts are
+    # independent, so they are queried at once
+    page, top_houses, top_lands, facet_bar = await concurrency.gather(
+        grid,
+        None if carousel_cached else lambda: _top_by_price('House'),
+        None if carousel_cached else lambda: _top_by_price('Land'),
+        # Live counts for the filter bar
+        lambda: facets.facet_bar(filters, request.GET),
+    )
+
+    context = {
+        'properties': page,
+        'page': page,
+        # While the slideshow fragment is cached this is only evaluated if it expires
+        'featured_properties': (
+            SimpleLazyObject(_featured_properties) if carousel_cached
+            else _featured_properties(top_houses, top_lands)
+        ),
+        'active_filter': filters.get('property_type'),  # To highlight the active button
+        'active_sort': filters.get('sort', 'newest'),
+        'sort_choices': PropertySearchForm.SORT_CHOICES,
+        'facets': facet_bar,
+        'filter_errors': form.errors,
+        'has_filters': any(value not in (None, '') for key, value in filters.items() if key != 'sort'),
+        **fragments,
+    }
+    return await sync_to_async(render)(request, 'listings/property_list.html', context)
+
+@require_GET
+def property_search(request):
+    """
+    JSON search endpoint combining price, type, status, room, area and
+    location filters with a choice of sort order. Results are cursor paginated
+    with the same opaque ``after``/``before`` tokens as the buyer grid.
+    """
+    form = PropertySearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    queryset, ordering = search_properties(form.cleaned_data)
+    paginator = KeysetPaginator(queryset, ordering=ordering, per_page=PAGE_SIZE)
+    page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+    return JsonResponse({
+        'results': [property_summary(p) for p in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+def text_search_view(request):
+    """
+    Free-text search over listing titles, descriptions and locations.
+    Renders ranked results with highlighted snippets, or JSON with ?format=json.
+    """
+    query = request.GET.get('q', '').strip()
+    results = fulltext.search(query)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'query': query,
+            'results': [
+                dict(property_summary(r.property), rank=r.rank, snippet=str(r.snippet))
+                for r in results
+            ],
+        })
+
     context = {
-        'properties': properties_list,
-        'featured_properties': featured_properties,
-        'active_filter': property_type_filter,  # To highlight the active button
+        'query': query,
+        'results': results,
     }
-    return render(request, 'listings/property_list.html', context)
+    return render(request, 'listings/search_results.html', context)
 
 @login_required
+@require_POST
 def toggle_favorite(request, pk):
-    property = get_object_or_404(Property, pk=pk)
-    profile = request.user.profile
+    """
+    Add a listing to the wishlist or take it off. The page's script calls this
+    in the background and gets JSON back; plain form posts are redirected.
+    """
+    if not Property.objects.filter(pk=pk, is_published=True).exists():
+        raise Http404("No such listing.")
+    # The cached identity already holds the profile; users without one get it now
+    profile = request.identity.profile or Profile.objects.get_or_create(user=request.user)[0]
+    wishlisted = wishlist.toggle(profile, pk)
 
-    if property in profile.wishlist.all():
-        # Remove from favorites
-        profile.wishlist.remove(property)
-    else:
-        # Add to favorites
-        profile.wishlist.add(property)
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({'property': pk, 'wishlisted': wishlisted})
 
     # Redirect back to the previous page or a default
-    return redirect(request.META.get('HTTP_REFERER', 'property-list'))
+    referer = request.META.get('HTTP_REFERER')
+    if referer and url_has_allowed_host_and_scheme(referer, allowed_hosts={request.get_host()}):
+        return redirect(referer)
+    return redirect('listings:property-list')
+
+
+@login_required
+def wishlist_view(request):
+    """The user's saved listings, a page at a time."""
+    paginator = KeysetPaginator(wishlist.properties(request.user), per_page=PAGE_SIZE)
+    page = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+    for property_obj in page:
+        property_obj.is_wishlisted = True
+    context = {
+        'properties': page,
+        'page': page,
+    }
+    return render(request, 'listings/wishlist.html', context)
 
 
+@cache_anonymous_page()
 def help_center_view(request):
     return render(request, 'listings/help_center.html')
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Wishlist operations that work on the Profile.wishlist join table directly.
+
+``profile.wishlist.all()`` loads every saved Property just to test one; here
+membership is an indexed lookup on the (profile, property) unique pair, adding
+and removing are single idempotent statements, and grids ask which of their
+cards are wishlisted in one query.
+
+Because bulk_create() and queryset delete() bypass the related manager, the
+m2m_changed signal is sent by hand so listeners (recommendations) still hear
+about the change.
+"""
+from django.db.models.signals import m2m_changed
+
+from users.models import Profile
+
+from .models import Property
+
+Membership = Profile.wishlist.through
+
+
+def _notify(profile, action, property_id):
+    m2m_changed.send(
+        sender=Membership, instance=profile, action=action, reverse=False,
+        model=Property, pk_set={property_id}, using=Membership.objects.db,
+    )
+
+
+def is_wishlisted(user, property_id):
+    if not user.is_authenticated:
+        return False
+    return Membership.objects.filter(profile__user_id=user.pk, property_id=property_id).exists()
+
+
+def wishlisted_ids(user, property_ids):
+    """The subset of ``property_ids`` on ``user``'s wishlist, as a set, in one query."""
+    property_ids = list(property_ids)
+    if not user.is_authenticated or not property_ids:
+        return set()
+    return set(
+        Membership.objects.filter(profile__user_id=user.pk, property_id__in=property_ids)
+        .values_list('property_id', flat=True)
+    )
+
+
+def add(profile, property_id):
+    """Add a listing; adding one that is already saved does nothing."""
+    # INSERT ... ON CONFLICT DO NOTHING against the unique (profile, property) pair
+    Membership.objects.bulk_create(
+        [Membership(profile_id=profile.pk, property_id=property_id)], ignore_conflicts=True,
+    )
+    _notify(profile, 'post_add', property_id)
+
+
+def remove(profile, property_id):
+    """Remove a listing. Returns whether it was on the wishlist."""
+    deleted, _ = Membership.objects.filter(profile_id=profile.pk, property_id=property_id).delete()
+    if deleted:
+        _notify(profile, 'post_remove', property_id)
+    return bool(deleted)
+
+
+def toggle(profile, property_id):
+    """Flip a listing's membership. Returns True if it is now wishlisted."""
+    if remove(profile, property_id):
+        return False
+    add(profile, property_id)
+    return True
+
+
+def properties(user):
+    """Published listings on ``user``'s wishlist, for pagination."""
+    return Property.objects.filter(is_published=True, wishlisted_by__user_id=user.pk)
@@ -0,0 +1,130 @@
+"""
+Reads from the replicas in DATABASE_REPLICAS, writes to the primary.
+
+Only web requests read from a replica, and only while nothing they might
+read could be newer on the primary:
+
+* A request that changes something (any method but GET, HEAD, OPTIONS and
+  TRACE) reads from the primary throughout.
+* Once a request has written, its remaining reads go to the primary too, as
+  do reads inside a transaction.
+* After a request changed listings, messages, profiles and the like, its
+  session keeps reading from the primary for REPLICA_STICKY_SECONDS, which
+  covers the redirect after a form (adding a listing, then the seller
+  dashboard) and the pages that follow while the replicas catch up.
+
+Sessions, users and the database cache are always read from the primary:
+the session is what says whether to stick to it, and a cache version read
+from a lagging replica would serve invalidated pages.
+
+Management commands, the background worker and the shell never see a
+request, so they use the primary only.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Apps whose tables are always read from the primary
+PRIMARY_APPS = {'auth', 'sessions', 'django_cache'}
+
+# Session key: time until which the session reads from the primary
+STICKY_SESSION_KEY = '_db_primary_until'
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class RequestRouting:
+    """Where one request reads from. Shared by the threads the request uses."""
+
+    def __init__(self, use_primary):
+        self.use_primary = use_primary
+        self.wrote = False
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (routing is None or routing.use_primary or not replicas()
+                or model._meta.app_label in PRIMARY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        # Follow a relation from the database its object came from
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in replicas():
+            return instance._state.db
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and model._meta.app_label not in PRIMARY_APPS:
+            routing.use_primary = routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _begin(request):
+    session = getattr(request, 'session', None)
+    sticky_until = session.get(STICKY_SESSION_KEY, 0) if session is not None else 0
+    return RequestRouting(use_primary=request.method not in SAFE_METHODS or sticky_until > time.time())
+
+
+def _finish(request, routing):
+    session = getattr(request, 'session', None)
+    if routing.wrote and request.method not in SAFE_METHODS and session is not None:
+        session[STICKY_SESSION_KEY] = time.time() + getattr(settings, 'REPLICA_STICKY_SECONDS', 15)
+
+
+class ReplicaRoutingMiddleware:
+    """Decides where each request reads from; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+        routing = _begin(request)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        _finish(request, routing)
+        return response
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        # Reading the session may query the database
+        routing = await sync_to_async(_begin)(request)
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        await sync_to_async(_finish)(request, routing)
+        return response
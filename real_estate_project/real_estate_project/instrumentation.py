@@ -0,0 +1,286 @@
+"""
+Per-request measurements: wall time, SQL queries (count, time and repeats)
+and template rendering time, for every view.
+
+RequestMetricsMiddleware collects them while a request is handled and then
+
+* adds them to this process's Prometheus metrics, served as text at
+  ``/metrics`` (see metrics_view);
+* writes one JSON line per request to the ``real_estate_project.requests``
+  logger;
+* checks the request's query count against QUERY_BUDGETS, keyed by URL name
+  (``{'listings:property-list': 12}``). An overrun is logged, or raised as
+  QueryBudgetExceeded when QUERY_BUDGET_ACTION is "raise", which is what test
+  runs should use so that an N+1 regression fails the test that caused it.
+
+Queries are seen through an execute wrapper installed on every database
+connection when it opens. It only records while a request is being measured,
+which it finds through a context variable, so queries run by the async ORM
+in a worker thread are counted against the request that awaited them.
+
+Metrics are kept per process: with several workers each one reports its own
+(labelled with its pid), like Prometheus' own Python client does by default.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger('real_estate_project.requests')
+
+_current = ContextVar('request_metrics', default=None)
+
+# Histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more SQL queries than its QUERY_BUDGETS entry allows."""
+
+
+class RequestMetrics:
+    """What one request did."""
+
+    def __init__(self):
+        # A view may run queries from several threads at once (listings.concurrency)
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def record_query(self, sql, params, seconds):
+        with self.lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            self.statements[sql] += 1
+            self.executions[sql, repr(params)] += 1
+
+    @property
+    def duplicate_queries(self):
+        """Executions of a statement with parameters it had already run with."""
+        return sum(count - 1 for count in self.executions.values())
+
+    def most_repeated(self):
+        """``(sql, times)`` of the statement run most often, the usual N+1 suspect."""
+        return self.statements.most_common(1)[0] if self.statements else (None, 0)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, params, time.perf_counter() - started)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_instrument_connection)
+# Connections opened before this module was imported (e.g. by system checks)
+for _connection in connections.all(initialized_only=True):
+    if _connection.connection is not None:
+        _instrument_connection(None, _connection)
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.template_seconds += time.perf_counter() - started
+    wrapper.__wrapped__ = render
+    return wrapper
+
+
+# Top-level renders only: {% include %} and {% extends %} happen inside them
+if not hasattr(DjangoTemplate.render, '__wrapped__'):
+    DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+# --- Prometheus metrics ---
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    """Counters and histograms in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name, labels] += value
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[name, labels] = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def render(self, extra_labels=()):
+        def format_labels(labels, *more):
+            pairs = list(extra_labels) + list(labels) + list(more)
+            escaped = (f'{key}="{_escape(value)}"' for key, value in pairs)
+            return '{' + ','.join(escaped) + '}' if pairs else ''
+
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f'# TYPE {name} counter')
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{format_labels(labels)} {value:g}')
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram['buckets'], histogram['counts']):
+                        lines.append(f'{name}_bucket{format_labels(labels, ("le", f"{bound:g}"))} {count}')
+                    lines.append(f'{name}_bucket{format_labels(labels, ("le", "+Inf"))} {histogram["count"]}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {histogram["sum"]:g}')
+                    lines.append(f'{name}_count{format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '<unresolved>'
+
+
+def query_budget(view_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+
+
+def _finish(request, response, metrics):
+    duration = time.perf_counter() - metrics.started
+    view = _view_name(request)
+    labels = (('view', view),)
+    repeated_sql, repeated = metrics.most_repeated()
+
+    registry.inc('http_requests_total', labels + (('method', request.method), ('status', str(response.status_code))))
+    registry.observe('http_request_duration_seconds', labels, duration, DURATION_BUCKETS)
+    registry.observe('http_request_queries', labels, metrics.queries, QUERY_BUCKETS)
+    registry.inc('http_request_db_seconds_total', labels, metrics.db_seconds)
+    registry.inc('http_request_template_seconds_total', labels, metrics.template_seconds)
+    registry.inc('http_request_duplicate_queries_total', labels, metrics.duplicate_queries)
+
+    record = {
+        'event': 'request',
+        'view': view,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'queries': metrics.queries,
+        'db_ms': round(metrics.db_seconds * 1000, 2),
+        'template_ms': round(metrics.template_seconds * 1000, 2),
+        'duplicate_queries': metrics.duplicate_queries,
+    }
+    threshold = getattr(settings, 'REPEATED_QUERY_THRESHOLD', 5)
+    if repeated >= threshold:
+        record['repeated_query'] = {'sql': repeated_sql[:500], 'times': repeated}
+    logger.info(json.dumps(record))
+
+    if getattr(settings, 'SERVER_TIMING_HEADER', settings.DEBUG):
+        response['Server-Timing'] = (
+            f'db;desc="{metrics.queries} queries";dur={metrics.db_seconds * 1000:.1f}, '
+            f'tpl;dur={metrics.template_seconds * 1000:.1f}, total;dur={duration * 1000:.1f}'
+        )
+
+    budget = query_budget(view)
+    if budget is not None and metrics.queries > budget:
+        registry.inc('http_request_query_budget_exceeded_total', labels)
+        message = f"{view} ran {metrics.queries} queries, over its budget of {budget}"
+        if repeated > 1:
+            message += f"; most repeated ({repeated}x): {repeated_sql[:300]}"
+        if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(json.dumps(dict(record, event='query_budget_exceeded', budget=budget, message=message)))
+
+
+class RequestMetricsMiddleware:
+    """Measures every request; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, metrics)
+        return response
+
+
+def metrics_view(request):
+    """
+    This process's metrics for Prometheus. Requires ``Authorization: Bearer
+    <METRICS_TOKEN>`` when the setting is set; without one it is only
+    served with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    elif not settings.DEBUG:
+        raise Http404
+    body = registry.render(extra_labels=(('pid', os.getpid()),))
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -48,10 +48,17 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Measures everything below it (static files are served above); see
+    # real_estate_project.instrumentation and QUERY_BUDGETS
+    "real_estate_project.instrumentation.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    # Chooses the primary or a replica for this request's reads
+    "real_estate_project.db_routers.ReplicaRoutingMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # request.identity: the cached user, profile and roles (users.identity)
+    "users.identity.IdentityMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -79,6 +86,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "listings.context_processors.unread_messages",
             ],
         },
     },
@@ -92,9 +100,93 @@ DATABASES = {
     "default": dj_database_url.config(
         default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
         conn_max_age=600,
+        conn_health_checks=True,
     )
 }
 
+# Read replicas, as a comma-separated list of database URLs. Requests read
+# from them (see real_estate_project.db_routers); writes, transactions,
+# management commands and the worker use the primary.
+DATABASE_REPLICAS = []
+for _number, _url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), start=1):
+    DATABASES[f"replica{_number}"] = dj_database_url.parse(
+        _url.strip(), conn_max_age=600, conn_health_checks=True, test_options={"MIRROR": "default"},
+    )
+    DATABASE_REPLICAS.append(f"replica{_number}")
+
+DATABASE_ROUTERS = ["real_estate_project.db_routers.PrimaryReplicaRouter"]
+
+# Seconds a session keeps reading from the primary after it changed
+# something, so that e.g. a new listing shows on the dashboard it redirects to
+# however far the replicas lag behind.
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 15))
+
+# PostgreSQL connection pooling (psycopg 3). Each worker process keeps up to
+# DATABASE_POOL_MAX_SIZE connections per database and lends them to requests
+# (and to the threads of listings.concurrency) instead of holding one per
+# thread; 0 turns pooling off. Pooled connections replace CONN_MAX_AGE.
+DATABASE_POOL_MAX_SIZE = int(os.environ.get("DATABASE_POOL_MAX_SIZE", 0))
+if DATABASE_POOL_MAX_SIZE:
+    for _database in DATABASES.values():
+        if _database["ENGINE"] == "django.db.backends.postgresql":
+            _database["CONN_MAX_AGE"] = 0
+            _database.setdefault("OPTIONS", {})["pool"] = {
+                "min_size": int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2)),
+                "max_size": DATABASE_POOL_MAX_SIZE,
+                # Seconds a request waits for a free connection before failing
+                "timeout": float(os.environ.get("DATABASE_POOL_TIMEOUT", 10)),
+                # Recycle connections after this many seconds (e.g. behind PgBouncer or a failover)
+                "max_lifetime": float(os.environ.get("DATABASE_POOL_MAX_LIFETIME", 1800)),
+            }
+
+
+# --------------------------------------------------
+# CACHE
+# --------------------------------------------------
+# CACHE_BACKEND is one of "locmem" (per process, the default), "file" or
+# "db" (run `manage.py createcachetable` first). Use file or db when running
+# several worker processes so that they share cache invalidations.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+}
+CACHE_DEFAULT_LOCATIONS = {
+    "locmem": "real-estate",
+    "file": str(BASE_DIR / ".cache"),
+    "db": "django_cache",
+}
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": os.environ.get("CACHE_LOCATION", CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 5000))},
+    }
+}
+
+# Seconds anonymous pages (home, property detail, help) and the listing
+# fragments ({% cache %}) are kept. Edits expire them immediately anyway.
+PAGE_CACHE_TIMEOUT = int(os.environ.get("PAGE_CACHE_TIMEOUT", 600))
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get("FRAGMENT_CACHE_TIMEOUT", 600))
+
+
+# --------------------------------------------------
+# AUTHENTICATION (users.identity)
+# --------------------------------------------------
+# Logged-in requests take their user, profile and roles from a cached
+# snapshot instead of the database. ModelBackend stays listed so that
+# sessions started before it keep working.
+AUTHENTICATION_BACKENDS = [
+    "users.identity.CachedIdentityBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# Seconds a user's snapshot is kept. Changes expire it immediately, so this
+# only bounds staleness when CACHE_BACKEND isn't shared between processes.
+IDENTITY_CACHE_TIMEOUT = int(os.environ.get("IDENTITY_CACHE_TIMEOUT", 300))
+
 
 # --------------------------------------------------
 # PASSWORD VALIDATION
@@ -132,7 +224,156 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# collectstatic fingerprints every file (so they can be cached for good) and
+# writes gzip and Brotli copies; WhiteNoise serves fingerprinted files with a
+# ten-year, immutable Cache-Control. The vendored Bootstrap, Font Awesome and
+# Inter bundle is built by `manage.py build_assets` (listings.assets) first.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# Uploaded photos, their renditions and listing imports. The background
+# worker runs as its own service, so in production they must be in shared
+# storage: any S3-compatible bucket, with credentials in AWS_ACCESS_KEY_ID and
+# AWS_SECRET_ACCESS_KEY. Without MEDIA_BUCKET they are kept on local disk.
+MEDIA_BUCKET = os.environ.get("MEDIA_BUCKET", "")
+if MEDIA_BUCKET:
+    STORAGES["default"] = {
+        "BACKEND": "storages.backends.s3.S3Storage",
+        "OPTIONS": {
+            "bucket_name": MEDIA_BUCKET,
+            "endpoint_url": os.environ.get("MEDIA_ENDPOINT_URL") or None,
+            "custom_domain": os.environ.get("MEDIA_CUSTOM_DOMAIN") or None,
+            # Like the file system: save() picks a new name rather than overwriting
+            "file_overwrite": False,
+            "querystring_auth": False,
+        },
+    }
+
+
+# --------------------------------------------------
+# CONCURRENT QUERIES (listings.concurrency)
+# --------------------------------------------------
+# Threads (and so extra database connections, per process) the async pages
+# use to run their independent queries at the same time.
+CONCURRENT_QUERY_THREADS = int(os.environ.get("CONCURRENT_QUERY_THREADS", 8))
+
+
+# --------------------------------------------------
+# BACKGROUND JOBS (listings.jobs, run with `manage.py run_worker`)
+# --------------------------------------------------
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BASE_SECONDS = int(os.environ.get("JOB_RETRY_BASE_SECONDS", 10))
+JOB_LOCK_TIMEOUT = int(os.environ.get("JOB_LOCK_TIMEOUT", 600))
+# Every this many seconds the worker requeues jobs whose lock timed out and
+# deletes jobs that finished more than the retention period ago
+JOB_MAINTENANCE_INTERVAL = int(os.environ.get("JOB_MAINTENANCE_INTERVAL", 300))
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", 7))
+
+
+# --------------------------------------------------
+# REAL-TIME MESSAGING (listings.realtime, served by asgi.py)
+# --------------------------------------------------
+# InProcessBroker suits a single ASGI process; use
+# listings.realtime.DatabasePollingBroker when running several workers.
+REALTIME_BROKER = os.environ.get("REALTIME_BROKER", "listings.realtime.InProcessBroker")
+REALTIME_POLL_INTERVAL = float(os.environ.get("REALTIME_POLL_INTERVAL", 1.0))
+# How long the polling broker keeps re-checking for rows whose transaction
+# committed after a later row's; longer than any messaging transaction.
+REALTIME_SETTLE_SECONDS = float(os.environ.get("REALTIME_SETTLE_SECONDS", 10.0))
+
+# Seconds a user's unread-message total may be served from the cache.
+# Counters are invalidated on change, so this only bounds staleness when
+# the cache is not shared between processes.
+UNREAD_COUNT_CACHE_TIMEOUT = int(os.environ.get("UNREAD_COUNT_CACHE_TIMEOUT", 300))
+
+
+# --------------------------------------------------
+# SIMILAR LISTINGS (listings.similarity)
+# --------------------------------------------------
+# Where the memory-mapped feature matrix is kept; build it with
+# `manage.py build_similarity_index`. The job worker updates it in place,
+# so the web processes only see those updates if they share this directory
+# with the worker (same machine or a network file system).
+SIMILARITY_INDEX_DIR = Path(os.environ.get("SIMILARITY_INDEX_DIR", BASE_DIR / "var" / "similarity"))
+
+
+# --------------------------------------------------
+# POPULARITY COUNTERS (listings.counters)
+# --------------------------------------------------
+# Each worker buffers listing views in memory and writes them out after this
+# many seconds (from a timer if no request comes) or this many views,
+# whichever comes first.
+VIEW_COUNT_FLUSH_INTERVAL = float(os.environ.get("VIEW_COUNT_FLUSH_INTERVAL", 10))
+VIEW_COUNT_FLUSH_SIZE = int(os.environ.get("VIEW_COUNT_FLUSH_SIZE", 500))
+
+
+# --------------------------------------------------
+# SELLER ANALYTICS (listings.analytics)
+# --------------------------------------------------
+# Engagement events are rolled up into daily rows by a background job this
+# many seconds after they arrive, skipping events younger than the lag (they
+# may not be committed yet). Each rollup deletes rolled-up events older than
+# the retention period; market price statistics are recomputed once they
+# reach max age.
+ANALYTICS_ROLLUP_DELAY = int(os.environ.get("ANALYTICS_ROLLUP_DELAY", 300))
+ANALYTICS_ROLLUP_LAG = int(os.environ.get("ANALYTICS_ROLLUP_LAG", 60))
+ANALYTICS_EVENT_RETENTION_DAYS = int(os.environ.get("ANALYTICS_EVENT_RETENTION_DAYS", 30))
+MARKET_STATS_MAX_AGE_HOURS = int(os.environ.get("MARKET_STATS_MAX_AGE_HOURS", 24))
+
+
+# --------------------------------------------------
+# JSON API (listings.api)
+# --------------------------------------------------
+# Seconds clients and shared caches may reuse an API response before
+# revalidating it with its ETag (which usually ends in a 304).
+API_CACHE_MAX_AGE = int(os.environ.get("API_CACHE_MAX_AGE", 60))
+
+
+# --------------------------------------------------
+# REQUEST METRICS (real_estate_project.instrumentation)
+# --------------------------------------------------
+# Most SQL queries each URL name may run per request, for a logged-in user
+# and a cold cache. Overruns are logged, or raised as QueryBudgetExceeded
+# with QUERY_BUDGET_ACTION="raise" (use that when running tests).
+QUERY_BUDGETS = {
+    "listings:home": 16,
+    "listings:property-list": 10,
+    "listings:property-detail": 10,
+    "listings:seller-dashboard": 13,
+    "listings:seller-analytics": 8,
+    "listings:inbox": 6,
+    # Opening a thread with unread messages also marks it read and recounts the badge
+    "listings:conversation-detail": 12,
+    "listings:wishlist": 6,
+    "listings:property-search": 2,
+    "listings:api-property-list": 2,
+    "listings:api-property-detail": 3,
+}
+QUERY_BUDGET_ACTION = os.environ.get("QUERY_BUDGET_ACTION", "log")
+# A statement run this many times in one request is logged as a likely N+1
+REPEATED_QUERY_THRESHOLD = int(os.environ.get("REPEATED_QUERY_THRESHOLD", 5))
+# Adds a Server-Timing header (db, template and total time) to responses
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", str(DEBUG)) == "True"
+# Bearer token Prometheus sends to /metrics; without one it is DEBUG-only
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # One JSON line per request
+        "real_estate_project.requests": {
+            "handlers": ["console"],
+            "level": os.environ.get("REQUEST_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
 
 
 # --------------------------------------------------
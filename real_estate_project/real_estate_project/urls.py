@@ -6,6 +6,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .instrumentation import metrics_view
+
 urlpatterns = [
     # Admin site URL
     path('admin/', admin.site.urls),
@@ -17,6 +19,9 @@ urlpatterns = [
     # URLs for the 'users' app (login, register, logout)
     # These are grouped under the 'accounts/' path
     path('accounts/', include('users.urls')),
+
+    # Request metrics for Prometheus
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # This is a helper for serving media files (like property images) during development.
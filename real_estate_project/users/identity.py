@@ -0,0 +1,116 @@
+"""
+A cached snapshot of who a request is from: the user, their profile and
+their roles (the Sellers/Buyers groups), as ``request.identity``.
+
+Without it every logged-in request loads its auth_user row, and pages then
+load the profile and query the groups on top. The snapshot is kept in the
+cache per user, so a warm request makes no auth queries at all:
+
+* CachedIdentityBackend gives AuthenticationMiddleware the snapshot's user
+  for ``request.user`` (a complete User, with its profile preloaded, that
+  can be saved like any other);
+* IdentityMiddleware adds ``request.identity``, with the profile and roles.
+
+Saving or deleting a User or Profile, changing a user's groups or renaming
+a group drops the affected snapshots (users.signals). Like the other
+cached counters, with several worker processes the cache must be shared
+for that to reach them all; IDENTITY_CACHE_TIMEOUT bounds staleness
+otherwise. The snapshot holds the user's password hash, which Django
+needs to check the session against, so it is no less sensitive than the
+auth_user table: use a cache that isn't exposed beyond the application.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+SELLERS = 'Sellers'
+BUYERS = 'Buyers'
+
+
+class Identity:
+    """Who a request is from."""
+
+    def __init__(self, user, roles=frozenset()):
+        self.user = user
+        self.profile = getattr(user, 'profile', None) if user.is_authenticated else None
+        self.roles = frozenset(roles)
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+    @property
+    def is_seller(self):
+        return SELLERS in self.roles
+
+    @property
+    def is_buyer(self):
+        return BUYERS in self.roles
+
+
+ANONYMOUS = Identity(AnonymousUser())
+
+
+def _cache_key(user_id):
+    return f'identity:{user_id}'
+
+
+def load(user_id):
+    """The identity of the user with id ``user_id``, or None if there is no such user."""
+    user_id = User._meta.pk.to_python(user_id)
+    identity = cache.get(_cache_key(user_id))
+    if identity is None:
+        user = User.objects.select_related('profile').filter(pk=user_id).first()
+        if user is None:
+            return None
+        identity = Identity(user, user.groups.values_list('name', flat=True))
+        cache.set(_cache_key(user_id), identity, getattr(settings, 'IDENTITY_CACHE_TIMEOUT', 300))
+    return identity
+
+
+def identity_of(user):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    return load(user.pk) or ANONYMOUS
+
+
+def invalidate(*user_ids):
+    """Drop users' snapshots, once the change is committed."""
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CachedIdentityBackend(ModelBackend):
+    """ModelBackend that takes the session's user from the identity snapshot."""
+
+    def get_user(self, user_id):
+        identity = load(user_id)
+        if identity is None or not self.user_can_authenticate(identity.user):
+            return None
+        return identity.user
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
+
+
+class IdentityMiddleware:
+    """Adds ``request.identity``; goes after AuthenticationMiddleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Lazy, like request.user; in async mode this returns the coroutine
+        request.identity = SimpleLazyObject(lambda: identity_of(request.user))
+        return self.get_response(request)
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+ROLE_GROUPS = ('Sellers', 'Buyers')
+
+
+def create_role_groups(apps, schema_editor):
+    # Registration used to create these on every visit; they now exist up front
+    Group = apps.get_model('auth', 'Group')
+    for name in ROLE_GROUPS:
+        Group.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_rename_monthly_budget_profile_budget'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_role_groups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_role_groups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='recommendations_computed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -10,6 +10,8 @@ class Profile(models.Model):
     preferred_location = models.CharField(max_length=255, null=True, blank=True)
     budget = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     wishlist = models.ManyToManyField(Property, related_name="wishlisted_by", blank=True)
+    # When listings.recommendations last scored this user, whatever it found
+    recommendations_computed_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.user.username} Profile'
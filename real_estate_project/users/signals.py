@@ -0,0 +1,42 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import identity
+from .models import Profile
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def expire_identity(sender, instance, **kwargs):
+    """Drop the cached snapshot of a user who changed (including last_login)."""
+    identity.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def expire_profile_identity(sender, instance, **kwargs):
+    identity.invalidate(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def expire_role_identities(sender, instance, action, reverse, pk_set, **kwargs):
+    """A user joined or left a group, from either side of the relation."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        identity.invalidate(instance.pk)
+    elif action == 'pre_clear':
+        # pk_set is None for a clear, so collect the members before they go
+        identity.invalidate(*instance.user_set.values_list('pk', flat=True))
+    else:
+        identity.invalidate(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def expire_group_identities(sender, instance, **kwargs):
+    """Roles are group names, so renaming or deleting a group changes its members'."""
+    if kwargs.get('created'):
+        return
+    identity.invalidate(*instance.user_set.values_list('pk', flat=True))
@@ -1,3 +1,77 @@
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from . import identity
+from .models import Profile
+
+
+class IdentitySnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.buyers, _ = Group.objects.get_or_create(name=identity.BUYERS)
+        self.user = User.objects.create_user('buyer', password='password')
+        self.user.groups.add(self.buyers)
+        self.profile = Profile.objects.create(user=self.user, preferred_location='Pune')
+
+    def test_snapshot_is_served_from_the_cache(self):
+        first = identity.load(self.user.pk)
+        self.assertTrue(first.is_buyer)
+        self.assertFalse(first.is_seller)
+        self.assertEqual(first.profile.preferred_location, 'Pune')
+        with self.assertNumQueries(0):
+            cached = identity.load(self.user.pk)
+            self.assertEqual(cached.profile.preferred_location, 'Pune')
+
+    def test_unknown_user(self):
+        self.assertIsNone(identity.load(self.user.pk + 1000))
+
+    def test_saving_the_profile_drops_the_snapshot_on_commit(self):
+        identity.load(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.preferred_location = 'Hyderabad'
+            self.profile.save()
+        self.assertEqual(identity.load(self.user.pk).profile.preferred_location, 'Hyderabad')
+
+    def test_saving_the_user_drops_the_snapshot_on_commit(self):
+        identity.load(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.user.first_name = 'Asha'
+            self.user.save()
+        # Until the commit the old snapshot is still served
+        self.assertEqual(identity.load(self.user.pk).user.first_name, '')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(identity.load(self.user.pk).user.first_name, 'Asha')
+
+    def test_group_changes_drop_the_snapshot(self):
+        sellers, _ = Group.objects.get_or_create(name=identity.SELLERS)
+        identity.load(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(sellers)
+        self.assertTrue(identity.load(self.user.pk).is_seller)
+
+        # From the group's side of the relation too
+        with self.captureOnCommitCallbacks(execute=True):
+            sellers.user_set.clear()
+        self.assertFalse(identity.load(self.user.pk).is_seller)
+
+    def test_renaming_a_group_drops_its_members_snapshots(self):
+        identity.load(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buyers.name = 'Former buyers'
+            self.buyers.save()
+        self.assertFalse(identity.load(self.user.pk).is_buyer)
+
+    def test_backend_returns_the_cached_user(self):
+        backend = identity.CachedIdentityBackend()
+        identity.load(self.user.pk)
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.user.pk)
+        self.assertEqual(user, self.user)
+
+    def test_backend_rejects_inactive_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNone(identity.CachedIdentityBackend().get_user(self.user.pk))
@@ -5,6 +5,7 @@ from django.contrib.auth.models import User, Group
 from django.contrib import messages
 
 from .forms import UserSettingsForm, ProfileSettingsForm, CustomSetPasswordForm, PasswordResetVerificationForm
+from .identity import BUYERS, SELLERS
 from .models import Profile  # Make sure you have the Profile model from your description
 
 
@@ -13,11 +14,6 @@ def register_view(request):
     Handles user registration. On POST, it creates a new User, a Profile,
     and assigns them to either a 'Sellers' or 'Buyers' group.
     """
-    # Ensure 'Sellers' and 'Buyers' groups exist. Create them if they don't.
-    # This is often done in a post-migration signal, but is here for simplicity.
-    seller_group, _ = Group.objects.get_or_create(name='Sellers')
-    buyer_group, _ = Group.objects.get_or_create(name='Buyers')
-
     if request.method == 'POST':
         # Get form data from the request
         first_name = request.POST.get('first_name')
@@ -50,10 +46,10 @@ def register_view(request):
         # so we'll just assign the location to the profile.
         Profile.objects.create(user=user, preferred_location=location)
 
-        if user_type == 'seller':
-            user.groups.add(seller_group)
-        else:
-            user.groups.add(buyer_group)
+        # The groups are created by a migration; get_or_create covers a database
+        # whose groups were deleted since
+        role_group, _ = Group.objects.get_or_create(name=SELLERS if user_type == 'seller' else BUYERS)
+        user.groups.add(role_group)
 
         user.save()
 
@@ -106,16 +102,16 @@ def login_view(request):
 def seller_page_view(request):
     """Renders the seller dashboard page."""
     # Add authentication check to protect this page
-    if not request.user.is_authenticated or not request.user.groups.filter(name='Sellers').exists():
-        return redirect('login')
+    if not request.identity.is_seller:
+        return redirect('users:login')
     return redirect('listings:seller-dashboard')
 
 
 def buyer_page_view(request):
     """Renders the buyer home page."""
     # Add authentication check to protect this page
-    if not request.user.is_authenticated or not request.user.groups.filter(name='Buyers').exists():
-        return redirect('login')
+    if not request.identity.is_buyer:
+        return redirect('users:login')
     return render(request, 'buyer.html')
 
 
@@ -126,8 +122,8 @@ def logout_view(request):
     return redirect('users:login')
 @login_required
 def settings_view(request):
-    # Get or create the user's profile
-    profile, created = Profile.objects.get_or_create(user=request.user)
+    # Get or create the user's profile (usually already in request.identity)
+    profile = request.identity.profile or Profile.objects.get_or_create(user=request.user)[0]
 
     if request.method == 'POST':
         user_form = UserSettingsForm(request.POST, instance=request.user)